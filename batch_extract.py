@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量提取模块
+遍历输出根目录（innovus_output__{util}__1x/、innovus_output_dse/等）下所有的innovus.logv，
+从路径中解析case/boundary/iter（DSE）或{case}__{type}__{mode}（1x实验），
+用进程池并行提取指标，写出一张表（CSV，安装了pyarrow时可另存Parquet/Feather）。
+增量执行：mtime和大小与上次扫描相同的日志直接沿用索引中的结果
+"""
+
+import os
+import re
+import sys
+import csv
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from extract_route_report import extract_data_from_logv, extract_stage_reports, stage_report
+
+# DSE输出目录：case__{case}__core_utilization__{util}__boundary__{boundary}__iter__{iter}[/route]
+DSE_DIR_PATTERN = re.compile(
+    r'case__(?P<case>.+?)__core_utilization__(?P<core_utilization>[^_/]+)__boundary__(?P<boundary>.+?)__iter__(?P<iteration>\d+)'
+    r'(?:/(?P<route>route))?$')
+# 1x实验输出目录：innovus_output__{util}__1x/[{boundary}/]{case}__{type}__{mode}
+ONE_X_DIR_PATTERN = re.compile(
+    r'innovus_output__(?P<core_utilization>[^_/]+)__1x/(?:(?P<boundary>[^/]+)/)?(?P<case>[^/]+?)__(?P<type>[^/]+?)__(?P<mode>[^/]+)$')
+
+PATH_COLUMNS = ['logv_file', 'layout', 'case', 'core_utilization', 'boundary', 'iteration', 'fidelity', 'type', 'mode']
+METRIC_COLUMNS = ['total_net_length', 'total_via_count', 'total_runtime']
+STAGES = ['place', 'route', 'postroute_opt']
+STAGE_COLUMNS = [f"{stage}_{metric}" for stage in STAGES for metric in ('net_length', 'via_count', 'wall_time', 'cpu_time')]
+
+# 二进制表格格式，需要pyarrow
+BINARY_FORMATS = ['parquet', 'feather']
+
+
+def parse_run_path(logv_file):
+    """
+    从日志所在目录解析运行参数
+
+    参数:
+        logv_file: logv文件路径
+
+    返回:
+        dict: PATH_COLUMNS中的字段，无法识别的目录layout为unknown，其余字段为None
+    """
+    run_dir = os.path.dirname(os.path.abspath(logv_file)).replace(os.sep, '/')
+    info = {column: None for column in PATH_COLUMNS}
+    info['logv_file'] = logv_file
+
+    match = DSE_DIR_PATTERN.search(run_dir)
+    if match:
+        info.update(layout='dse', case=match.group('case'), core_utilization=match.group('core_utilization'),
+                    boundary=match.group('boundary'), iteration=int(match.group('iteration')),
+                    fidelity='route_from_place' if match.group('route') else None)
+        return info
+
+    match = ONE_X_DIR_PATTERN.search(run_dir)
+    if match:
+        info.update(layout='1x', case=match.group('case'), core_utilization=match.group('core_utilization'),
+                    boundary=match.group('boundary'), type=match.group('type'), mode=match.group('mode'))
+        return info
+
+    info['layout'] = 'unknown'
+    return info
+
+
+def find_logv_files(root):
+    """
+    递归查找根目录下的所有.logv文件
+
+    参数:
+        root: 根目录
+
+    返回:
+        list: 排序后的logv文件路径
+    """
+    logv_files = []
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.endswith('.logv'):
+                logv_files.append(os.path.join(dirpath, filename))
+    return sorted(logv_files)
+
+
+def extract_row(logv_file, with_stages=False):
+    """
+    提取一个日志的表格行，在子进程中运行
+
+    参数:
+        logv_file: logv文件路径
+        with_stages: 是否一并提取各阶段（place/route/postroute_opt）的报告
+
+    返回:
+        dict: 一行数据
+    """
+    row = parse_run_path(logv_file)
+    row.update(extract_data_from_logv(logv_file))
+    if with_stages:
+        reports = extract_stage_reports(logv_file)
+        for stage in STAGES:
+            report = stage_report(reports, stage) or {}
+            row[f"{stage}_net_length"] = report.get('total_net_length')
+            row[f"{stage}_via_count"] = report.get('total_via_count')
+            row[f"{stage}_wall_time"] = report.get('wall_time')
+            row[f"{stage}_cpu_time"] = report.get('cpu_time')
+    return row
+
+
+def _extract_row_worker(args):
+    return extract_row(*args)
+
+
+def load_index(index_file):
+    """载入上次扫描的索引：logv路径 -> {'mtime', 'size', 'row'}，文件不存在或损坏时返回空索引"""
+    if not os.path.exists(index_file):
+        return {}
+    try:
+        with open(index_file, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"读取索引文件 {index_file} 时出错，重新全部提取: {e}")
+        return {}
+
+
+def save_index(index_file, index):
+    """原子地写出索引"""
+    tmp_file = f"{index_file}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp_file, index_file)
+
+
+def batch_extract(roots, index_file, with_stages=False, workers=None):
+    """
+    增量地批量提取所有日志
+
+    参数:
+        roots: 根目录列表
+        index_file: 索引文件路径
+        with_stages: 是否提取各阶段的报告
+        workers: 进程数，为None时使用本机核数
+
+    返回:
+        list: 所有日志的表格行（按路径排序）
+    """
+    index = load_index(index_file)
+    logv_files = []
+    for root in roots:
+        logv_files.extend(find_logv_files(root))
+
+    rows = {}
+    pending = []
+    stats = {}
+    for logv_file in logv_files:
+        try:
+            stat = os.stat(logv_file)
+        except OSError:
+            continue
+        stats[logv_file] = stat
+        entry = index.get(logv_file)
+        # 只有mtime、大小和提取的列都相同时才沿用上次的结果
+        if (entry is not None and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size
+                and (entry['with_stages'] or not with_stages)):
+            rows[logv_file] = entry['row']
+        else:
+            pending.append(logv_file)
+
+    print(f"共 {len(logv_files)} 个日志，{len(rows)} 个未变化，提取 {len(pending)} 个")
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            tasks = [(logv_file, with_stages) for logv_file in pending]
+            chunksize = max(1, len(tasks) // ((workers or os.cpu_count() or 1) * 4))
+            for logv_file, row in zip(pending, executor.map(_extract_row_worker, tasks, chunksize=chunksize)):
+                rows[logv_file] = row
+
+    # 删除已不存在的日志
+    index = {
+        logv_file: {'mtime': stats[logv_file].st_mtime, 'size': stats[logv_file].st_size,
+                    'with_stages': STAGE_COLUMNS[0] in rows[logv_file],
+                    'row': rows[logv_file]}
+        for logv_file in rows
+    }
+    save_index(index_file, index)
+    return [rows[logv_file] for logv_file in sorted(rows)]
+
+
+def table_columns(with_stages):
+    """返回表格的列"""
+    return PATH_COLUMNS + METRIC_COLUMNS + (STAGE_COLUMNS if with_stages else [])
+
+
+def write_csv(rows, output_file, columns):
+    """写出CSV表格"""
+    with open(output_file, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_binary(rows, output_file, columns, fmt):
+    """
+    用pyarrow写出列式二进制表格
+
+    参数:
+        rows: 表格行
+        output_file: 输出文件路径
+        columns: 列
+        fmt: parquet或feather
+
+    返回:
+        bool: 是否写出成功（没有安装pyarrow时返回False）
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        print(f"未安装pyarrow，无法写出{fmt}文件，只写出CSV")
+        return False
+
+    table = pa.table({column: [row.get(column) for row in rows] for column in columns})
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(table, output_file)
+    else:
+        import pyarrow.feather as feather
+        feather.write_feather(table, output_file)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='并行批量提取输出目录下所有innovus.logv的指标')
+    parser.add_argument('roots', nargs='+', help='输出根目录，如 /mnt/hgfs/vm_share/eda/innovus_output_dse')
+    parser.add_argument('-o', '--output', default='route_reports.csv', help='输出的CSV文件')
+    parser.add_argument('--format', choices=BINARY_FORMATS, default=None, help='另外写出的列式二进制格式（需要pyarrow）')
+    parser.add_argument('--index', default=None, help='增量扫描的索引文件（默认为<输出文件>.index.json）')
+    parser.add_argument('--stages', action='store_true', help='同时提取place/route/postroute_opt各阶段的报告（需要完整读取日志）')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='进程数（默认本机核数）')
+    args = parser.parse_args()
+
+    for root in args.roots:
+        if not os.path.isdir(root):
+            print(f"错误: 目录 '{root}' 不存在")
+            return 1
+
+    index_file = args.index or f"{args.output}.index.json"
+    rows = batch_extract(args.roots, index_file, args.stages, args.workers)
+    columns = table_columns(args.stages)
+    write_csv(rows, args.output, columns)
+    print(f"已写出 {len(rows)} 行到 {args.output}")
+    if args.format is not None:
+        binary_file = f"{os.path.splitext(args.output)[0]}.{args.format}"
+        if write_binary(rows, binary_file, columns, args.format):
+            print(f"已写出 {binary_file}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+
+'''
+调用方式:
+python batch_extract.py /mnt/hgfs/vm_share/eda/innovus_output_dse -o dse_reports.csv
+python batch_extract.py /mnt/hgfs/vm_share/eda/innovus_output__70__1x /mnt/hgfs/vm_share/eda/innovus_output__80__1x -o 1x_reports.csv --format parquet -j 16
+python batch_extract.py /mnt/hgfs/vm_share/eda/innovus_output_dse -o dse_reports.csv --stages   # 加上各阶段的线长/过孔/时间
+
+from batch_extract import batch_extract
+rows = batch_extract(["/mnt/hgfs/vm_share/eda/innovus_output_dse"], "dse_reports.csv.index.json")
+'''
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+约束文件数据模型
+把约束文件解析一次，得到每个create_group的名称、类型和顶点数组（整数DEF单位，numpy int64），
+其余行（注释、addInstToInstGroup等）原样保留。变异、交叉、可视化、代理模型和放缩都在模型上操作，
+最后只序列化一次；未修改的group按原文写回，解析→写出的结果与原文件逐字节相同
+"""
+
+import os
+import sys
+import argparse
+from collections import OrderedDict
+
+import numpy as np
+
+# 每微米的DEF单位数，约束文件中的坐标最多3位小数
+UNITS = 1000
+
+GROUP_TYPES = ["guide", "region", "fence"]
+
+# load_constraint_set缓存的约束文件数
+CACHE_SIZE = 64
+
+
+class ConstraintGroup:
+    """一条create_group命令：名称、类型和顶点（N×2的int64数组，DEF单位）"""
+
+    __slots__ = ('name', '_type', '_vertices', '_text', 'eol')
+
+    def __init__(self, name, group_type, vertices, text=None, eol='\n'):
+        """
+        参数:
+            name: group名称（实例路径）
+            group_type: guide、region或fence
+            vertices: 顶点数组（N×2，DEF单位）
+            text: 解析时的原文，未修改时按原文写回
+            eol: 命令后的换行符
+        """
+        self.name = name
+        self._type = group_type
+        self._vertices = np.asarray(vertices, dtype=np.int64).reshape(-1, 2)
+        self._text = text
+        self.eol = eol
+
+    @property
+    def type(self):
+        return self._type
+
+    @type.setter
+    def type(self, value):
+        if value != self._type:
+            self._type = value
+            self._text = None
+
+    @property
+    def vertices(self):
+        """顶点数组；修改请整体赋值（group.vertices = ...），不要原地修改数组元素"""
+        return self._vertices
+
+    @vertices.setter
+    def vertices(self, value):
+        self._vertices = np.asarray(value, dtype=np.int64).reshape(-1, 2)
+        self._text = None
+
+    def copy(self):
+        """返回独立的副本（顶点数组不共享）"""
+        return ConstraintGroup(self.name, self._type, self._vertices.copy(), self._text, self.eol)
+
+    def bbox(self):
+        """返回包围盒 (x1, y1, x2, y2)，DEF单位"""
+        if len(self._vertices) == 0:
+            return (0, 0, 0, 0)
+        low = self._vertices.min(axis=0)
+        high = self._vertices.max(axis=0)
+        return (int(low[0]), int(low[1]), int(high[0]), int(high[1]))
+
+    def points(self, units=UNITS):
+        """返回微米坐标的点列表 [[x, y], ...]"""
+        return (self._vertices / units).tolist()
+
+    def to_tcl(self, units=UNITS):
+        """返回create_group命令（不含换行符）"""
+        if self._text is not None:
+            return self._text
+        polygon = " ".join(f"{{{x} {y}}}" for x, y in (self._vertices / units).tolist())
+        return f"create_group -name {self.name} -type {self._type} -polygon {{{polygon}}}"
+
+
+def _parse_group(text, eol, units):
+    """
+    解析一条create_group命令
+
+    返回:
+        ConstraintGroup: 缺少-name或-polygon时返回None
+    """
+    head, sep, polygon = text.partition('-polygon')
+    if not sep:
+        return None
+    tokens = head.split()
+    try:
+        name = tokens[tokens.index('-name') + 1]
+    except (ValueError, IndexError):
+        return None
+    group_type = tokens[tokens.index('-type') + 1] if '-type' in tokens[:-1] else "region"
+    # {{x1 y1} {x2 y2} ...} 去掉花括号和续行符后就是坐标序列
+    numbers = polygon.replace('{', ' ').replace('}', ' ').replace('\\', ' ').split()
+    try:
+        coords = np.array(numbers, dtype=np.float64)
+    except ValueError:
+        return None
+    if len(coords) % 2:
+        return None
+    vertices = np.rint(coords * units).astype(np.int64).reshape(-1, 2)
+    return ConstraintGroup(name, group_type, vertices, text, eol)
+
+
+class ConstraintSet:
+    """一个约束文件：按原顺序保存的文本块和ConstraintGroup"""
+
+    __slots__ = ('items', 'groups', 'units', 'source')
+
+    def __init__(self, items=None, units=UNITS, source=None):
+        """
+        参数:
+            items: 文本块（str，含换行符）和ConstraintGroup组成的列表
+            units: 每微米的DEF单位数
+            source: 解析的文件路径
+        """
+        self.items = items if items is not None else []
+        self.groups = [item for item in self.items if isinstance(item, ConstraintGroup)]
+        self.units = units
+        self.source = source
+
+    @classmethod
+    def from_text(cls, content, units=UNITS, source=None):
+        """
+        解析约束文件内容；花括号未闭合或以反斜杠结尾的create_group命令与后续行合并
+
+        参数:
+            content: 文件内容
+            units: 每微米的DEF单位数
+            source: 文件路径，仅用于记录
+
+        返回:
+            ConstraintSet: 解析结果
+        """
+        items = []
+        lines = content.splitlines(True)
+        i = 0
+        while i < len(lines):
+            line = lines[i]
+            if not line.lstrip().startswith('create_group'):
+                # 连续的普通行合并为一个文本块
+                if items and isinstance(items[-1], str):
+                    items[-1] += line
+                else:
+                    items.append(line)
+                i += 1
+                continue
+
+            block = line
+            i += 1
+            while i < len(lines) and (block.count('{') > block.count('}') or block.rstrip().endswith('\\')):
+                block += lines[i]
+                i += 1
+            text = block.rstrip('\r\n')
+            group = _parse_group(text, block[len(text):], units)
+            if group is None:
+                print(f"警告: 无法解析create_group命令: {text[:100]}")
+                items.append(block)
+            else:
+                items.append(group)
+        return cls(items, units, source)
+
+    @classmethod
+    def parse(cls, constraint_file, units=UNITS):
+        """
+        解析约束文件
+
+        参数:
+            constraint_file: 约束文件路径
+            units: 每微米的DEF单位数
+
+        返回:
+            ConstraintSet: 解析结果
+        """
+        with open(constraint_file, 'r', encoding='utf-8', errors='ignore', newline='') as f:
+            return cls.from_text(f.read(), units, constraint_file)
+
+    def serialize(self):
+        """返回约束文件内容"""
+        return "".join(item if isinstance(item, str) else item.to_tcl(self.units) + item.eol for item in self.items)
+
+    def write(self, output_file):
+        """写出约束文件"""
+        with open(output_file, 'w', encoding='utf-8', newline='') as f:
+            f.write(self.serialize())
+
+    def copy(self):
+        """返回副本：group独立，文本块共享（字符串不可变）"""
+        items = [item if isinstance(item, str) else item.copy() for item in self.items]
+        return ConstraintSet(items, self.units, self.source)
+
+    def __len__(self):
+        return len(self.groups)
+
+    def __iter__(self):
+        return iter(self.groups)
+
+    def names(self):
+        """按文件顺序返回group名称"""
+        return [group.name for group in self.groups]
+
+    def get(self, name):
+        """按名称查找group，没有时返回None"""
+        for group in self.groups:
+            if group.name == name:
+                return group
+        return None
+
+    def replace_group(self, index, group):
+        """
+        把第index个group替换为另一个group（如交叉时来自另一个父代的group）
+
+        参数:
+            index: group在文件中的序号
+            group: 新的ConstraintGroup，会被复制
+        """
+        old = self.groups[index]
+        new = group.copy()
+        self.groups[index] = new
+        for position, item in enumerate(self.items):
+            if item is old:
+                self.items[position] = new
+                break
+
+    def scale(self, x_scale, y_scale):
+        """按比例放缩所有group的顶点"""
+        factors = np.array([x_scale, y_scale])
+        for group in self.groups:
+            group.vertices = np.rint(group.vertices * factors)
+
+
+_cache = OrderedDict()
+
+
+def load_constraint_set(constraint_file, units=UNITS):
+    """
+    带缓存地解析约束文件：GA/SA中同一个父代文件会被反复读取，文件的mtime和大小不变时直接复制缓存的模型
+
+    参数:
+        constraint_file: 约束文件路径
+        units: 每微米的DEF单位数
+
+    返回:
+        ConstraintSet: 可以自由修改的副本
+    """
+    stat = os.stat(constraint_file)
+    key = (os.path.abspath(constraint_file), units)
+    entry = _cache.get(key)
+    if entry is not None and entry[0] == (stat.st_mtime_ns, stat.st_size):
+        _cache.move_to_end(key)
+        return entry[1].copy()
+    constraint_set = ConstraintSet.parse(constraint_file, units)
+    _cache[key] = ((stat.st_mtime_ns, stat.st_size), constraint_set)
+    if len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return constraint_set.copy()
+
+
+def save_constraint_set(constraint_set, output_file):
+    """
+    写出约束文件并放入load_constraint_set的缓存：刚写出的子代紧接着被变异时不必重新解析
+
+    参数:
+        constraint_set: ConstraintSet
+        output_file: 输出文件路径
+    """
+    constraint_set.write(output_file)
+    stat = os.stat(output_file)
+    key = (os.path.abspath(output_file), constraint_set.units)
+    _cache[key] = ((stat.st_mtime_ns, stat.st_size), constraint_set.copy())
+    _cache.move_to_end(key)
+    if len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='解析约束文件并打印各create_group的摘要')
+    parser.add_argument('constraint_file', help='约束文件路径')
+    parser.add_argument('--check', action='store_true', help='检查解析→写出是否与原文件逐字节相同')
+    args = parser.parse_args()
+
+    constraint_set = ConstraintSet.parse(args.constraint_file)
+    for group in constraint_set:
+        x1, y1, x2, y2 = group.bbox()
+        units = constraint_set.units
+        print(f"{group.name} ({group.type}): {len(group.vertices)} 个顶点, "
+              f"包围盒 ({x1 / units}, {y1 / units}) - ({x2 / units}, {y2 / units})")
+    if args.check:
+        with open(args.constraint_file, 'r', encoding='utf-8', errors='ignore', newline='') as f:
+            identical = f.read() == constraint_set.serialize()
+        print("往返一致" if identical else "往返不一致")
+        return 0 if identical else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+
+'''
+调用方式:
+python constraint_model.py constraint/PE_array__Boundary_Badoverlap_i100__70__0.txt --check
+
+from constraint_model import ConstraintSet, load_constraint_set, save_constraint_set
+
+constraint_set = load_constraint_set("constraint/PE_array__Boundary_Badoverlap_i100__70__0.txt")
+group = constraint_set.groups[0]
+group.vertices = group.vertices + [1000, 0]   # 右移1微米
+group.type = "fence"
+save_constraint_set(constraint_set, "constraint/PE_array__Boundary_Badoverlap_i100__70__1.txt")
+'''
@@ -0,0 +1,537 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+约束可行性检查模块
+在启动Innovus之前检查变异/交叉得到的约束文件：group是否超出core box、多边形是否自相交、
+面积是否小于组内单元的总面积、group之间的重叠是否过大。
+所有group的顶点拼接后一次向量化计算（奇偶规则的条带分解、按y排序扫描找重叠候选），不逐个group或逐对循环。
+只超出边界的group可以平移或裁剪修复；其他不可行的候选由调用方重新生成，拒绝次数记录在counts中
+"""
+
+import os
+import sys
+import argparse
+
+import numpy as np
+
+from constraint_model import UNITS, load_constraint_set, save_constraint_set
+from def_parser import parse_def_file, iter_components
+
+# 不可行的类型
+DEGENERATE = "degenerate"
+SELF_INTERSECTION = "self_intersection"
+OUT_OF_BOUNDS = "out_of_bounds"
+MIN_AREA = "min_area"
+OVERLAP = "overlap"
+
+# 多次重新生成仍不可行、没有运行Innovus的候选在日志中的状态
+STATUS_INFEASIBLE = "infeasible"
+
+# 重新生成候选的最多次数
+MAX_ATTEMPTS = 10
+
+
+def _expand_ranges(begins, ends):
+    """
+    把一组下标区间 [begins[i], ends[i]) 展开
+
+    返回:
+        tuple: (每个元素所属区间的序号, 元素下标)
+    """
+    lengths = np.clip(ends - begins, 0, None)
+    owners = np.repeat(np.arange(len(begins)), lengths)
+    offsets = np.arange(int(lengths.sum())) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return owners, begins[owners] + offsets
+
+
+class SetGeometry:
+    """
+    一个约束文件中所有group的几何量，全部group的顶点拼接在一起计算：
+    条带分解只排序一次，面积和包围盒用reduceat按group归约，自相交用排序后的区间查找，不逐个group循环
+    """
+
+    __slots__ = ('counts', 'areas', 'bboxes', 'rects', 'rect_ids', 'rect_areas', 'rectilinear', 'crossing')
+
+    def __init__(self, groups):
+        """
+        参数:
+            groups: ConstraintGroup列表
+        """
+        count = len(groups)
+        self.counts = np.array([len(group.vertices) for group in groups], dtype=np.int64)
+        self.areas = np.zeros(count)
+        self.bboxes = np.zeros((count, 4), dtype=np.int64)
+        self.rect_areas = np.zeros(count)
+        self.rectilinear = np.ones(count, dtype=bool)
+        self.crossing = np.zeros(count, dtype=bool)
+        self.rects = np.zeros((0, 4), dtype=np.int64)
+        self.rect_ids = np.zeros(0, dtype=np.int64)
+        nonempty = self.counts > 0
+        if not nonempty.any():
+            return
+
+        vertices = np.concatenate([group.vertices for group in groups])
+        ids = np.repeat(np.arange(count), self.counts)
+        starts = (np.cumsum(self.counts) - self.counts)[nonempty]
+        # 每个顶点的下一个顶点（在各自的group内首尾相接）
+        following = np.arange(len(vertices)) + 1
+        following[starts + self.counts[nonempty] - 1] = starts
+        nxt = vertices[following]
+
+        cross = vertices[:, 0] * nxt[:, 1] - nxt[:, 0] * vertices[:, 1]
+        self.areas[nonempty] = np.abs(np.add.reduceat(cross, starts)) / 2
+        self.bboxes[nonempty, :2] = np.minimum.reduceat(vertices, starts)
+        self.bboxes[nonempty, 2:] = np.maximum.reduceat(vertices, starts)
+
+        horizontal = vertices[:, 1] == nxt[:, 1]
+        vertical = vertices[:, 0] == nxt[:, 0]
+        self.rectilinear = np.bincount(ids[~(horizontal | vertical)], minlength=count) == 0
+        self.crossing = self._crossing(vertices, nxt, ids, horizontal, vertical, count)
+
+        self.rects, self.rect_ids = self._slabs(vertices, nxt, ids, vertical & ~horizontal)
+        rect_area = (self.rects[:, 2] - self.rects[:, 0]) * (self.rects[:, 3] - self.rects[:, 1])
+        self.rect_areas = np.bincount(self.rect_ids, weights=rect_area, minlength=count)
+
+    @staticmethod
+    def _slabs(vertices, nxt, ids, vertical):
+        """
+        按奇偶规则把每个group分解为水平条带上的矩形：每个group的顶点y值把它切成若干条带，
+        垂直边按所跨的条带展开后按(条带, x)排序，相邻两条一组就是条带内的一段区间。
+        与random_constraint_modifier.extract_rectangles（每行只取最左、最右的点）不同，
+        凹口和同一行内的多段区间都按实际的边界计算，面积与简单多边形的鞋带公式一致
+
+        返回:
+            tuple: (矩形数组 (K×4，DEF单位，按group排序), 每个矩形所属group的序号)
+        """
+        v = np.flatnonzero(vertical)
+        if len(v) == 0:
+            return np.zeros((0, 4), dtype=np.int64), np.zeros(0, dtype=np.int64)
+        y_min = int(vertices[:, 1].min())
+        span = int(vertices[:, 1].max()) - y_min + 1
+        # 每个group的不同y值，相邻两个（同一group内）构成一个条带
+        levels = np.unique(ids * span + (vertices[:, 1] - y_min))
+        band_ids = levels // span
+        same = band_ids[1:] == band_ids[:-1]
+        band_low = levels[:-1][same]
+        band_high = levels[1:][same]
+
+        low = np.minimum(vertices[v, 1], nxt[v, 1]) - y_min
+        high = np.maximum(vertices[v, 1], nxt[v, 1]) - y_min
+        begins = np.searchsorted(band_low, ids[v] * span + low, side='left')
+        ends = np.searchsorted(band_low, ids[v] * span + high, side='left')
+        owners, band = _expand_ranges(begins, ends)
+        x = vertices[v[owners], 0]
+        order = np.lexsort((x, band))
+        band = band[order]
+        x = x[order]
+        # 条带内第偶数条边进入多边形、第奇数条边离开
+        starts = np.flatnonzero(np.concatenate([[True], band[1:] != band[:-1]]))
+        rank = np.arange(len(band)) - np.repeat(starts, np.diff(np.append(starts, len(band))))
+        enter = np.flatnonzero(rank % 2 == 0)
+        enter = enter[(enter + 1 < len(band))]
+        enter = enter[band[enter + 1] == band[enter]]
+        rects = np.column_stack([x[enter], band_low[band[enter]] % span + y_min,
+                                 x[enter + 1], band_high[band[enter]] % span + y_min])
+        keep = rects[:, 2] > rects[:, 0]
+        return rects[keep], band_ids[:-1][same][band[enter]][keep]
+
+    @staticmethod
+    def _crossing(vertices, nxt, ids, horizontal, vertical, count):
+        """
+        检查每个group的水平边与垂直边是否在内部相交：水平边按(group, y)排序，
+        每条垂直边用二分查找取出同一group内y严格位于其两端之间的水平边，再比较x
+
+        返回:
+            numpy.ndarray: 每个group是否自相交
+        """
+        h = np.flatnonzero(horizontal & ~vertical)
+        v = np.flatnonzero(vertical & ~horizontal)
+        if len(h) == 0 or len(v) == 0:
+            return np.zeros(count, dtype=bool)
+        y_min = int(vertices[:, 1].min())
+        span = int(vertices[:, 1].max()) - y_min + 1
+        h_keys = ids[h] * span + (vertices[h, 1] - y_min)
+        order = np.argsort(h_keys, kind='stable')
+        h = h[order]
+        h_keys = h_keys[order]
+        v_low = np.minimum(vertices[v, 1], nxt[v, 1]) - y_min
+        v_high = np.maximum(vertices[v, 1], nxt[v, 1]) - y_min
+        begins = np.searchsorted(h_keys, ids[v] * span + v_low, side='right')
+        ends = np.searchsorted(h_keys, ids[v] * span + v_high, side='left')
+        owners, candidates = _expand_ranges(begins, ends)
+        if len(owners) == 0:
+            return np.zeros(count, dtype=bool)
+        edges = h[candidates]
+        x = vertices[v[owners], 0]
+        inside = (np.minimum(vertices[edges, 0], nxt[edges, 0]) < x) & (x < np.maximum(vertices[edges, 0], nxt[edges, 0]))
+        return np.bincount(ids[v[owners]][inside], minlength=count) > 0
+
+    def overlaps(self):
+        """
+        计算group之间的重叠面积：所有矩形按y1排序，每个矩形用二分查找取出y方向可能相交的矩形，
+        再过滤x方向和属于同一group的候选，按group对累加
+
+        返回:
+            tuple: (group对 (K×2数组，a<b), 重叠面积数组)
+        """
+        if len(self.rects) < 2:
+            return np.zeros((0, 2), dtype=np.int64), np.zeros(0)
+        order = np.argsort(self.rects[:, 1], kind='stable')
+        rects = self.rects[order]
+        ids = self.rect_ids[order]
+        # 排在i之后、y1小于第i个矩形y2的矩形才可能与它相交
+        ends = np.searchsorted(rects[:, 1], rects[:, 3], side='left')
+        first, second = _expand_ranges(np.arange(1, len(rects) + 1), ends)
+        keep = ids[first] != ids[second]
+        first = first[keep]
+        second = second[keep]
+        width = np.minimum(rects[first, 2], rects[second, 2]) - np.maximum(rects[first, 0], rects[second, 0])
+        height = np.minimum(rects[first, 3], rects[second, 3]) - np.maximum(rects[first, 1], rects[second, 1])
+        keep = (width > 0) & (height > 0)
+        if not keep.any():
+            return np.zeros((0, 2), dtype=np.int64), np.zeros(0)
+        a = np.minimum(ids[first[keep]], ids[second[keep]])
+        b = np.maximum(ids[first[keep]], ids[second[keep]])
+        keys, inverse = np.unique(a * len(self.counts) + b, return_inverse=True)
+        areas = np.bincount(inverse, weights=(width[keep] * height[keep]).astype(np.float64))
+        return np.column_stack([keys // len(self.counts), keys % len(self.counts)]), areas
+
+
+def group_cell_areas(constraint_file, def_file, lef_file):
+    """
+    按约束文件中的addInstToInstGroup分配统计每个group内单元的总面积
+
+    参数:
+        constraint_file: 约束文件路径
+        def_file: 含COMPONENTS的DEF文件路径（提供实例的单元类型）
+        lef_file: LEF文件路径（提供单元尺寸）
+
+    返回:
+        dict: group名称 -> 单元总面积（平方微米）
+    """
+    from hpwl import parse_lef_pin_offsets
+
+    members = {}
+    constraint_set = load_constraint_set(constraint_file)
+    for item in constraint_set.items:
+        if not isinstance(item, str) or 'addInstToInstGroup' not in item:
+            continue
+        for line in item.splitlines():
+            tokens = line.split()
+            if len(tokens) >= 3 and tokens[0] == 'addInstToInstGroup':
+                members[tokens[2]] = tokens[1]
+
+    macros = parse_lef_pin_offsets(lef_file)
+    areas = {}
+    for component in iter_components(def_file):
+        group_name = members.get(component['name'])
+        macro = macros.get(component['model'])
+        if group_name is not None and macro is not None:
+            width, height = macro['size']
+            areas[group_name] = areas.get(group_name, 0.0) + width * height
+    return areas
+
+
+class ConstraintValidator:
+    """约束文件的几何可行性检查和修复"""
+
+    def __init__(self, core_box=None, min_areas=None, max_overlap_ratio=0.1, min_area_ratio=1.0, lef_file=None):
+        """
+        参数:
+            core_box: core box (x1, y1, x2, y2)，微米；为None时不检查边界（由load_design设置）
+            min_areas: group名称 -> 单元总面积（平方微米），为None时不检查面积
+            max_overlap_ratio: 两个group的重叠面积允许占较小group面积的比例（原始约束文件本身就有少量重叠）
+            min_area_ratio: group面积至少为单元总面积的该倍数
+            lef_file: LEF文件路径，load_design时用来统计单元面积
+        """
+        self.core_box = core_box
+        self.min_areas = min_areas
+        self.max_overlap_ratio = max_overlap_ratio
+        self.min_area_ratio = min_area_ratio
+        self.lef_file = lef_file
+        self.counts = {'checked': 0, 'feasible': 0, 'repaired': 0, 'rejected': 0}
+        self.reject_kinds = {}
+
+    def load_design(self, def_results, def_file=None, constraint_file=None):
+        """
+        从DEF解析结果设置core box；设置了LEF时按原始约束文件的单元分配统计每个group的最小面积
+
+        参数:
+            def_results: parse_def_file的结果
+            def_file: DEF文件路径
+            constraint_file: 原始约束文件路径
+        """
+        if def_results and def_results.get('dimensions'):
+            width, height = (float(value) for value in def_results['dimensions'].split('*'))
+            self.core_box = (0.0, 0.0, width, height)
+        if self.lef_file and def_file and constraint_file and os.path.exists(def_file):
+            try:
+                self.min_areas = group_cell_areas(constraint_file, def_file, self.lef_file)
+            except (OSError, ValueError) as e:
+                print(f"统计group单元面积时出错，不检查最小面积: {e}")
+
+    def check_groups(self, groups, units=UNITS, geometry=None):
+        """
+        检查每个group自身：退化/非直角、自相交、超出core box、面积小于单元面积
+
+        参数:
+            groups: ConstraintGroup列表
+            units: 每微米的DEF单位数
+            geometry: groups的SetGeometry，为None时计算
+
+        返回:
+            list: [(group名称, 不可行类型, 说明)]
+        """
+        if geometry is None:
+            geometry = SetGeometry(groups)
+        degenerate = (geometry.counts < 4) | ~geometry.rectilinear
+        self_intersection = ~degenerate & ((geometry.areas == 0) | (geometry.areas != geometry.rect_areas) | geometry.crossing)
+        flagged = degenerate | self_intersection
+        if self.core_box is not None:
+            box = np.array([round(value * units) for value in self.core_box])
+            out_of_bounds = ~degenerate & ((geometry.bboxes[:, :2] < box[:2]).any(axis=1) | (geometry.bboxes[:, 2:] > box[2:]).any(axis=1))
+            flagged |= out_of_bounds
+        else:
+            out_of_bounds = np.zeros(len(groups), dtype=bool)
+        if self.min_areas:
+            min_areas = np.array([self.min_areas.get(group.name, 0.0) * self.min_area_ratio for group in groups])
+            small = ~degenerate & (geometry.areas / units ** 2 < min_areas)
+            flagged |= small
+        else:
+            small = np.zeros(len(groups), dtype=bool)
+
+        violations = []
+        for index in np.flatnonzero(flagged):
+            name = groups[index].name
+            area = geometry.areas[index] / units ** 2
+            if degenerate[index]:
+                violations.append((name, DEGENERATE, f"{geometry.counts[index]} 个顶点" + ("" if geometry.rectilinear[index] else "，存在非直角边")))
+                continue
+            if self_intersection[index]:
+                violations.append((name, SELF_INTERSECTION,
+                                   f"多边形面积 {area:.3f}, 矩形分解面积 {geometry.rect_areas[index] / units ** 2:.3f}"))
+            if out_of_bounds[index]:
+                x1, y1, x2, y2 = geometry.bboxes[index].tolist()
+                violations.append((name, OUT_OF_BOUNDS, f"包围盒 ({x1 / units}, {y1 / units}) - ({x2 / units}, {y2 / units})"))
+            if small[index]:
+                violations.append((name, MIN_AREA, f"面积 {area:.3f} 小于单元面积 {min_areas[index]:.3f}"))
+        return violations
+
+    def check_overlaps(self, groups, units=UNITS, geometry=None):
+        """
+        检查group之间的重叠：重叠面积超过较小group面积的max_overlap_ratio时不可行
+
+        参数:
+            groups: ConstraintGroup列表
+            units: 每微米的DEF单位数
+            geometry: groups的SetGeometry，为None时计算
+
+        返回:
+            list: [(group名称, 不可行类型, 说明)]
+        """
+        if geometry is None:
+            geometry = SetGeometry(groups)
+        pairs, areas = geometry.overlaps()
+        if len(pairs) == 0:
+            return []
+        limits = self.max_overlap_ratio * np.minimum(geometry.areas[pairs[:, 0]], geometry.areas[pairs[:, 1]])
+        return [(groups[a].name, OVERLAP, f"与 {groups[b].name} 重叠 {area / units ** 2:.3f}")
+                for (a, b), area in zip(pairs[areas > limits].tolist(), areas[areas > limits].tolist())]
+
+    def validate(self, constraint_set):
+        """
+        检查整个约束文件
+
+        参数:
+            constraint_set: ConstraintSet
+
+        返回:
+            list: [(group名称, 不可行类型, 说明)]，为空表示可行
+        """
+        geometry = SetGeometry(constraint_set.groups)
+        return (self.check_groups(constraint_set.groups, constraint_set.units, geometry) +
+                self.check_overlaps(constraint_set.groups, constraint_set.units, geometry))
+
+    def repair(self, constraint_set, violations):
+        """
+        修复只超出core box的group：包围盒放得下时平移回box内，否则裁剪到box
+
+        参数:
+            constraint_set: ConstraintSet（原地修改）
+            violations: validate的结果
+
+        返回:
+            bool: 是否修改了约束
+        """
+        if self.core_box is None:
+            return False
+        units = constraint_set.units
+        bx1, by1, bx2, by2 = (round(value * units) for value in self.core_box)
+        names = {name for name, kind, _ in violations if kind == OUT_OF_BOUNDS}
+        repaired = False
+        for group in constraint_set:
+            if group.name not in names:
+                continue
+            x1, y1, x2, y2 = group.bbox()
+            if x2 - x1 <= bx2 - bx1 and y2 - y1 <= by2 - by1:
+                dx = max(bx1 - x1, 0) + min(bx2 - x2, 0)
+                dy = max(by1 - y1, 0) + min(by2 - y2, 0)
+                group.vertices = group.vertices + [dx, dy]
+            else:
+                # 直角多边形的顶点逐个截断到box内即为裁剪结果（修复后会重新检查）
+                group.vertices = np.clip(group.vertices, [bx1, by1], [bx2, by2])
+            repaired = True
+        return repaired
+
+    def check_set(self, constraint_set):
+        """
+        检查内存中的约束模型（如尚未写出的子代），能修复时原地修复
+
+        参数:
+            constraint_set: ConstraintSet
+
+        返回:
+            list: 修复后仍然存在的不可行项，为空表示可行
+        """
+        return self._check(constraint_set)[0]
+
+    def check_file(self, constraint_file):
+        """
+        检查约束文件，能修复时修复并写回
+
+        参数:
+            constraint_file: 约束文件路径
+
+        返回:
+            list: 修复后仍然存在的不可行项，为空表示可行
+        """
+        constraint_set = load_constraint_set(constraint_file)
+        violations, repaired = self._check(constraint_set)
+        if repaired:
+            save_constraint_set(constraint_set, constraint_file)
+        return violations
+
+    def _check(self, constraint_set):
+        """
+        检查并修复约束模型，更新统计
+
+        返回:
+            tuple: (不可行项, 是否修复成功)
+        """
+        self.counts['checked'] += 1
+        repaired = False
+        violations = self.validate(constraint_set)
+        if violations and self.repair(constraint_set, violations):
+            violations = self.validate(constraint_set)
+            if not violations:
+                self.counts['repaired'] += 1
+                repaired = True
+        if violations:
+            self.counts['rejected'] += 1
+            for _, kind, _ in violations:
+                self.reject_kinds[kind] = self.reject_kinds.get(kind, 0) + 1
+        else:
+            self.counts['feasible'] += 1
+        return violations, repaired
+
+    def summary(self):
+        """返回一行统计信息"""
+        kinds = ", ".join(f"{kind} {count}" for kind, count in sorted(self.reject_kinds.items()))
+        return (f"约束可行性检查: 检查 {self.counts['checked']} 个, 修复 {self.counts['repaired']} 个, "
+                f"拒绝 {self.counts['rejected']} 个" + (f" ({kinds})" if kinds else ""))
+
+    def to_dict(self):
+        """返回可JSON序列化的状态，用于检查点"""
+        return {
+            'core_box': list(self.core_box) if self.core_box is not None else None,
+            'min_areas': self.min_areas, 'max_overlap_ratio': self.max_overlap_ratio,
+            'min_area_ratio': self.min_area_ratio, 'lef_file': self.lef_file,
+            'counts': self.counts, 'reject_kinds': self.reject_kinds
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """从to_dict的结果恢复"""
+        validator = cls(tuple(data['core_box']) if data['core_box'] is not None else None, data['min_areas'],
+                        data['max_overlap_ratio'], data['min_area_ratio'], data['lef_file'])
+        validator.counts = data['counts']
+        validator.reject_kinds = data['reject_kinds']
+        return validator
+
+
+def generate_feasible(generate, constraint_file, validator, max_attempts=MAX_ATTEMPTS):
+    """
+    重复生成候选直到通过可行性检查
+
+    参数:
+        generate: 无参数的函数，写出constraint_file并返回修改记录
+        constraint_file: generate写出的约束文件
+        validator: ConstraintValidator，为None时不检查
+        max_attempts: 最多生成次数
+
+    返回:
+        tuple: (最后一次的修改记录, 是否可行)
+    """
+    result = None
+    for attempt in range(max_attempts):
+        result = generate()
+        if validator is None:
+            return result, True
+        violations = validator.check_file(constraint_file)
+        if not violations:
+            return result, True
+        name, kind, detail = violations[0]
+        print(f"约束可行性检查: {os.path.basename(constraint_file)} 第 {attempt + 1} 次生成不可行 "
+              f"({len(violations)} 项, 如 {name}: {kind} {detail})")
+    return result, False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='检查约束文件的几何可行性（边界、自相交、最小面积、group重叠）')
+    parser.add_argument('constraint_files', nargs='+', help='约束文件路径')
+    parser.add_argument('--def', dest='def_file', default=None, help='DEF文件，提供core box（以及统计单元面积用的COMPONENTS）')
+    parser.add_argument('--lef', default=None, help='LEF文件，提供单元尺寸，用于最小面积检查')
+    parser.add_argument('--reference', default=None, help='含addInstToInstGroup分配的原始约束文件（默认为第一个约束文件）')
+    parser.add_argument('--max-overlap', type=float, default=0.1, help='两个group的重叠面积允许占较小group面积的比例')
+    parser.add_argument('--repair', action='store_true', help='修复超出边界的group并写回文件')
+    args = parser.parse_args()
+
+    validator = ConstraintValidator(max_overlap_ratio=args.max_overlap, lef_file=args.lef)
+    if args.def_file:
+        validator.load_design(parse_def_file(args.def_file), args.def_file, args.reference or args.constraint_files[0])
+
+    infeasible = 0
+    for constraint_file in args.constraint_files:
+        if args.repair:
+            violations = validator.check_file(constraint_file)
+        else:
+            violations = validator.validate(load_constraint_set(constraint_file))
+        if violations:
+            infeasible += 1
+            print(f"{constraint_file}: 不可行")
+            for name, kind, detail in violations:
+                print(f"  {name}: {kind} {detail}")
+        else:
+            print(f"{constraint_file}: 可行")
+    if args.repair:
+        print(validator.summary())
+    return 1 if infeasible else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+
+'''
+调用方式:
+python constraint_validator.py constraint/PE_array__Boundary_Badoverlap_i100__70__*.txt --def PE_array.def
+python constraint_validator.py constraint/PE_array__Boundary_Badoverlap_i100__70__12.txt --def PE_array.def --lef cells.lef --repair
+
+from constraint_validator import ConstraintValidator, generate_feasible
+validator = ConstraintValidator(core_box=(0, 0, 126.864, 126.36))
+mods, feasible = generate_feasible(lambda: modify_constraint_file(parent, child), child, validator)
+
+命令行（每个候选启动Innovus之前检查，不可行的候选重新生成）:
+python run_innovus_dse_GA.py -c PE_array -b Boundary_Badoverlap_i100 --licenses 4 --validate
+python run_innovus_dse.py -c PE_array -b Boundary_Badoverlap_i100 --validate --lef cells.lef
+'''
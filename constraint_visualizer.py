@@ -2,7 +2,6 @@
 # coding: utf-8
 
 import os
-import re
 import argparse
 import numpy as np
 import matplotlib.pyplot as plt
@@ -13,6 +12,8 @@ from matplotlib.gridspec import GridSpec
 from shapely.geometry import Polygon
 import difflib
 
+from constraint_model import load_constraint_set
+
 class ConstraintParser:
     """约束文件解析器，用于解析create_group命令及多边形数据"""
     
@@ -32,162 +33,25 @@ class ConstraintParser:
             bool: 是否成功解析
         """
         try:
-            with open(self.constraint_file, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-                
-            # 采用更可靠的方法处理 create_group 命令
-            # 首先分割文件为单独的行
-            lines = content.split('\n')
-            
-            # 找到所有 create_group 行的起始索引
-            create_group_indices = [i for i, line in enumerate(lines) if 'create_group' in line]
-            
-            for idx in create_group_indices:
-                line = lines[idx]
-                
-                # 提取 name 和 type
-                name_match = re.search(r'-name\s+([^\s]+)', line)
-                type_match = re.search(r'-type\s+(\w+)', line)
-                
-                if not name_match or not type_match:
-                    print(f"警告: 行 {idx+1} 缺少name或type参数")
-                    continue
-                
-                name = name_match.group(1)
-                group_type = type_match.group(1)
-                
-                # 查找 polygon 部分，可能跨多行
-                polygon_str = ""
-                polygon_started = False
-                open_braces = 0
-                
-                # 从当前行开始搜索 polygon
-                for j in range(idx, len(lines)):
-                    curr_line = lines[j]
-                    
-                    # 如果尚未开始找到 polygon 标记
-                    if not polygon_started:
-                        if '-polygon' in curr_line:
-                            polygon_started = True
-                            # 提取 -polygon 后面的部分
-                            polygon_part = curr_line.split('-polygon')[1].strip()
-                            polygon_str += polygon_part
-                            
-                            # 计算花括号
-                            open_braces += polygon_part.count('{')
-                            open_braces -= polygon_part.count('}')
-                            
-                            # 如果花括号已平衡，则polygon部分结束
-                            if open_braces == 0 and '{' in polygon_part:
-                                break
-                    else:
-                        # 继续拼接多行polygon
-                        polygon_str += " " + curr_line
-                        
-                        # 计算花括号
-                        open_braces += curr_line.count('{')
-                        open_braces -= curr_line.count('}')
-                        
-                        # 如果花括号已平衡，则polygon部分结束
-                        if open_braces == 0:
-                            break
-                
-                # 如果找到完整的 polygon
-                if polygon_str:
-                    # 提取花括号之间的内容
-                    brace_match = re.search(r'({.*})', polygon_str)
-                    if brace_match:
-                        polygon_data = brace_match.group(1)
-                        points = self._parse_polygon_points(polygon_data)
-                        if points:
-                            self.groups.append((name, group_type, points))
-                        else:
-                            print(f"警告: 无法解析group '{name}' 的多边形坐标")
-                    else:
-                        print(f"警告: 无法在行 {idx+1} 找到有效的polygon数据")
-                else:
-                    print(f"警告: 行 {idx+1} 找不到polygon参数")
-            
-            print(f"从约束文件 {self.constraint_file} 解析了 {len(self.groups)} 个group")
-            return True
-            
+            constraint_set = load_constraint_set(self.constraint_file)
         except Exception as e:
             print(f"解析约束文件时出错: {str(e)}")
             import traceback
             traceback.print_exc()
             return False
-    
-    def _parse_polygon_points(self, polygon_str):
-        """解析多边形点坐标
         
-        Args:
-            polygon_str: 多边形字符串，格式如 {{x1 y1} {x2 y2} ...}
-            
-        Returns:
-            list: 点列表 [(x1, y1), (x2, y2), ...]
-        """
-        try:
-            # 处理双层嵌套的花括号格式 {{x1 y1} {x2 y2} ...}
-            polygon_str = polygon_str.strip()
-            
-            # 如果是双层嵌套，去掉最外层的花括号
-            if polygon_str.startswith('{') and polygon_str.endswith('}'):
-                # 检查是否真的是双层格式
-                inner_content = polygon_str[1:-1].strip()
-                if inner_content.startswith('{') and '{' in inner_content[1:]:
-                    # 使用专门针对Innovus多边形格式的正则表达式
-                    point_pattern = r'{([0-9.-]+)\s+([0-9.-]+)}'
-                    points = []
-                    
-                    for x_str, y_str in re.findall(point_pattern, polygon_str):
-                        x = float(x_str)
-                        y = float(y_str)
-                        points.append((x, y))
-                        
-                    # 调试信息
-                    print(f"解析到 {len(points)} 个点")
-                    if not points:
-                        print(f"未能从多边形字符串中解析出点，尝试另一种格式")
-                        # 尝试其他可能的格式
-                        try:
-                            # 假设格式可能是简单的 "x1 y1 x2 y2 ..."
-                            coords = re.findall(r'([0-9.-]+)\s+([0-9.-]+)', polygon_str)
-                            if coords:
-                                points = [(float(x), float(y)) for x, y in coords]
-                                print(f"使用备选方法解析到 {len(points)} 个点")
-                        except Exception as e:
-                            print(f"备选解析方法也失败: {str(e)}")
-                    
-                    # 确保多边形闭合
-                    if points and len(points) > 2 and points[0] != points[-1]:
-                        points.append(points[0])
-                    
-                    return points
-            
-            # 如果不是双层格式，打印警告并继续尝试解析
-            print(f"警告: 多边形字符串格式不是预期的 {{{{x1 y1}} {{x2 y2}} ...}}")
-            print(f"实际字符串: {polygon_str[:100]}...")
-            
-            # 尝试从任意格式中提取坐标对
-            coords = re.findall(r'([0-9.-]+)\s+([0-9.-]+)', polygon_str)
-            if coords:
-                points = [(float(x), float(y)) for x, y in coords]
-                print(f"成功从非标准格式中解析出 {len(points)} 个点")
-                
-                # 确保多边形闭合
-                if points and len(points) > 2 and points[0] != points[-1]:
-                    points.append(points[0])
-                
-                return points
-            else:
-                print("无法从非标准格式中提取点坐标")
-                return []
-                
-        except Exception as e:
-            print(f"解析多边形坐标时出错: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return []
+        for group in constraint_set:
+            points = [tuple(point) for point in group.points(constraint_set.units)]
+            if not points:
+                print(f"警告: 无法解析group '{group.name}' 的多边形坐标")
+                continue
+            # 确保多边形闭合
+            if len(points) > 2 and points[0] != points[-1]:
+                points.append(points[0])
+            self.groups.append((group.name, group.type, points))
+        
+        print(f"从约束文件 {self.constraint_file} 解析了 {len(self.groups)} 个group")
+        return True
 
 
 class ConstraintVisualizer:
@@ -197,12 +61,13 @@ class ConstraintVisualizer:
         """初始化可视化器"""
         self.group_colors = {}  # 存储group颜色 {group_name: color}
     
-    def visualize_single_file(self, constraint_file, output_file=None):
+    def visualize_single_file(self, constraint_file, output_file=None, density_file=None):
         """可视化单个约束文件
         
         Args:
             constraint_file: 约束文件路径
             output_file: 输出图像路径，为None时显示而不保存
+            density_file: placement_density.py保存的密度栅格(.npz)，叠加在多边形下面；为None时不显示
             
         Returns:
             bool: 是否成功可视化
@@ -219,6 +84,10 @@ class ConstraintVisualizer:
         # 为每个group生成颜色
         self._generate_group_colors(parser.groups)
         
+        # 先绘制密度栅格，多边形叠加在上面
+        if density_file:
+            self._draw_density(ax, density_file)
+        
         # 绘制所有group
         self._draw_groups(ax, parser.groups)
         
@@ -414,6 +283,24 @@ class ConstraintVisualizer:
         # 显示网格
         ax.grid(True, linestyle='--', alpha=0.7)
     
+    def _draw_density(self, ax, density_file):
+        """绘制布局密度栅格
+        
+        Args:
+            ax: matplotlib轴对象
+            density_file: placement_density.save_density保存的.npz文件
+        """
+        from placement_density import load_density
+        
+        density = load_density(density_file)
+        x1, y1, x2, y2 = density['die']
+        ny, nx = density['density'].shape
+        bin_size = density['bin_size']
+        image = ax.imshow(density['density'], origin='lower', cmap='hot_r', alpha=0.8, interpolation='nearest',
+                          extent=(x1, x1 + nx * bin_size, y1, y1 + ny * bin_size))
+        label = "Cell density" if density['metric'] == 'area' else "Cell count per um^2"
+        plt.colorbar(image, ax=ax, fraction=0.046, pad=0.04, label=label)
+    
     def _set_axis_limits(self, ax, groups):
         """设置坐标轴范围
         
@@ -571,6 +458,7 @@ def main():
     parser.add_argument('file1', help='第一个约束文件路径')
     parser.add_argument('--file2', '-f2', help='第二个约束文件路径（用于对比可视化）')
     parser.add_argument('--output', '-o', default='constraint_visualization.png', help='输出图像路径')
+    parser.add_argument('--density', '-d', default=None, help='placement_density.py保存的密度栅格(.npz)，叠加在单文件可视化中')
     
     args = parser.parse_args()
     
@@ -581,7 +469,7 @@ def main():
         visualizer.visualize_comparison(args.file1, args.file2, args.output)
     else:
         print(f"单文件可视化: {args.file1}")
-        visualizer.visualize_single_file(args.file1, args.output)
+        visualizer.visualize_single_file(args.file1, args.output, args.density)
 
 
 if __name__ == "__main__":
@@ -592,4 +480,5 @@ if __name__ == "__main__":
 使用方法：
 可视化单个约束文件：python constraint_visualizer.py constraint_file.tcl
 可视化并对比两个约束文件：python constraint_visualizer.py constraint_file1.tcl constraint_file2.tcl
+叠加布局密度栅格：python placement_density.py PE_array.postPlace.def -o density.npz && python constraint_visualizer.py constraint_file.tcl --density density.npz
 '''
\ No newline at end of file
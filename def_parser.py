@@ -1,6 +1,8 @@
 """
 DEF文件参数提取模块
-用于从DEF文件中提取特定参数
+用于从DEF文件中提取特定参数。parse_def_file按段流式读取，找到所需参数后即停止；
+iter_components/iter_pins/iter_regions/iter_groups/iter_nets逐条产生各段的条目（parse_*解析单条语句），不把整个文件读入内存。
+extract_*函数用于已经读入内存的DEF文本
 """
 
 import re
@@ -51,23 +53,295 @@ def extract_instance_groups(def_content):
     return groups
 
 
+# 带条目数的段（如 COMPONENTS 12 ;）以及PROPERTYDEFINITIONS，均以 END <段名> 结束
+SECTION_NAMES = {
+    'PROPERTYDEFINITIONS', 'VIAS', 'STYLES', 'NONDEFAULTRULES', 'REGIONS', 'COMPONENTMASKSHIFT', 'COMPONENTS',
+    'PINS', 'PINPROPERTIES', 'BLOCKAGES', 'SLOTS', 'FILLS', 'SPECIALNETS', 'NETS', 'SCANCHAINS', 'GROUPS', 'BEGINEXT'
+}
+# DEF规定的段顺序中位于REGIONS之后的段，遇到它们时说明文件没有REGIONS
+SECTIONS_AFTER_REGIONS = {
+    'COMPONENTS', 'PINS', 'PINPROPERTIES', 'BLOCKAGES', 'SLOTS', 'FILLS', 'SPECIALNETS', 'NETS', 'SCANCHAINS', 'GROUPS'
+}
+
+TOKEN_PATTERN = re.compile(r'"[^"]*"|\S+')
+
+
+def iter_def_statements(def_file_path, sections=None):
+    """
+    流式读取DEF文件，逐条产生以;结尾的语句（END语句没有;，单独产生）
+
+    参数:
+        def_file_path: DEF文件路径
+        sections: 需要逐条解析的段名集合，顶层语句用None表示；为None时解析所有段。
+                  不需要的段只按行查找 END <段名>，不做分词
+
+    返回:
+        generator: (所在段名或None, token列表)；段的开始语句（如 COMPONENTS 12 ;）和 END 语句在顶层产生
+    """
+    section = None
+    tokens = []
+    with open(def_file_path, 'r', encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            # 跳过不需要的段
+            if section is not None and sections is not None and section not in sections:
+                stripped = line.strip()
+                if stripped.startswith('END') and stripped.split()[:2] == ['END', section]:
+                    yield None, ['END', section]
+                    section = None
+                continue
+
+            if '#' in line:
+                line = line.split('#', 1)[0]
+            # 只有带引号的行需要正则分词
+            line_tokens = TOKEN_PATTERN.findall(line) if '"' in line else line.split()
+            if not tokens and line_tokens[:1] == ['END']:
+                yield None, line_tokens
+                if len(line_tokens) > 1 and line_tokens[1] == section:
+                    section = None
+                continue
+
+            if ';' not in line_tokens:
+                tokens.extend(line_tokens)
+            else:
+                for token in line_tokens:
+                    if token != ';':
+                        tokens.append(token)
+                        continue
+                    statement, tokens = tokens, []
+                    if section is None and statement and statement[0] in SECTION_NAMES:
+                        yield None, statement
+                        section = statement[0]
+                    elif sections is None or section in sections:
+                        yield section, statement
+            # PROPERTYDEFINITIONS和BEGINEXT的开始语句没有;
+            if section is None and tokens and tokens[0] in ('PROPERTYDEFINITIONS', 'BEGINEXT'):
+                yield None, tokens
+                section, tokens = tokens[0], []
+
+
+def _points(tokens):
+    """从token列表中解析所有 ( x y ) 坐标点"""
+    points = []
+    for i, token in enumerate(tokens):
+        if token == '(' and i + 3 < len(tokens) and tokens[i + 3] == ')':
+            try:
+                points.append((int(tokens[i + 1]), int(tokens[i + 2])))
+            except ValueError:
+                continue
+    return points
+
+
+def parse_die_area(tokens):
+    """
+    解析DIEAREA语句
+
+    返回:
+        tuple: 包围盒 (x1, y1, x2, y2)（DEF单位），不是DIEAREA语句时返回None
+    """
+    if tokens[0] != 'DIEAREA':
+        return None
+    points = _points(tokens)
+    if not points:
+        return None
+    return (min(p[0] for p in points), min(p[1] for p in points), max(p[0] for p in points), max(p[1] for p in points))
+
+
+def _options(tokens):
+    """把条目语句按 + 拆分，返回 (主体token列表, [选项token列表])"""
+    parts = [[]]
+    for token in tokens:
+        if token == '+':
+            parts.append([])
+        else:
+            parts[-1].append(token)
+    return parts[0], parts[1:]
+
+
+def parse_component(tokens):
+    """
+    解析COMPONENTS段的一条语句
+
+    返回:
+        dict: 键有 'name', 'model', 'status'（PLACED/FIXED/COVER/UNPLACED或None）,
+              'location'（(x, y)，DEF单位）, 'orient'；不是条目语句时返回None
+    """
+    if tokens[0] != '-' or len(tokens) < 3:
+        return None
+    component = {'name': tokens[1], 'model': tokens[2], 'status': None, 'location': None, 'orient': None}
+    _, options = _options(tokens)
+    for option in options:
+        if option and option[0] in ('PLACED', 'FIXED', 'COVER', 'UNPLACED'):
+            component['status'] = option[0]
+            points = _points(option)
+            if points:
+                component['location'] = points[0]
+                if len(option) > 5:
+                    component['orient'] = option[5]
+    return component
+
+
+def parse_pin(tokens):
+    """
+    解析PINS段的一条语句
+
+    返回:
+        dict: 键有 'name', 'net', 'location'（(x, y)，DEF单位，未放置时为None）；不是条目语句时返回None
+    """
+    if tokens[0] != '-' or len(tokens) < 2:
+        return None
+    pin = {'name': tokens[1], 'net': None, 'location': None}
+    _, options = _options(tokens)
+    for option in options:
+        if len(option) >= 2 and option[0] == 'NET':
+            pin['net'] = option[1]
+        elif option and option[0] in ('PLACED', 'FIXED', 'COVER'):
+            points = _points(option)
+            if points:
+                pin['location'] = points[0]
+    return pin
+
+
+def parse_region(tokens):
+    """
+    解析REGIONS段的一条语句
+
+    返回:
+        dict: 键有 'name', 'rects'（[(x1, y1, x2, y2)]，DEF单位）, 'type'（FENCE/GUIDE或None）；不是条目语句时返回None
+    """
+    if tokens[0] != '-' or len(tokens) < 2:
+        return None
+    body, options = _options(tokens)
+    points = _points(body)
+    rects = [points[i] + points[i + 1] for i in range(0, len(points) - 1, 2)]
+    region_type = None
+    for option in options:
+        if len(option) >= 2 and option[0] == 'TYPE':
+            region_type = option[1]
+    return {'name': tokens[1], 'rects': rects, 'type': region_type}
+
+
+def parse_group(tokens):
+    """
+    解析GROUPS段的一条语句
+
+    返回:
+        dict: 键有 'name', 'patterns'（实例名模式列表）, 'region'（所属区域名或None）；不是条目语句时返回None
+    """
+    if tokens[0] != '-' or len(tokens) < 2:
+        return None
+    body, options = _options(tokens)
+    region = None
+    for option in options:
+        if len(option) >= 2 and option[0] == 'REGION':
+            region = option[1]
+    return {'name': tokens[1], 'patterns': body[2:], 'region': region}
+
+
+def parse_net(tokens):
+    """
+    解析NETS/SPECIALNETS段的一条语句，只取连接关系，不解析布线几何
+
+    返回:
+        dict: 键有 'name', 'pins'（[(实例名, 引脚名)]，顶层引脚的实例名为PIN）；不是条目语句时返回None
+    """
+    if tokens[0] != '-' or len(tokens) < 2:
+        return None
+    pins = []
+    for i in range(2, len(tokens) - 3):
+        token = tokens[i]
+        # 连接关系在第一个 + 之前
+        if token == '+':
+            break
+        if token == '(' and tokens[i + 3] == ')':
+            pins.append((tokens[i + 1], tokens[i + 2]))
+    return {'name': tokens[1], 'pins': pins}
+
+
+def _iter_section(def_file_path, section, parse):
+    for _, tokens in iter_def_statements(def_file_path, {section}):
+        item = parse(tokens)
+        if item is not None:
+            yield item
+
+
+def iter_components(def_file_path):
+    """逐个产生COMPONENTS中的实例（parse_component的结果）"""
+    return _iter_section(def_file_path, 'COMPONENTS', parse_component)
+
+
+def iter_pins(def_file_path):
+    """逐个产生PINS中的顶层引脚（parse_pin的结果）"""
+    return _iter_section(def_file_path, 'PINS', parse_pin)
+
+
+def iter_regions(def_file_path):
+    """逐个产生REGIONS中的区域（parse_region的结果）"""
+    return _iter_section(def_file_path, 'REGIONS', parse_region)
+
+
+def iter_groups(def_file_path):
+    """逐个产生GROUPS中的组（parse_group的结果）"""
+    return _iter_section(def_file_path, 'GROUPS', parse_group)
+
+
+def iter_nets(def_file_path, special=False):
+    """
+    逐个产生NETS（special为True时为SPECIALNETS）中的线网连接关系（parse_net的结果）
+    """
+    return _iter_section(def_file_path, 'SPECIALNETS' if special else 'NETS', parse_net)
+
+
 def parse_def_file(def_file_path):
-    """解析DEF文件并提取所需参数"""
+    """
+    解析DEF文件并提取所需参数。流式读取，只分词文件头和REGIONS段，
+    所有参数找到后（或到达REGIONS之后的段时）立即停止，不读取COMPONENTS/NETS等大段
+    """
+    units = None
+    ur_x = None
+    ur_y = None
+    row_ys = []
+    row_origin = None
+    site_width = None
+    instance_groups = []
+    regions_done = False
     try:
-        with open(def_file_path, 'r') as file:
-            def_content = file.read()
+        statements = iter_def_statements(def_file_path, {None, 'PROPERTYDEFINITIONS', 'REGIONS'})
+        for section, tokens in statements:
+            if section is None:
+                if tokens[:3] == ['UNITS', 'DISTANCE', 'MICRONS'] and len(tokens) > 3:
+                    units = int(tokens[3])
+                elif tokens[0] == 'ROW' and len(row_ys) < 2 and len(tokens) > 4 and tokens[4].isdigit():
+                    row_ys.append(int(tokens[4]))
+                    if row_origin is None and tokens[3].lstrip('-').isdigit():
+                        row_origin = (int(tokens[3]), int(tokens[4]))
+                    # ROW name site x y orient DO nx BY ny STEP sx sy：STEP的x即placement site宽度
+                    if site_width is None and 'STEP' in tokens[:-1] and tokens[tokens.index('STEP') + 1].isdigit():
+                        site_width = int(tokens[tokens.index('STEP') + 1]) or None
+                elif tokens[:2] == ['END', 'REGIONS'] or tokens[0] in SECTIONS_AFTER_REGIONS:
+                    regions_done = True
+            elif section == 'PROPERTYDEFINITIONS':
+                if tokens[:1] == ['DESIGN'] and len(tokens) > 3 and tokens[2] == 'REAL':
+                    if tokens[1] == 'FE_CORE_BOX_UR_X':
+                        ur_x = float(tokens[3])
+                    elif tokens[1] == 'FE_CORE_BOX_UR_Y':
+                        ur_y = float(tokens[3])
+            elif section == 'REGIONS' and tokens[0] == '-' and len(tokens) > 2 and tokens[2] == '(':
+                instance_groups.append(tokens[1])
+
+            if regions_done and units is not None and ur_x is not None and ur_y is not None and len(row_ys) >= 2:
+                break
+        statements.close()
         
-        # 提取各参数
-        units = extract_units(def_content)
-        dimensions = extract_dimensions(def_content)
-        row_height = extract_row_height(def_content, units)
-        instance_groups = extract_instance_groups(def_content)
+        # 计算实际row高度 = (第二行Y坐标 - 第一行Y坐标) / 单位
+        row_height = (row_ys[1] - row_ys[0]) / units if len(row_ys) >= 2 and units else None
         
         # 构建结果字典
         results = {
             'units': units,
-            'dimensions': f"{dimensions[0]}*{dimensions[1]}" if dimensions else None,
+            'dimensions': f"{ur_x}*{ur_y}" if ur_x is not None and ur_y is not None else None,
             'row_height': row_height,
+            'site_width': site_width / units if site_width and units else None,
+            'row_origin': (row_origin[0] / units, row_origin[1] / units) if row_origin and units else None,
             'instance_groups': instance_groups
         }
         
@@ -77,18 +351,30 @@ def parse_def_file(def_file_path):
         return None
 
 
-if __name__ == "__main__":
-    import sys
-    if len(sys.argv) < 2:
-        print("用法: python def_parser.py <def_file_path>")
-        sys.exit(1)
-    
-    results = parse_def_file(sys.argv[1])
+def analyze_def_file(def_file_path):
+    """分析DEF文件并打印结果"""
+    print(f"正在分析DEF文件: {def_file_path}")
+    results = parse_def_file(def_file_path)
     if results:
+        print("\n提取的参数:")
         print(f"版图长度单位: {results['units']}")
         print(f"版图尺寸: {results['dimensions']}")
         print(f"Row高度: {results['row_height']}")
+        print(f"Site宽度: {results['site_width']}")
         print(f"Instance groups数量: {len(results['instance_groups'])}")
         print("Instance groups列表:")
         for group in results['instance_groups']:
             print(f"  - {group}")
+        return results
+    else:
+        print("DEF文件解析失败")
+        return None
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) < 2:
+        print("用法: python def_parser.py <def_file_path>")
+        sys.exit(1)
+    
+    analyze_def_file(sys.argv[1])
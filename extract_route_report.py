@@ -1,16 +1,62 @@
 import re
 import sys
 import os
+import mmap
 
-def extract_data_from_logv(logv_file):
+from timing_report_parser import extract_timing_data
+
+# 报告块中搜索的行数：总线长在命令后200行内，过孔统计的Total行在统计表头后50行内
+SUMMARY_SEARCH_LINES = 200
+VIA_SEARCH_LINES = 50
+# 从文件末尾向上搜索结束行的行数
+ENDING_SEARCH_LINES = 50
+
+SUMMARY_CMD = b"<CMD> report_route -summary"
+ENDING_MARK = "--- Ending \"Innovus\""
+
+
+def _skip_lines_forward(mm, start, count):
+    """返回从start开始count行之后的字节位置（不超过文件末尾）"""
+    pos = start
+    for _ in range(count):
+        newline = mm.find(b"\n", pos)
+        if newline < 0:
+            return len(mm)
+        pos = newline + 1
+    return pos
+
+
+def _skip_lines_backward(mm, count):
+    """返回文件最后count行的起始字节位置"""
+    end = len(mm)
+    # 文件以换行结尾时，最后的换行不算一行
+    if end > 0 and mm[end - 1:end] == b"\n":
+        end -= 1
+    for _ in range(count):
+        newline = mm.rfind(b"\n", 0, end)
+        if newline < 0:
+            return 0
+        end = newline
+    return end + 1
+
+
+def _decode_lines(mm, start, end):
+    return mm[start:end].decode('utf-8', errors='ignore').splitlines()
+
+
+def extract_data_from_logv(logv_file, with_timing=False):
     """
-    从innovus生成的logv文件中提取总线长、总过孔数和总运行时间
+    从innovus生成的logv文件中提取总线长、总过孔数和总运行时间。
+    用mmap映射文件，从末尾反向查找最后一个report_route -summary块和结束行，只解码这两段字节，
+    内存占用和耗时与日志大小无关
     
     参数:
         logv_file (str): logv文件路径
+        with_timing (bool): 是否同时读取logv所在目录下timeDesign的时序报告
     
     返回:
-        dict: 包含提取数据的字典，键有 'total_net_length', 'total_via_count', 'total_runtime'
+        dict: 包含提取数据的字典，键有 'total_net_length', 'total_via_count', 'total_runtime'；
+              with_timing时另有 'wns', 'tns', 'violating_paths', 'drv_count', 'timing_stage'
     """
     # 初始化结果字典
     result = {
@@ -18,62 +64,187 @@ def extract_data_from_logv(logv_file):
         'total_via_count': None,
         'total_runtime': None
     }
+    if with_timing:
+        result.update(extract_timing_data(os.path.dirname(os.path.abspath(logv_file))))
     
     try:
-        # 按行读取文件
-        with open(logv_file, 'r', encoding='utf-8', errors='ignore') as f:
-            lines = f.readlines()
+        with open(logv_file, 'rb') as f:
+            # 空文件不能映射
+            if os.fstat(f.fileno()).st_size == 0:
+                print(f"未在 {logv_file} 中找到 report_route -summary 命令")
+                return result
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                # 使用最后一个报告块
+                cmd_pos = mm.rfind(SUMMARY_CMD)
+                if cmd_pos < 0:
+                    print(f"未在 {logv_file} 中找到 report_route -summary 命令")
+                    return result
+                block_start = mm.rfind(b"\n", 0, cmd_pos) + 1
+                block_end = _skip_lines_forward(mm, block_start, SUMMARY_SEARCH_LINES + VIA_SEARCH_LINES)
+                block = _decode_lines(mm, block_start, block_end)
+                tail = _decode_lines(mm, _skip_lines_backward(mm, ENDING_SEARCH_LINES), len(mm))
     except Exception as e:
         print(f"读取文件时出错: {e}")
         return result
     
-    # 查找 report_route -summary 命令的所有位置
-    summary_positions = []
-    for i, line in enumerate(lines):
-        if "<CMD> report_route -summary" in line:
-            summary_positions.append(i)
-    
-    if not summary_positions:
-        print(f"未在 {logv_file} 中找到 report_route -summary 命令")
-        return result
-    
-    # 使用最后一个报告块
-    pos = summary_positions[-1]
-    
     # 提取总线长 - 从命令位置向下搜索
-    for j in range(pos, min(pos + 200, len(lines))):
-        if "Total net length =" in lines[j]:
-            wire_match = re.search(r'Total net length = ([\d\.]+)', lines[j])
+    for line in block[:SUMMARY_SEARCH_LINES]:
+        if "Total net length =" in line:
+            wire_match = re.search(r'Total net length = ([\d\.]+)', line)
             if wire_match:
                 result['total_net_length'] = float(wire_match.group(1))
             break
     
     # 提取总过孔数 - 先找到 Via Count Statistics 部分
     via_section_start = -1
-    for j in range(pos, min(pos + 200, len(lines))):
-        if "Via Count Statistics :" in lines[j]:
+    for j in range(min(SUMMARY_SEARCH_LINES, len(block))):
+        if "Via Count Statistics :" in block[j]:
             via_section_start = j
             break
     
     # 在该部分中查找 Total 行
-    if via_section_start > 0:
-        for j in range(via_section_start, min(via_section_start + 50, len(lines))):
-            if "|     Total      |" in lines[j]:
-                via_match = re.search(r'\|\s+Total\s+\|\s+(\d+)\s+\|', lines[j])
+    if via_section_start >= 0:
+        for line in block[via_section_start:via_section_start + VIA_SEARCH_LINES]:
+            if "|     Total      |" in line:
+                via_match = re.search(r'\|\s+Total\s+\|\s+(\d+)\s+\|', line)
                 if via_match:
                     result['total_via_count'] = int(via_match.group(1))
                 break
     
-    # 从最后一行提取总运行时间
-    for i in range(len(lines)-1, max(0, len(lines)-50), -1):  # 从末尾向上搜索最多50行
-        if "--- Ending \"Innovus\"" in lines[i]:
-            time_match = re.search(r'\[\d+/\d+ \d+:\d+:\d+\s+(\d+)s\]', lines[i])
+    # 从最后几行提取总运行时间
+    for line in reversed(tail):
+        if ENDING_MARK in line:
+            time_match = re.search(r'\[\d+/\d+ \d+:\d+:\d+\s+(\d+)s\]', line)
             if time_match:
                 result['total_runtime'] = int(time_match.group(1))
             break
     
     return result
 
+# 报告块之前最近的阶段命令决定报告所属的阶段
+STAGE_COMMANDS = [
+    ("optDesign -postRoute", "postroute_opt"),
+    ("routeDesign", "route"),
+    ("place_opt_design", "place"),
+]
+
+LOGV_TIME_PATTERN = re.compile(r'^\[\d+/\d+ \d+:\d+:\d+\s+(\d+)s\]')
+SESSION_CPU_PATTERN = re.compile(r'totSessionCpu\s*=\s*(\d+):(\d+):(\d+)')
+VIA_ROW_PATTERN = re.compile(r'^\|\s*(\S+)\s*\|\s*(\d+)\s*\|')
+
+
+def _stage_of_command(line):
+    """返回<CMD>行对应的阶段名，不是阶段命令时返回None"""
+    for command, stage in STAGE_COMMANDS:
+        if f"<CMD> {command}" in line:
+            return stage
+    return None
+
+
+def extract_stage_reports(logv_file):
+    """
+    一次流式读取logv，解析每个report_route -summary块（布局后、布线后、postRoute优化后），
+    返回每个阶段的记录，优化器可以用任一阶段作为适应度而不必重新读取日志
+    
+    参数:
+        logv_file (str): logv文件路径
+    
+    返回:
+        list: 按日志顺序的阶段记录，每个为dict，键有
+            'stage': place、route、postroute_opt（无法判断时为report_<序号>）
+            'total_net_length', 'total_via_count': 同extract_data_from_logv
+            'via_counts': 各层过孔数 {层名: 数量}
+            'wall_time': 从阶段命令到报告的秒数（logv时间戳之差）
+            'cpu_time': 阶段内totSessionCpu的增量（秒），日志中没有时为None
+        读取失败时返回空列表
+    """
+    reports = []
+    current = None          # 正在解析的报告块
+    in_via_table = False
+    stage = None
+    stage_start = None      # 阶段命令的logv时间戳（秒）
+    stage_cpu_start = None  # 阶段开始前最后的totSessionCpu
+    last_time = None
+    last_cpu = None
+    
+    try:
+        with open(logv_file, 'r', encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                time_match = LOGV_TIME_PATTERN.match(line)
+                if time_match:
+                    last_time = int(time_match.group(1))
+                cpu_match = SESSION_CPU_PATTERN.search(line)
+                if cpu_match:
+                    hours, minutes, seconds = map(int, cpu_match.groups())
+                    last_cpu = hours * 3600 + minutes * 60 + seconds
+                
+                if "<CMD>" in line:
+                    if "<CMD> report_route -summary" in line:
+                        cpu_time = None
+                        if last_cpu is not None:
+                            cpu_time = last_cpu - (stage_cpu_start or 0)
+                        current = {
+                            'stage': stage or f"report_{len(reports)}",
+                            'total_net_length': None,
+                            'total_via_count': None,
+                            'via_counts': {},
+                            'wall_time': last_time - stage_start if last_time is not None and stage_start is not None else None,
+                            'cpu_time': cpu_time,
+                        }
+                        reports.append(current)
+                        in_via_table = False
+                        # 同一阶段的后续报告不再归属该阶段
+                        stage = None
+                        stage_start = last_time
+                        stage_cpu_start = last_cpu
+                        continue
+                    current = None
+                    new_stage = _stage_of_command(line)
+                    if new_stage is not None:
+                        stage = new_stage
+                        stage_start = last_time
+                        stage_cpu_start = last_cpu
+                    continue
+                
+                if current is None:
+                    continue
+                if current['total_net_length'] is None and "Total net length =" in line:
+                    wire_match = re.search(r'Total net length = ([\d\.]+)', line)
+                    if wire_match:
+                        current['total_net_length'] = float(wire_match.group(1))
+                elif "Via Count Statistics :" in line:
+                    in_via_table = True
+                elif in_via_table:
+                    row_match = VIA_ROW_PATTERN.match(line.strip())
+                    if row_match:
+                        if row_match.group(1) == "Total":
+                            current['total_via_count'] = int(row_match.group(2))
+                            in_via_table = False
+                        else:
+                            current['via_counts'][row_match.group(1)] = int(row_match.group(2))
+    except Exception as e:
+        print(f"读取文件时出错: {e}")
+        return []
+    
+    return reports
+
+
+def stage_report(reports, stage):
+    """
+    从extract_stage_reports的结果中取指定阶段的最后一个记录
+    
+    参数:
+        reports: extract_stage_reports的结果
+        stage: 阶段名
+    
+    返回:
+        dict: 阶段记录，没有该阶段时返回None
+    """
+    for report in reversed(reports):
+        if report['stage'] == stage:
+            return report
+    return None
+
 def print_results(data):
     """打印提取的数据"""
     print("\n=== 提取的报告数据 ===")
@@ -95,12 +266,27 @@ def print_results(data):
     
     print("======================\n")
 
+def print_stage_reports(reports):
+    """打印各阶段的报告记录"""
+    print("\n=== 各阶段的报告数据 ===")
+    if not reports:
+        print("未找到 report_route -summary 报告")
+    for report in reports:
+        wall_time = f"{report['wall_time']} 秒" if report['wall_time'] is not None else "未知"
+        cpu_time = f"{report['cpu_time']} 秒" if report['cpu_time'] is not None else "未知"
+        print(f"[{report['stage']}] 总线长: {report['total_net_length']} um, 总过孔数: {report['total_via_count']}, "
+              f"运行时间: {wall_time}, CPU时间: {cpu_time}")
+        for layer, count in report['via_counts'].items():
+            print(f"    {layer}: {count}")
+    print("======================\n")
+
 def main():
     """主函数，处理命令行参数"""
     import argparse
     
     parser = argparse.ArgumentParser(description='从innovus logv文件中提取路由报告数据')
     parser.add_argument('logv_file', help='logv文件路径')
+    parser.add_argument('--stages', action='store_true', help='打印每个report_route -summary块（各阶段）的记录')
     
     args = parser.parse_args()
     
@@ -108,6 +294,10 @@ def main():
         print(f"错误: 文件 '{args.logv_file}' 不存在")
         return 1
     
+    if args.stages:
+        print_stage_reports(extract_stage_reports(args.logv_file))
+        return 0
+    
     # 提取数据
     data = extract_data_from_logv(args.logv_file)
     
@@ -123,6 +313,7 @@ if __name__ == "__main__":
 '''
 使用示例:
 python extract_route_report.py innovus_output_1x/case_1_1x_100/case_1_1x_100_route/case_1_1x_100_route.logv
+python extract_route_report.py --stages innovus_output_1x/case_1_1x_100/case_1_1x_100_route/case_1_1x_100_route.logv
 
 
 
@@ -141,4 +332,9 @@ total_net_length = data['total_net_length']  # 总线长
 total_via_count = data['total_via_count']    # 总过孔数
 total_runtime = data['total_runtime']        # 总运行时间
 
+# 一次读取所有阶段（布局后、布线后、postRoute优化后）的报告
+from extract_route_report import extract_stage_reports, stage_report
+reports = extract_stage_reports("your_logv_file.logv")
+placed = stage_report(reports, "place")      # {'stage', 'total_net_length', 'total_via_count', 'via_counts', 'wall_time', 'cpu_time'}
+
 '''
\ No newline at end of file
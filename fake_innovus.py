@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+用于测试的假Innovus
+接受与innovus相同的 -no_gui -files <tcl> 参数，按TCL中的setMultiCpuUsage取得-localCpu，
+睡眠一段时间后在当前目录写出与Innovus格式一致的innovus.logv（含report_route -summary和结束行），
+extract_data_from_logv可以直接解析。总线长由source的约束文件内容决定，同一约束结果相同
+
+TCL中有routeDesign时再睡眠一次并写出布线后的报告，可以用来测试logv监控提前结束任务；
+有optDesign -postRoute时同样再写出一次优化后的报告。每个阶段结束时输出totSessionCpu，报告中含各层过孔数
+
+环境变量:
+    FAKE_INNOVUS_SECONDS  每个阶段睡眠的秒数，默认1
+    FAKE_INNOVUS_FAIL     为1时以返回码1退出
+    FAKE_INNOVUS_HANG     为1时在布局后停止输出日志并一直等待，模拟卡住的运行
+"""
+
+import os
+import re
+import sys
+import time
+import zlib
+import argparse
+import datetime
+
+
+# 伪造报告中各层的过孔数，合计为Total行的数值
+FAKE_VIA_COUNTS = [("V12", 30211), ("V23", 17456), ("V34", 6120), ("V45", 1746)]
+
+
+def fake_net_length(tcl_content):
+    """由TCL中source的约束文件内容（从布局结果继续布线时为恢复的设计路径）生成一个确定的伪造总线长"""
+    seed = 0
+    for constraint_file in re.findall(r'^source\s+(\S+)', tcl_content, re.M):
+        try:
+            with open(constraint_file, 'rb') as f:
+                seed = zlib.crc32(f.read(), seed)
+        except OSError:
+            pass
+    for placed_design in re.findall(r'^restoreDesign\s+(\S+\.postPlace\.enc\.dat)', tcl_content, re.M):
+        seed = zlib.crc32(placed_design.encode('utf-8'), seed)
+    return 100000.0 + (seed % 200000) / 10.0
+
+
+def fake_save_design(tcl_content):
+    """为TCL中的saveDesign创建对应的.dat目录，使检查点和布局后设计的存在性检查可以通过"""
+    variables = dict(re.findall(r'^set\s+(\w+)\s+(\S+)\s*$', tcl_content, re.M))
+    for target in re.findall(r'^saveDesign\s+(\S+)', tcl_content, re.M):
+        target = re.sub(r'\$\{(\w+)\}', lambda m: variables.get(m.group(1), m.group(0)), target)
+        os.makedirs(f"{target}.dat", exist_ok=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='用于测试的假Innovus')
+    parser.add_argument('-no_gui', action='store_true')
+    parser.add_argument('-files', required=True)
+    parser.add_argument('-log', default='innovus')
+    args = parser.parse_args()
+
+    with open(args.files, 'r') as f:
+        tcl_content = f.read()
+    local_cpu = re.findall(r'setMultiCpuUsage -localCpu (\S+)', tcl_content)
+    seconds = float(os.environ.get("FAKE_INNOVUS_SECONDS", "1"))
+    start = time.time()
+
+    logv_file = f"{args.log}.logv"
+    with open(logv_file, 'w') as logv:
+        def log(line):
+            stamp = datetime.datetime.now().strftime("%m/%d %H:%M:%S")
+            logv.write(f"[{stamp} {int(time.time() - start):>6}s] {line}\n")
+            logv.flush()
+
+        log(f"<CMD> setMultiCpuUsage -localCpu {local_cpu[0] if local_cpu else 'max'}")
+        log("<CMD> place_opt_design")
+        time.sleep(seconds)
+        net_length = fake_net_length(tcl_content)
+
+        def report_route():
+            log("<CMD> report_route -summary")
+            logv.write(f"Total net length = {net_length:.3f}\n")
+            logv.write("Via Count Statistics :\n")
+            logv.write("+----------------+-----------+\n")
+            for layer, count in FAKE_VIA_COUNTS:
+                logv.write(f"|     {layer:<10} |   {count:<5}   |\n")
+            logv.write("+----------------+-----------+\n")
+            logv.write(f"|     Total      |   {sum(count for _, count in FAKE_VIA_COUNTS)}   |\n")
+            logv.write("+----------------+-----------+\n")
+            logv.flush()
+
+        def finish_stage(command):
+            elapsed = int(time.time() - start)
+            cpu = elapsed * (int(local_cpu[0]) if local_cpu and local_cpu[0].isdigit() else 1)
+            logv.write(f"**{command} ... cpu = 0:00:{elapsed:02d}, real = 0:00:{elapsed:02d}, mem = 100.0M, "
+                       f"totSessionCpu=0:{cpu // 60:02d}:{cpu % 60:02d} **\n")
+
+        finish_stage("place_opt_design")
+        report_route()
+        fake_save_design(tcl_content)
+        if os.environ.get("FAKE_INNOVUS_HANG") == "1":
+            while True:
+                time.sleep(60)
+        if re.search(r'^routeDesign', tcl_content, re.M):
+            log("<CMD> routeDesign -globalDetail")
+            time.sleep(seconds)
+            net_length *= 1.1
+            finish_stage("routeDesign")
+            report_route()
+        if re.search(r'^optDesign -postRoute', tcl_content, re.M):
+            log("<CMD> optDesign -postRoute")
+            time.sleep(seconds)
+            net_length *= 0.99
+            finish_stage("optDesign")
+            report_route()
+        if os.environ.get("FAKE_INNOVUS_FAIL") == "1":
+            return 1
+        log("--- Ending \"Innovus\" (totcpu=0:00:01, real=0:00:01, mem=100.0M) ---")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+
+'''
+调用方式:
+INNOVUS_CMD="python /path/to/fake_innovus.py" python run_innovus_dse_GA.py -c PE_array -b Boundary_Badoverlap_i100 --licenses 2
+
+FAKE_INNOVUS_SECONDS=0.2 python fake_innovus.py -no_gui -files PE_array__b__70__1.tcl
+'''
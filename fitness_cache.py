@@ -0,0 +1,171 @@
+"""
+适应度缓存模块
+以约束文件内容的规范化哈希为键，持久化保存extract_data_from_logv的结果，
+内容相同的约束文件不再重复运行Innovus
+"""
+
+import os
+import re
+import json
+import fcntl
+import hashlib
+import tempfile
+import threading
+
+# 独立的数值token（不匹配名称中的数字，如gen_PE_row_0）
+NUMBER_PATTERN = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])')
+
+
+def _normalize_number(match):
+    """将数值规范化，消除 23 / 23.0 / 3.1690000000000005 之类的写法差异"""
+    text = f"{float(match.group(0)):.6f}".rstrip('0').rstrip('.')
+    return "0" if text == "-0" else text
+
+
+def canonical_constraint_text(content):
+    """
+    生成约束文件的规范化文本：去掉注释和空行，合并空白，规范化数值
+
+    参数:
+        content (str): 约束文件内容
+
+    返回:
+        str: 规范化后的文本
+    """
+    lines = []
+    for line in content.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        line = ' '.join(line.split())
+        lines.append(NUMBER_PATTERN.sub(_normalize_number, line))
+    return '\n'.join(lines)
+
+
+def constraint_hash(constraint_file, case, core_utilization, ending_point):
+    """
+    计算约束文件的缓存键
+
+    参数:
+        constraint_file: 约束文件路径
+        case: 案例名称
+        core_utilization: 核心利用率
+        ending_point: 流程终点（place或route）
+
+    返回:
+        str: sha256十六进制摘要
+    """
+    with open(constraint_file, 'r', encoding='utf-8', errors='ignore') as f:
+        content = f.read()
+    digest = hashlib.sha256()
+    digest.update(f"{case}\n{core_utilization}\n{ending_point}\n".encode('utf-8'))
+    digest.update(canonical_constraint_text(content).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class FitnessCache:
+    """持久化的适应度缓存，线程安全，每次写入都原子地落盘"""
+
+    def __init__(self, cache_file="fitness_cache.json"):
+        """
+        初始化缓存，如果缓存文件已存在则载入
+
+        参数:
+            cache_file: 缓存文件路径
+        """
+        self.cache_file = cache_file
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+        if os.path.exists(cache_file):
+            try:
+                with open(cache_file, 'r') as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"读取适应度缓存 {cache_file} 时出错，将使用空缓存: {e}")
+
+    def lookup(self, constraint_file, case, core_utilization, ending_point="place", with_timing=False):
+        """
+        查询约束文件对应的指标
+
+        参数:
+            with_timing: 需要时序数据时，没有读取时序的缓存项（无tns字段）按未命中处理，重新评估后覆盖
+
+        返回:
+            tuple: (缓存键, 指标字典)，未命中时指标字典为None
+        """
+        key = constraint_hash(constraint_file, case, core_utilization, ending_point)
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None and with_timing and 'tns' not in data:
+                data = None
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return key, (dict(data) if data is not None else None)
+
+    def store(self, key, data):
+        """
+        保存一次成功评估的指标，总线长缺失的结果不缓存
+
+        参数:
+            key: lookup返回的缓存键
+            data: extract_data_from_logv返回的字典
+        """
+        if data.get('total_net_length') is None:
+            return
+        with self._lock:
+            self._entries[key] = dict(data)
+            self._save(key)
+
+    def _read_disk(self):
+        """读取缓存文件中的条目，文件不存在或损坏时返回空字典"""
+        try:
+            with open(self.cache_file, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, key):
+        """
+        把一个条目合并进缓存文件。多个优化进程可能共用同一个缓存文件：持有文件锁期间重新读取磁盘上的条目，
+        只覆盖本次写入的键，其他进程写入的条目保留并同步到内存；先写唯一的临时文件再原子替换，
+        中断时不会留下损坏的缓存文件
+        """
+        cache_dir = os.path.dirname(os.path.abspath(self.cache_file))
+        with open(f"{self.cache_file}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                entries = self._read_disk()
+                entries[key] = self._entries[key]
+                fd, tmp_file = tempfile.mkstemp(prefix=f".{os.path.basename(self.cache_file)}.", dir=cache_dir)
+                try:
+                    os.fchmod(fd, 0o644)
+                    with os.fdopen(fd, 'w') as f:
+                        json.dump(entries, f)
+                    os.replace(tmp_file, self.cache_file)
+                except BaseException:
+                    if os.path.exists(tmp_file):
+                        os.remove(tmp_file)
+                    raise
+                self._entries = entries
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+'''
+调用方式:
+from fitness_cache import FitnessCache
+
+cache = FitnessCache("fitness_cache.json")
+key, data = cache.lookup("constraint/PE_array__boundary__70__5.txt", "PE_array", "70", "place")
+if data is None:
+    # 运行Innovus并提取结果
+    data = extract_data_from_logv(logv_path)
+    cache.store(key, data)
+'''
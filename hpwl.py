@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+半周长线长（HPWL）计算模块
+一次流式读取place_opt_design之后写出的postPlace.def：COMPONENTS的放置位置、PINS的顶层引脚位置、
+NETS的连接关系和GROUPS的实例分组，用numpy按线网分段归约计算每个线网和总的HPWL，
+并按instance_groups（区域名）分别统计组内线网。引脚位置默认取单元原点，提供LEF时加上引脚偏移。
+可以作为不运行布线的快速适应度代理，也可以用来诊断各区域的线长分布
+"""
+
+import re
+import sys
+import argparse
+
+import numpy as np
+
+from def_parser import iter_def_statements, parse_component, parse_pin, parse_net, parse_group
+
+# 跨越多个分组的线网和不属于任何分组的线网在分区统计中的键
+CROSS_GROUP = "cross_group"
+UNGROUPED = "ungrouped"
+
+
+def parse_lef_pin_offsets(lef_file):
+    """
+    从LEF中读取各单元的尺寸和引脚偏移（引脚第一个RECT的中心）
+
+    参数:
+        lef_file: LEF文件路径
+
+    返回:
+        dict: 单元名 -> {'size': (宽, 高), 'pins': {引脚名: (dx, dy)}}，单位为微米
+    """
+    macros = {}
+    macro = None
+    pin = None
+    in_port = False
+    with open(lef_file, 'r', encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            tokens = line.split()
+            if not tokens:
+                continue
+            keyword = tokens[0]
+            if keyword == 'MACRO' and len(tokens) > 1:
+                macro = {'size': (0.0, 0.0), 'pins': {}}
+                macros[tokens[1]] = macro
+            elif macro is None:
+                continue
+            elif keyword == 'SIZE' and len(tokens) > 3:
+                macro['size'] = (float(tokens[1]), float(tokens[3]))
+            elif keyword == 'PIN' and len(tokens) > 1:
+                pin = tokens[1]
+            elif keyword == 'PORT':
+                in_port = True
+            elif keyword == 'RECT' and in_port and pin is not None and pin not in macro['pins']:
+                values = [float(token) for token in tokens[1:] if re.match(r'^-?[\d.]+$', token)]
+                if len(values) >= 4:
+                    macro['pins'][pin] = ((values[0] + values[2]) / 2, (values[1] + values[3]) / 2)
+            elif keyword == 'END' and len(tokens) > 1:
+                if tokens[1] == pin:
+                    pin = None
+                    in_port = False
+                elif macro is not None and tokens[1] in macros and macros[tokens[1]] is macro:
+                    macro = None
+            elif keyword == 'END':
+                in_port = False
+    return macros
+
+
+def orient_offset(dx, dy, width, height, orient):
+    """
+    按DEF方向变换单元内的引脚偏移（DEF中的放置位置是变换后包围盒的左下角）
+
+    参数:
+        dx, dy: 引脚在N方向单元中的偏移
+        width, height: 单元尺寸
+        orient: N/S/E/W/FN/FS/FE/FW
+
+    返回:
+        tuple: 变换后的偏移
+    """
+    if orient == 'S':
+        return width - dx, height - dy
+    if orient == 'W':
+        return height - dy, dx
+    if orient == 'E':
+        return dy, width - dx
+    if orient == 'FN':
+        return width - dx, dy
+    if orient == 'FS':
+        return dx, height - dy
+    if orient == 'FW':
+        return dy, dx
+    if orient == 'FE':
+        return height - dy, width - dx
+    return dx, dy
+
+
+class GroupMatcher:
+    """按GROUPS中的实例名模式把实例映射到分组（区域）名；形如 a/b/* 的模式按层次前缀查表"""
+
+    def __init__(self, groups):
+        """
+        参数:
+            groups: parse_group的结果列表，分组名取其REGION（与instance_groups一致），没有时取组名
+        """
+        self.prefixes = {}
+        self.patterns = []
+        for group in groups:
+            name = group['region'] or group['name']
+            for pattern in group['patterns']:
+                if pattern.endswith('/*') and not re.search(r'[*?\[]', pattern[:-2]):
+                    self.prefixes[pattern[:-1]] = name
+                else:
+                    regex = re.escape(pattern).replace(r'\*', '.*').replace(r'\?', '.')
+                    self.patterns.append((re.compile(regex + '$'), name))
+
+    def match(self, instance):
+        """
+        返回实例所属的分组名，不属于任何分组时返回None
+        """
+        if self.prefixes:
+            index = instance.find('/')
+            while index >= 0:
+                name = self.prefixes.get(instance[:index + 1])
+                if name is not None:
+                    return name
+                index = instance.find('/', index + 1)
+        for regex, name in self.patterns:
+            if regex.match(instance):
+                return name
+        return None
+
+
+def load_def_netlist(def_file, lef_macros=None):
+    """
+    一次读取DEF，得到计算HPWL所需的引脚坐标数组
+
+    参数:
+        def_file: DEF文件路径（需要含COMPONENTS放置信息和NETS连接关系）
+        lef_macros: parse_lef_pin_offsets的结果，为None时引脚取单元原点
+
+    返回:
+        dict: 'units'（DEF单位/微米）, 'net_names', 'pin_x', 'pin_y'（DEF单位）, 'net_starts'（每个线网第一个引脚的下标）,
+              'pin_group'（每个引脚所属分组的编号，-1表示不属于任何分组）, 'group_names'
+    """
+    units = None
+    # 已放置的实例和顶层引脚（键为 PIN/<引脚名>）统一编号
+    node_index = {}
+    node_x = []
+    node_y = []
+    node_component = []
+    groups = []
+    net_names = []
+    net_starts = []
+    pin_node = []
+    pin_names = []
+    for section, tokens in iter_def_statements(def_file, {None, 'COMPONENTS', 'PINS', 'NETS', 'GROUPS'}):
+        if section == 'NETS':
+            net = parse_net(tokens)
+            if net is None:
+                continue
+            start = len(pin_node)
+            for instance, pin_name in net['pins']:
+                node = node_index.get(f"PIN/{pin_name}" if instance == 'PIN' else instance)
+                if node is not None:
+                    pin_node.append(node)
+                    pin_names.append(pin_name)
+            if len(pin_node) > start:
+                net_names.append(net['name'])
+                net_starts.append(start)
+        elif section == 'COMPONENTS':
+            component = parse_component(tokens)
+            if component is not None and component['location'] is not None:
+                node_index[component['name']] = len(node_x)
+                node_x.append(component['location'][0])
+                node_y.append(component['location'][1])
+                node_component.append(component)
+        elif section == 'PINS':
+            pin = parse_pin(tokens)
+            if pin is not None and pin['location'] is not None:
+                node_index[f"PIN/{pin['name']}"] = len(node_x)
+                node_x.append(pin['location'][0])
+                node_y.append(pin['location'][1])
+                node_component.append(None)
+        elif section == 'GROUPS':
+            group = parse_group(tokens)
+            if group is not None:
+                groups.append(group)
+        elif tokens[:3] == ['UNITS', 'DISTANCE', 'MICRONS'] and len(tokens) > 3:
+            units = int(tokens[3])
+    units = units or 1000
+
+    # 实例所属的分组
+    matcher = GroupMatcher(groups)
+    group_names = []
+    group_index = {}
+    node_group = np.full(len(node_x), -1, dtype=np.int64)
+    if groups:
+        for node, component in enumerate(node_component):
+            group = matcher.match(component['name']) if component is not None else None
+            if group is None:
+                continue
+            if group not in group_index:
+                group_index[group] = len(group_names)
+                group_names.append(group)
+            node_group[node] = group_index[group]
+
+    pin_node = np.array(pin_node, dtype=np.int64)
+    pin_x = np.array(node_x, dtype=np.float64)[pin_node] if len(pin_node) else np.zeros(0)
+    pin_y = np.array(node_y, dtype=np.float64)[pin_node] if len(pin_node) else np.zeros(0)
+    if lef_macros:
+        # 引脚偏移按(单元, 引脚, 方向)缓存
+        offsets = {}
+        for i, (node, pin_name) in enumerate(zip(pin_node.tolist(), pin_names)):
+            component = node_component[node]
+            if component is None:
+                continue
+            key = (component['model'], pin_name, component['orient'])
+            offset = offsets.get(key)
+            if offset is None:
+                macro = lef_macros.get(component['model'])
+                if macro is not None and pin_name in macro['pins']:
+                    dx, dy = macro['pins'][pin_name]
+                    dx, dy = orient_offset(dx, dy, macro['size'][0], macro['size'][1], component['orient'])
+                    offset = (dx * units, dy * units)
+                else:
+                    offset = (0.0, 0.0)
+                offsets[key] = offset
+            pin_x[i] += offset[0]
+            pin_y[i] += offset[1]
+
+    return {
+        'units': units,
+        'net_names': net_names,
+        'pin_x': pin_x,
+        'pin_y': pin_y,
+        'net_starts': np.array(net_starts, dtype=np.int64),
+        'pin_group': node_group[pin_node] if len(pin_node) else np.zeros(0, dtype=np.int64),
+        'group_names': group_names,
+    }
+
+
+def net_hpwl(netlist):
+    """
+    计算每个线网的HPWL
+
+    参数:
+        netlist: load_def_netlist的结果
+
+    返回:
+        numpy.ndarray: 每个线网的HPWL（微米），与netlist['net_names']对应
+    """
+    starts = netlist['net_starts']
+    if len(starts) == 0:
+        return np.zeros(0)
+    x = netlist['pin_x']
+    y = netlist['pin_y']
+    width = np.maximum.reduceat(x, starts) - np.minimum.reduceat(x, starts)
+    height = np.maximum.reduceat(y, starts) - np.minimum.reduceat(y, starts)
+    return (width + height) / netlist['units']
+
+
+def group_breakdown(netlist, hpwl):
+    """
+    按分组统计HPWL：所有引脚都在同一分组内的线网计入该分组，其余计入CROSS_GROUP或UNGROUPED
+
+    参数:
+        netlist: load_def_netlist的结果
+        hpwl: net_hpwl的结果
+
+    返回:
+        dict: 分组名 -> {'nets': 线网数, 'hpwl': HPWL之和（微米）}
+    """
+    starts = netlist['net_starts']
+    groups = netlist['pin_group']
+    breakdown = {}
+    if len(starts) == 0:
+        return breakdown
+    low = np.minimum.reduceat(groups, starts)
+    high = np.maximum.reduceat(groups, starts)
+    # 每个线网的分组编号：-2表示跨分组，-1表示不属于任何分组
+    net_group = np.where(low == high, low, -2)
+    names = {-2: CROSS_GROUP, -1: UNGROUPED}
+    names.update(enumerate(netlist['group_names']))
+    counts = np.bincount(net_group + 2, minlength=len(netlist['group_names']) + 2)
+    sums = np.bincount(net_group + 2, weights=hpwl, minlength=len(netlist['group_names']) + 2)
+    for index, name in names.items():
+        if counts[index + 2]:
+            breakdown[name] = {'nets': int(counts[index + 2]), 'hpwl': float(sums[index + 2])}
+    return breakdown
+
+
+def compute_hpwl(def_file, lef_file=None):
+    """
+    计算DEF的总HPWL和分组统计
+
+    参数:
+        def_file: DEF文件路径
+        lef_file: LEF文件路径，为None时引脚取单元原点
+
+    返回:
+        dict: 'total_hpwl'（微米）, 'net_count', 'net_names', 'net_hpwl'（numpy数组）, 'groups'（group_breakdown的结果）；
+              读取失败时返回None
+    """
+    try:
+        lef_macros = parse_lef_pin_offsets(lef_file) if lef_file else None
+        netlist = load_def_netlist(def_file, lef_macros)
+    except Exception as e:
+        print(f"计算HPWL时出错: {e}")
+        return None
+    hpwl = net_hpwl(netlist)
+    return {
+        'total_hpwl': float(hpwl.sum()),
+        'net_count': len(hpwl),
+        'net_names': netlist['net_names'],
+        'net_hpwl': hpwl,
+        'groups': group_breakdown(netlist, hpwl),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='从布局后的DEF计算半周长线长（HPWL）')
+    parser.add_argument('def_file', help='DEF文件路径，如 case__.../PE_array.postPlace.def')
+    parser.add_argument('--lef', default=None, help='LEF文件路径，提供时使用引脚偏移')
+    parser.add_argument('--top', type=int, default=0, help='打印HPWL最大的若干个线网')
+    args = parser.parse_args()
+
+    result = compute_hpwl(args.def_file, args.lef)
+    if result is None:
+        return 1
+    print(f"线网数: {result['net_count']}")
+    print(f"总HPWL: {result['total_hpwl']:.3f} um")
+    for name, stats in sorted(result['groups'].items(), key=lambda item: -item[1]['hpwl']):
+        print(f"  {name}: {stats['nets']} 个线网, HPWL {stats['hpwl']:.3f} um")
+    if args.top:
+        for index in np.argsort(result['net_hpwl'])[::-1][:args.top]:
+            print(f"  {result['net_names'][index]}: {result['net_hpwl'][index]:.3f} um")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+
+'''
+调用方式:
+python hpwl.py /mnt/hgfs/vm_share/eda/innovus_output_dse/case__PE_array__...__iter__5/PE_array.postPlace.def
+python hpwl.py PE_array.postPlace.def --lef tech_and_cells.lef --top 20
+
+from hpwl import compute_hpwl
+result = compute_hpwl("PE_array.postPlace.def")
+print(result['total_hpwl'], result['groups']['gen_PE_row_0'])
+'''
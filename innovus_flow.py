@@ -0,0 +1,737 @@
+"""
+Innovus流程脚本生成模块
+用Python按阶段（布局规划、约束、布局、布线、布线后优化、时序）拼接TCL流程脚本，
+约束文件通过source引用而不是内联；同一(case, core_utilization)的布局规划保存为检查点，
+后续运行直接restoreDesign。DSE脚本在进程内调用，每次评估只需启动一次innovus
+"""
+
+import os
+import re
+import sys
+import shutil
+import time
+import string
+import socket
+import hashlib
+import argparse
+import subprocess
+
+from innovus_scheduler import INNOVUS_CMD
+
+from logv_monitor import wait_process
+
+# 库和综合结果路径
+LEF_FILES = [
+    "/mnt/hgfs/vm_share/eda/lib/asap_project/asap7sc7p5t_28/techlef_misc/asap7_tech_1x_201209.lef",
+    "/mnt/hgfs/vm_share/eda/lib/asap_project/asap7sc7p5t_28/LEF/asap7sc7p5t_28_L_1x_220121a.lef",
+    "/mnt/hgfs/vm_share/eda/lib/asap_project/asap7sc7p5t_28/LEF/asap7sc7p5t_28_R_1x_220121a.lef",
+    "/mnt/hgfs/vm_share/eda/lib/asap_project/asap7sc7p5t_28/LEF/asap7sc7p5t_28_SL_1x_220121a.lef",
+    "/mnt/hgfs/vm_share/eda/lib/asap_project/asap7sc7p5t_28/LEF/asap7sc7p5t_28_SRAM_1x_220121a.lef",
+]
+# 共享的MMMC文件，只作为模板读取，不再修改；每个任务在自己的运行目录生成一份指向本案例SDC的副本
+MMMC_FILE = "/mnt/hgfs/vm_share/eda/lib/asap_project/asap.view"
+JOB_VIEW_NAME = "asap.view"
+SYNTH_ROOT = "/mnt/hgfs/vm_share/eda/synproj_asap"
+# DSE输出目录的根目录
+OUTPUT_ROOT = "/mnt/hgfs/vm_share/eda/innovus_output_dse"
+# 布局规划检查点的根目录
+FLOORPLAN_CHECKPOINT_ROOT = "/mnt/hgfs/vm_share/eda/innovus_floorplan_checkpoint"
+# 检查点保存锁的最长持有时间（秒），超过后视为持有者已中断；保存锁在整个流程结束后才释放
+FLOORPLAN_LOCK_TIMEOUT = 6 * 3600
+
+USEFUL_SKEW_CELLS = "HB4xp67_ASAP7_75t_R HB3xp67_ASAP7_75t_R HB2xp67_ASAP7_75t_R HB1xp67_ASAP7_75t_R BUFx8_ASAP7_75t_R BUFx6f_ASAP7_75t_R BUFx5_ASAP7_75t_R BUFx4f_ASAP7_75t_R BUFx4_ASAP7_75t_R BUFx3_ASAP7_75t_R BUFx2_ASAP7_75t_R BUFx24_ASAP7_75t_R BUFx16f_ASAP7_75t_R BUFx12f_ASAP7_75t_R BUFx12_ASAP7_75t_R BUFx10_ASAP7_75t_R INVxp67_ASAP7_75t_R INVxp33_ASAP7_75t_R INVx8_ASAP7_75t_R INVx6_ASAP7_75t_R INVx5_ASAP7_75t_R INVx4_ASAP7_75t_R INVx3_ASAP7_75t_R INVx2_ASAP7_75t_R INVx1_ASAP7_75t_R INVx13_ASAP7_75t_R INVx11_ASAP7_75t_R CKINVDCx9p33_ASAP7_75t_R CKINVDCx8_ASAP7_75t_R CKINVDCx6p67_ASAP7_75t_R CKINVDCx5p33_ASAP7_75t_R CKINVDCx20_ASAP7_75t_R CKINVDCx16_ASAP7_75t_R CKINVDCx14_ASAP7_75t_R CKINVDCx12_ASAP7_75t_R CKINVDCx11_ASAP7_75t_R CKINVDCx10_ASAP7_75t_R"
+
+
+class FlowTemplate(string.Template):
+    """以@为占位符前缀的模板，避免与TCL的$变量冲突"""
+    delimiter = '@'
+
+
+# 各阶段的TCL模板，在导入时编译一次
+STAGE_TEMPLATES = {
+    'header': FlowTemplate('''set SRCPATH @src_path
+set TARPATH @tar_path
+set DESIGN @case
+
+
+setMultiCpuUsage -localCpu @local_cpu
+set_global _enable_mmmc_by_default_flow      $CTE::mmmc_default
+suppressMessage ENCEXT-2799
+win
+'''),
+    'floorplan': FlowTemplate('''set init_lef_file {@lef_files}
+set init_verilog ${SRCPATH}/${DESIGN}.mapped.v
+set init_mmmc_file @mmmc_file
+init_design
+
+setAnalysisMode -reset
+setAnalysisMode -analysisType onChipVariation -cppr both
+
+getIoFlowFlag
+setIoFlowFlag 0
+floorPlan -site asap7sc7p5t -r 1 @core_util_str 0.0 0.0 0.0 0.0
+uiSetTool select
+getIoFlowFlag
+fit
+'''),
+    'save_floorplan': FlowTemplate('''
+# 保存布局规划检查点，指纹最后写入，保存不完整时不会被复用
+file delete -force @checkpoint_dir/fingerprint
+saveDesign @checkpoint_dir/floorplan.enc
+set fp_file [open @checkpoint_dir/fingerprint w]
+puts $fp_file @fingerprint
+close $fp_file
+'''),
+    'restore_floorplan': FlowTemplate('''# 从布局规划检查点恢复
+restoreDesign @checkpoint_dir/floorplan.enc.dat ${DESIGN}
+setMultiCpuUsage -localCpu @local_cpu
+setAnalysisMode -reset
+setAnalysisMode -analysisType onChipVariation -cppr both
+'''),
+    'constraint': FlowTemplate('''
+
+# group information here
+source @constraint_file
+'''),
+    'place': FlowTemplate('''
+# Run placement
+setRouteMode -earlyGlobalHonorMsvRouteConstraint false -earlyGlobalRoutePartitionPinGuide true
+setEndCapMode -reset
+setEndCapMode -boundary_tap false
+setNanoRouteMode -quiet -droutePostRouteSpreadWire 1
+setNanoRouteMode -quiet -timingEngine {}
+setUsefulSkewMode -maxSkew false -noBoundary false -useCells {@useful_skew_cells} -maxAllowedDelay 1
+setPlaceMode -reset
+setPlaceMode -congEffort auto -timingDriven 1 -clkGateAware 1 -powerDriven 0 -ignoreScan 1 -reorderScan 1 -ignoreSpare 0 -placeIOPins 0 -moduleAwareSpare 0 -preserveRouting 0 -rmAffectedRouting 0 -checkRoute 0 -swapEEQ 0
+setPlaceMode -fp false
+setMultiCpuUsage -localCpu @local_cpu
+place_opt_design
+report_route -summary
+saveNetlist ${TARPATH}/${DESIGN}.postPlace.mapped.v
+defOut -floorplan -netlist -routing ${TARPATH}/${DESIGN}.postPlace.def
+'''),
+    'save_placed': FlowTemplate('''
+# 保存布局后的设计，晋级到布线时直接恢复，不再重新布局
+saveDesign ${TARPATH}/${DESIGN}.postPlace.enc
+'''),
+    'restore_placed': FlowTemplate('''# 从布局后的设计恢复
+restoreDesign @placed_dir/@case.postPlace.enc.dat ${DESIGN}
+setMultiCpuUsage -localCpu @local_cpu
+setAnalysisMode -reset
+setAnalysisMode -analysisType onChipVariation -cppr both
+'''),
+    'timing_preCTS': FlowTemplate('''
+
+timeDesign -preCTS -pathReports -drvReports -slackReports -numPaths 50 -prefix ${DESIGN}_preCTS -outDir ${TARPATH}/${DESIGN}_timingReports_preCTS
+'''),
+    'route': FlowTemplate('''
+# Routing
+setNanoRouteMode -quiet -timingEngine {}
+setNanoRouteMode -quiet -routeSelectedNetOnly 0
+setNanoRouteMode -quiet -routeTopRoutingLayer default
+setNanoRouteMode -quiet -routeBottomRoutingLayer default
+setNanoRouteMode -quiet -drouteEndIteration default
+setNanoRouteMode -quiet -routeWithTimingDriven false
+setNanoRouteMode -quiet -routeWithSiDriven false
+routeDesign -globalDetail
+report_route -summary
+'''),
+    'postroute_opt': FlowTemplate('''
+optDesign -postRoute
+report_route -summary
+
+############# extract spef #############
+reset_parasitics
+extractRC
+rcOut -spef PE_array_no_constraint.spef
+############# extract spef #############
+
+set dbgLefDefOutVersion 5.8
+global dbgLefDefOutVersion
+set dbgLefDefOutVersion 5.8
+saveNetlist ${TARPATH}/${DESIGN}.postRoute.mapped.v
+defOut -floorplan -netlist -routing ${TARPATH}/${DESIGN}.postRoute.def
+'''),
+    'timing_postRoute': FlowTemplate('''
+
+timeDesign -postRoute -pathReports -drvReports -slackReports -numPaths 50 -prefix ${DESIGN}_postRoute -outDir ${TARPATH}/${DESIGN}_timingReports_postRoute
+'''),
+    'exit': FlowTemplate('''
+
+exit
+'''),
+}
+
+# 预定义的流程：DSE放置、DSE布线，以及1x/preparation使用的完整流程（不含preCTS时序）；
+# place_saved在布局后保存设计，route_from_place从保存的设计继续布线（successive halving使用）
+FLOWS = {
+    'place': ['floorplan', 'constraint', 'place', 'timing_preCTS'],
+    'route': ['floorplan', 'constraint', 'place', 'timing_preCTS', 'route', 'postroute_opt', 'timing_postRoute'],
+    'full': ['floorplan', 'constraint', 'place', 'route', 'postroute_opt', 'timing_postRoute'],
+    'place_saved': ['floorplan', 'constraint', 'place', 'save_placed', 'timing_preCTS'],
+    'route_from_place': ['restore_placed', 'route', 'postroute_opt', 'timing_postRoute'],
+}
+
+
+def flow_routes(ending_point):
+    """流程是否在布局之后继续布线：只有这样的运行按布局后总线长提前结束才能节省布线时间"""
+    return 'route' in FLOWS[ending_point]
+
+
+# 从布局结果继续布线时，布线输出放在布局输出目录下的子目录，不覆盖布局结果
+ROUTE_SUBDIR = "route"
+
+
+def core_utilization_str(core_utilization):
+    """将70转换为floorPlan使用的0.7，与原shell脚本中bc（scale=1，截断）的结果一致"""
+    tenths = int(core_utilization) // 10
+    return f"0{tenths // 10}.{tenths % 10}" if tenths >= 10 else f"0.{tenths}"
+
+
+def synth_results_dir(case):
+    """返回案例综合结果（mapped.v/mapped.sdc）所在目录"""
+    return f"{SYNTH_ROOT}/project_{case}/{case}/results"
+
+
+def dse_output_dir(case, boundary, core_utilization, iteration, output_root=OUTPUT_ROOT):
+    """
+    返回一次DSE评估的输出目录
+
+    参数:
+        case: 案例名称
+        boundary: 边界名称
+        core_utilization: 核心利用率
+        iteration: 迭代次数
+        output_root: 输出根目录
+
+    返回:
+        str: 输出目录路径
+    """
+    return os.path.join(output_root, f"case__{case}__core_utilization__{core_utilization}__boundary__{boundary}__iter__{iteration}")
+
+
+def dse_route_dir(tar_path):
+    """返回从布局结果继续布线时的输出目录（布局输出目录下的route子目录）"""
+    return os.path.join(tar_path, ROUTE_SUBDIR)
+
+
+def flow_params(case, core_utilization, tar_path='', constraint_file=None, mmmc_file=None, local_cpu="max", placed_dir=None):
+    """
+    返回模板替换使用的参数
+
+    参数:
+        case: 案例名称
+        core_utilization: 核心利用率
+        tar_path: 输出目录
+        constraint_file: 约束文件路径
+        mmmc_file: 本任务的MMMC文件，为None时使用输出目录下的asap.view
+        local_cpu: setMultiCpuUsage -localCpu的值，由调度器分配，默认max
+        placed_dir: 保存了布局后设计的目录（restore_placed阶段使用），为None时使用输出目录
+
+    返回:
+        dict: 模板参数
+    """
+    return {
+        'case': case,
+        'src_path': synth_results_dir(case),
+        'tar_path': tar_path,
+        'lef_files': ' '.join(LEF_FILES),
+        'mmmc_file': mmmc_file if mmmc_file else os.path.join(tar_path, JOB_VIEW_NAME),
+        'core_util_str': core_utilization_str(core_utilization),
+        'useful_skew_cells': USEFUL_SKEW_CELLS,
+        'constraint_file': os.path.abspath(constraint_file) if constraint_file else '',
+        'local_cpu': local_cpu,
+        'placed_dir': placed_dir if placed_dir else tar_path,
+    }
+
+
+def render_stage_proc(proc_name, stages, case, core_utilization, tcl_globals=("DESIGN", "SRCPATH", "TARPATH"), mmmc_file=None,
+                      local_cpu="max"):
+    """
+    把若干阶段包装成一个TCL过程，供常驻worker在同一个Innovus会话中反复调用
+
+    参数:
+        proc_name: 过程名
+        stages: 阶段名列表
+        case: 案例名称
+        core_utilization: 核心利用率
+        tcl_globals: 过程中引用的全局变量
+        mmmc_file: 本worker的MMMC文件，floorplan阶段需要
+        local_cpu: setMultiCpuUsage -localCpu的值
+
+    返回:
+        str: TCL过程定义
+    """
+    params = flow_params(case, core_utilization, mmmc_file=mmmc_file, local_cpu=local_cpu)
+    body = ''.join(STAGE_TEMPLATES[stage].substitute(params) for stage in stages)
+    return f"proc {proc_name} {{}} {{\n    global {' '.join(tcl_globals)}\n{body}}}\n"
+
+
+def render_flow(case, core_utilization, tar_path, constraint_file=None, stages=FLOWS['place'],
+                floorplan_mode="build", checkpoint=None, mmmc_file=None, local_cpu="max", placed_dir=None):
+    """
+    按阶段生成完整的Innovus TCL流程脚本
+
+    参数:
+        case: 案例名称
+        core_utilization: 核心利用率，如"70"
+        tar_path: 输出目录
+        constraint_file: 约束文件路径，为None时跳过constraint阶段
+        stages: 阶段名列表，见FLOWS
+        floorplan_mode: build（重新布局规划）、save（布局规划后保存检查点）或restore（从检查点恢复）
+        checkpoint: FloorplanCheckpoint，floorplan_mode为save/restore时需要
+        mmmc_file: 本任务的MMMC文件，为None时使用输出目录下的asap.view
+        local_cpu: setMultiCpuUsage -localCpu的值，由调度器分配，默认max
+        placed_dir: 保存了布局后设计的目录，route_from_place流程使用
+
+    返回:
+        str: TCL脚本内容
+    """
+    params = flow_params(case, core_utilization, tar_path, constraint_file, mmmc_file, local_cpu, placed_dir)
+    if checkpoint is not None:
+        params['checkpoint_dir'] = checkpoint.directory
+        params['fingerprint'] = checkpoint.fingerprint()
+
+    blocks = ['header']
+    for stage in stages:
+        if stage == 'constraint' and constraint_file is None:
+            continue
+        if stage == 'floorplan' and floorplan_mode == "restore":
+            blocks.append('restore_floorplan')
+            continue
+        blocks.append(stage)
+        if stage == 'floorplan' and floorplan_mode == "save":
+            blocks.append('save_floorplan')
+    blocks.append('exit')
+
+    return ''.join(STAGE_TEMPLATES[block].substitute(params) for block in blocks)
+
+
+# 文件摘要缓存：(路径, 大小, 修改时间) -> sha256，避免每次评估都重新读取LEF和网表
+_file_digest_cache = {}
+
+
+def _file_digest(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return "missing"
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    digest = _file_digest_cache.get(key)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        _file_digest_cache[key] = digest
+    return digest
+
+
+class FloorplanCheckpoint:
+    """一个(case, core_utilization)的布局规划检查点，指纹由利用率和LEF/网表/SDC/MMMC内容计算"""
+
+    def __init__(self, case, core_utilization, root=FLOORPLAN_CHECKPOINT_ROOT):
+        self.case = case
+        self.core_utilization = core_utilization
+        self.directory = os.path.join(root, f"{case}__{core_utilization}")
+        self.lock_dir = os.path.join(self.directory, "save.lock")
+        self._locked = False
+
+    def input_files(self):
+        """参与指纹计算的输入文件"""
+        results = synth_results_dir(self.case)
+        return LEF_FILES + [f"{results}/{self.case}.mapped.v", f"{results}/{self.case}.mapped.sdc", MMMC_FILE]
+
+    def fingerprint(self):
+        """
+        计算检查点指纹
+
+        返回:
+            str: sha256十六进制摘要
+        """
+        sha = hashlib.sha256()
+        sha.update(f"{core_utilization_str(self.core_utilization)}\n".encode('utf-8'))
+        for path in self.input_files():
+            sha.update(f"{path} {_file_digest(path)}\n".encode('utf-8'))
+        return sha.hexdigest()
+
+    def valid(self):
+        """检查点是否存在且指纹与当前输入一致"""
+        try:
+            with open(os.path.join(self.directory, "fingerprint"), 'r') as f:
+                saved = f.read().strip()
+        except OSError:
+            return False
+        return os.path.isdir(os.path.join(self.directory, "floorplan.enc.dat")) and saved == self.fingerprint()
+
+    def lock_owner(self):
+        """
+        读取保存锁的持有者
+
+        返回:
+            tuple: (主机名, pid, 加锁时间)，没有锁或内容不完整时返回None
+        """
+        try:
+            with open(os.path.join(self.lock_dir, "owner"), 'r') as f:
+                host, pid, locked_at = f.read().split()
+            return host, int(pid), float(locked_at)
+        except (OSError, ValueError):
+            return None
+
+    def lock_stale(self, owner):
+        """
+        判断保存锁是否已失效：持有者在本机且进程已不存在，或加锁超过FLOORPLAN_LOCK_TIMEOUT。
+        刚创建、还没写入owner的锁按目录修改时间计算
+
+        参数:
+            owner: lock_owner的结果
+
+        返回:
+            bool: 是否失效
+        """
+        if owner is None:
+            try:
+                return time.time() - os.path.getmtime(self.lock_dir) > FLOORPLAN_LOCK_TIMEOUT
+            except OSError:
+                return False
+        host, pid, locked_at = owner
+        if time.time() - locked_at > FLOORPLAN_LOCK_TIMEOUT:
+            return True
+        if host != socket.gethostname():
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            pass
+        return False
+
+    def break_lock(self, owner):
+        """
+        删除失效的保存锁：先把锁目录改名（原子操作，并发时只有一个任务成功），确认改名的仍是判断时的锁再删除
+
+        返回:
+            bool: 是否删除
+        """
+        stale_dir = f"{self.lock_dir}.stale.{socket.gethostname()}.{os.getpid()}"
+        try:
+            os.rename(self.lock_dir, stale_dir)
+        except OSError:
+            return False
+        try:
+            with open(os.path.join(stale_dir, "owner"), 'r') as f:
+                content = f.read().split()
+            renamed_owner = (content[0], int(content[1]), float(content[2]))
+        except (OSError, ValueError, IndexError):
+            renamed_owner = None
+        if renamed_owner != owner:
+            # 判断之后锁已被其他任务重新获得，放回原处
+            try:
+                os.rename(stale_dir, self.lock_dir)
+                return False
+            except OSError:
+                pass
+        shutil.rmtree(stale_dir, ignore_errors=True)
+        return True
+
+    def try_lock(self):
+        """
+        尝试获得保存检查点的权利，并发运行时只有一个任务保存（mkdir是原子操作）。
+        锁目录中记录持有者的主机名、pid和加锁时间，驱动进程中断后留下的锁会被下一个任务清除
+
+        返回:
+            bool: 是否获得
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            os.mkdir(self.lock_dir)
+        except FileExistsError:
+            owner = self.lock_owner()
+            if not self.lock_stale(owner) or not self.break_lock(owner):
+                # 本进程的其他任务正在保存时不提示
+                if owner is not None and owner[:2] != (socket.gethostname(), os.getpid()):
+                    host, pid, locked_at = owner
+                    print(f"警告: 布局规划检查点无效且保存锁被占用（{host} pid {pid}，"
+                          f"{(time.time() - locked_at) / 60:.0f} 分钟前），本次完整运行布局规划: {self.lock_dir}")
+                return False
+            print(f"警告: 清除了中断的运行留下的布局规划检查点保存锁: {self.lock_dir}")
+            try:
+                os.mkdir(self.lock_dir)
+            except FileExistsError:
+                return False
+        with open(os.path.join(self.lock_dir, "owner"), 'w') as f:
+            f.write(f"{socket.gethostname()} {os.getpid()} {time.time()}\n")
+        self._locked = True
+        return True
+
+    def release(self):
+        """释放保存锁"""
+        if self._locked:
+            shutil.rmtree(self.lock_dir, ignore_errors=True)
+            self._locked = False
+
+
+# 共享MMMC文件内容缓存：(大小, 修改时间, 内容)
+_shared_view_cache = {}
+
+
+def write_job_view(case, run_dir, mmmc_file=MMMC_FILE):
+    """
+    在运行目录生成本任务私有的MMMC文件，SDC路径指向当前案例。
+    共享的MMMC文件只读不写，不同案例的任务可以同时运行
+
+    参数:
+        case: 案例名称
+        run_dir: 运行目录
+        mmmc_file: 共享的MMMC模板文件
+
+    返回:
+        str: 生成的MMMC文件路径
+    """
+    stat = os.stat(mmmc_file)
+    cached = _shared_view_cache.get(mmmc_file)
+    if cached is None or cached[:2] != (stat.st_size, stat.st_mtime_ns):
+        with open(mmmc_file, 'r') as f:
+            cached = (stat.st_size, stat.st_mtime_ns, f.read())
+        _shared_view_cache[mmmc_file] = cached
+
+    sdc_file = f"{synth_results_dir(case)}/{case}.mapped.sdc"
+    content = re.sub(r'create_constraint_mode -name CONSTRAINTS -sdc_files \{.*\}',
+                     lambda _: f"create_constraint_mode -name CONSTRAINTS -sdc_files {{{sdc_file}}}", cached[2])
+
+    os.makedirs(run_dir, exist_ok=True)
+    view_file = os.path.join(run_dir, JOB_VIEW_NAME)
+    with open(view_file, 'w') as f:
+        f.write(content)
+    return view_file
+
+
+class FlowRun:
+    """一次Innovus流程运行的准备和清理：决定检查点模式、清空输出目录、生成MMMC和TCL脚本"""
+
+    def __init__(self, case, core_utilization, tar_path, tcl_file, constraint_file=None, stages=FLOWS['place'],
+                 use_checkpoint=True, placed_dir=None):
+        """
+        参数:
+            case: 案例名称
+            core_utilization: 核心利用率
+            tar_path: 输出目录，运行前会被清空
+            tcl_file: 生成的TCL脚本路径
+            constraint_file: 约束文件路径，为None时不加约束
+            stages: 阶段名列表，见FLOWS
+            use_checkpoint: 是否使用布局规划检查点
+            placed_dir: 保存了布局后设计的目录，route_from_place流程使用
+        """
+        self.case = case
+        self.core_utilization = core_utilization
+        self.tar_path = tar_path
+        self.tcl_file = os.path.abspath(tcl_file)
+        self.constraint_file = constraint_file
+        self.stages = stages
+        self.use_checkpoint = use_checkpoint and 'floorplan' in stages
+        self.placed_dir = placed_dir
+        self.checkpoint = None
+
+    def prepare(self, local_cpu="max"):
+        """
+        生成本次运行的TCL脚本，作为InnovusScheduler.submit的prepare回调
+
+        参数:
+            local_cpu: setMultiCpuUsage -localCpu的值
+
+        返回:
+            tuple: (TCL脚本路径, 运行目录)
+        """
+        floorplan_mode = "build"
+        if self.use_checkpoint:
+            self.checkpoint = FloorplanCheckpoint(self.case, self.core_utilization)
+            if self.checkpoint.valid():
+                print(f"复用布局规划检查点: {self.checkpoint.directory}")
+                floorplan_mode = "restore"
+            elif self.checkpoint.try_lock():
+                print(f"保存布局规划检查点: {self.checkpoint.directory}")
+                floorplan_mode = "save"
+
+        # 删除之前存在的输出目录并重新创建
+        if os.path.exists(self.tar_path):
+            shutil.rmtree(self.tar_path)
+        os.makedirs(self.tar_path, exist_ok=True)
+
+        # 本任务私有的MMMC文件；保存检查点时放在检查点目录，保证恢复时仍然存在
+        view_dir = self.checkpoint.directory if floorplan_mode == "save" else self.tar_path
+        mmmc_file = write_job_view(self.case, view_dir)
+
+        with open(self.tcl_file, 'w') as f:
+            f.write(render_flow(self.case, self.core_utilization, self.tar_path, self.constraint_file, self.stages,
+                                floorplan_mode, self.checkpoint, mmmc_file, local_cpu, self.placed_dir))
+        os.chmod(self.tcl_file, 0o777)
+        print(f"生成TCL文件: {self.tcl_file}")
+        return self.tcl_file, self.tar_path
+
+    def release(self, job=None):
+        """释放检查点保存锁，作为InnovusScheduler.submit的on_finish回调"""
+        if self.checkpoint is not None:
+            self.checkpoint.release()
+
+
+def submit_flow(scheduler, case, core_utilization, tar_path, tcl_file, constraint_file=None, stages=FLOWS['place'],
+                use_checkpoint=True, cpus=None, name=None, monitor=None, placed_dir=None):
+    """
+    把一次Innovus流程提交给调度器，立即返回
+
+    参数:
+        scheduler: InnovusScheduler
+        case: 案例名称
+        core_utilization: 核心利用率
+        tar_path: 输出目录，运行前会被清空
+        tcl_file: 生成的TCL脚本路径
+        constraint_file: 约束文件路径，为None时不加约束
+        stages: 阶段名列表，见FLOWS
+        use_checkpoint: 是否使用布局规划检查点
+        cpus: 需要的CPU核数，为None时由调度器决定
+        name: 任务名
+        monitor: LogvMonitor，监控tar_path下的innovus.logv，为None时不监控
+        placed_dir: 保存了布局后设计的目录，route_from_place流程使用
+
+    返回:
+        InnovusJob: 任务对象
+    """
+    flow_run = FlowRun(case, core_utilization, tar_path, tcl_file, constraint_file, stages, use_checkpoint, placed_dir)
+    return scheduler.submit(flow_run.prepare, cpus, name, flow_run.release, monitor)
+
+
+def run_flow(case, core_utilization, tar_path, tcl_file, constraint_file=None, stages=FLOWS['place'],
+             use_checkpoint=True, scheduler=None, cpus=None, monitor=None, placed_dir=None):
+    """
+    生成TCL脚本并运行一次Innovus
+
+    参数:
+        case: 案例名称
+        core_utilization: 核心利用率
+        tar_path: 输出目录，运行前会被清空
+        tcl_file: 生成的TCL脚本路径
+        constraint_file: 约束文件路径，为None时不加约束
+        stages: 阶段名列表，见FLOWS
+        use_checkpoint: 是否使用布局规划检查点
+        scheduler: InnovusScheduler，不为None时提交给调度器并等待（受license和核数限制）
+        cpus: 使用调度器时需要的CPU核数
+        monitor: LogvMonitor，运行期间监控logv，满足条件时提前结束Innovus（结果为False，原因见monitor.kill_reason）
+        placed_dir: 保存了布局后设计的目录，route_from_place流程使用
+
+    返回:
+        bool: Innovus是否正常退出
+    """
+    if scheduler is not None:
+        job = submit_flow(scheduler, case, core_utilization, tar_path, tcl_file, constraint_file, stages,
+                          use_checkpoint, cpus, os.path.basename(tar_path), monitor, placed_dir)
+        return job.wait()
+
+    flow_run = FlowRun(case, core_utilization, tar_path, tcl_file, constraint_file, stages, use_checkpoint, placed_dir)
+    try:
+        tcl_file, run_dir = flow_run.prepare()
+        process = subprocess.Popen(INNOVUS_CMD + ["-no_gui", "-files", tcl_file], cwd=run_dir)
+        returncode = wait_process(process, monitor) if monitor is not None else process.wait()
+        if monitor is not None and monitor.kill_reason is not None:
+            return False
+        if returncode != 0:
+            print(f"运行Innovus失败，返回码: {returncode}")
+            return False
+        return True
+    except OSError as e:
+        print(f"执行Innovus时出错: {e}")
+        return False
+    finally:
+        flow_run.release()
+
+
+def run_dse_flow(case, boundary, core_utilization, iteration, ending_point="route", constraint_dir="constraint",
+                 output_root=OUTPUT_ROOT, scheduler=None, monitor=None):
+    """
+    运行一次DSE评估，代替原run_innovus_dynamic.sh
+
+    参数:
+        case: 案例名称
+        boundary: 边界名称
+        core_utilization: 核心利用率
+        iteration: 迭代次数
+        ending_point: FLOWS中的流程名（place、route、不含preCTS时序的full、布局后保存设计的place_saved，
+                      或从place_saved结果继续布线的route_from_place，其输出在布局输出目录的route子目录）
+        constraint_dir: 约束文件目录
+        output_root: 输出根目录
+        scheduler: InnovusScheduler，为None时直接运行
+        monitor: LogvMonitor，为None时不监控
+
+    返回:
+        bool: Innovus是否正常退出
+    """
+    print(f"==================case:{case}__boundary:{boundary}__core_utilization:{core_utilization}__iter:{iteration}__ending_point:{ending_point}")
+    constraint_file = os.path.join(constraint_dir, f"{case}__{boundary}__{core_utilization}__{iteration}.txt")
+    tar_path = dse_output_dir(case, boundary, core_utilization, iteration, output_root)
+    tcl_file = f"{case}__{boundary}__{core_utilization}__{iteration}.tcl"
+    if ending_point == 'route_from_place':
+        # 约束已经在布局时生效，恢复布局后的设计继续布线
+        tcl_file = f"{case}__{boundary}__{core_utilization}__{iteration}__route.tcl"
+        return run_flow(case, core_utilization, dse_route_dir(tar_path), tcl_file, None, FLOWS[ending_point],
+                        scheduler=scheduler, monitor=monitor, placed_dir=tar_path)
+    return run_flow(case, core_utilization, tar_path, tcl_file, constraint_file, FLOWS[ending_point], scheduler=scheduler,
+                    monitor=monitor)
+
+
+def main():
+    """命令行入口，参数与原run_innovus_dynamic.sh相同"""
+    parser = argparse.ArgumentParser(description='生成并运行Innovus DSE流程')
+    parser.add_argument('case', help='案例名称')
+    parser.add_argument('boundary', help='边界名称')
+    parser.add_argument('core_utilization', help='核心利用率')
+    parser.add_argument('iteration', help='迭代次数')
+    parser.add_argument('ending_point', nargs='?', default='route', choices=list(FLOWS), help='流程终点，默认route')
+    parser.add_argument('--constraint-dir', default='constraint', help='约束文件目录')
+    parser.add_argument('--print-only', action='store_true', help='只打印生成的TCL脚本，不运行Innovus')
+
+    args = parser.parse_args()
+
+    if args.print_only:
+        constraint_file = os.path.join(args.constraint_dir, f"{args.case}__{args.boundary}__{args.core_utilization}__{args.iteration}.txt")
+        tar_path = dse_output_dir(args.case, args.boundary, args.core_utilization, args.iteration)
+        if args.ending_point == 'route_from_place':
+            print(render_flow(args.case, args.core_utilization, dse_route_dir(tar_path), None, FLOWS[args.ending_point],
+                              placed_dir=tar_path))
+        else:
+            print(render_flow(args.case, args.core_utilization, tar_path, constraint_file, FLOWS[args.ending_point]))
+        return 0
+
+    success = run_dse_flow(args.case, args.boundary, args.core_utilization, args.iteration,
+                           args.ending_point, args.constraint_dir)
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+
+'''
+调用方式:
+from innovus_flow import run_dse_flow, submit_flow, render_flow, FLOWS
+
+# 运行一次DSE评估（约束文件constraint/PE_array__Boundary_Badoverlap_i100__70__5.txt）
+success = run_dse_flow("PE_array", "Boundary_Badoverlap_i100", "70", 5, "place")
+
+# 通过调度器并发运行（2个license，16核，每个任务-localCpu 8）
+from innovus_scheduler import InnovusScheduler
+with InnovusScheduler(licenses=2, cores=16) as scheduler:
+    jobs = [submit_flow(scheduler, "PE_array", "70", f"/tmp/out{i}", f"/tmp/out{i}.tcl", f"constraint/x{i}.txt") for i in range(4)]
+    scheduler.wait(jobs)
+
+# 只生成脚本
+tcl = render_flow("PE_array", "70", "/tmp/out", "constraint/x.txt", FLOWS['route'])
+
+命令行（与原run_innovus_dynamic.sh参数相同）:
+python innovus_flow.py PE_array Boundary_Badoverlap_i100 70 5 place
+python innovus_flow.py PE_array Boundary_Badoverlap_i100 70 5 place --print-only
+
+# 布局后保存设计，之后从保存的设计继续布线（输出在.../iter__5/route）
+python innovus_flow.py PE_array Boundary_Badoverlap_i100 70 5 place_saved
+python innovus_flow.py PE_array Boundary_Badoverlap_i100 70 5 route_from_place
+'''
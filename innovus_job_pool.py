@@ -0,0 +1,81 @@
+"""
+Innovus并行任务池模块
+用固定数量的槽位并发执行Innovus评估任务，槽位数默认由license数量和CPU核数决定
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+def default_slot_count(licenses=1):
+    """
+    根据license数量和CPU核数确定并发槽位数
+
+    参数:
+        licenses: 可用的Innovus license数量
+
+    返回:
+        int: 槽位数，不超过license数量和CPU核数
+    """
+    cores = os.cpu_count() or 1
+    return max(1, min(licenses, cores))
+
+
+class InnovusJobPool:
+    """有界的Innovus任务池，同一时刻最多运行max_slots个任务"""
+
+    def __init__(self, max_slots=None, licenses=1):
+        """
+        初始化任务池
+
+        参数:
+            max_slots: 并发槽位数，为None时使用default_slot_count(licenses)
+            licenses: 可用的Innovus license数量
+        """
+        self.max_slots = max_slots if max_slots else default_slot_count(licenses)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_slots)
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        提交一个任务
+
+        返回:
+            Future: 任务的Future对象
+        """
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def map_unordered(self, fn, items):
+        """
+        对每个元素并发执行fn，按完成顺序逐个返回结果
+
+        参数:
+            fn: 任务函数，接收一个元素
+            items: 元素列表
+
+        返回:
+            generator: 依次产生 (元素, 结果)
+        """
+        futures = {self._executor.submit(fn, item): item for item in items}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+    def shutdown(self, wait=True):
+        """关闭任务池"""
+        self._executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+        return False
+
+
+'''
+调用方式:
+from innovus_job_pool import InnovusJobPool
+
+with InnovusJobPool(licenses=4) as pool:
+    for individual, success in pool.map_unordered(lambda ind: ind.evaluate(), population):
+        print(individual.iteration, success)
+'''
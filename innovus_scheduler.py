@@ -0,0 +1,266 @@
+"""
+Innovus本地任务调度模块
+按license数量和CPU核数预算调度Innovus任务：每个任务获得一个明确的-localCpu值，
+资源不足时任务排队等待，先提交的任务先运行。提供submit/wait/cancel，
+run_innovus_dse.py、run_innovus_dse_GA.py和run_innovus_1x.py共用
+"""
+
+import os
+import shlex
+import threading
+import subprocess
+from collections import deque
+
+from logv_monitor import wait_process
+
+# Innovus可执行文件，可以用环境变量INNOVUS_CMD替换（如测试时使用fake_innovus.py）
+INNOVUS_CMD = shlex.split(os.environ.get("INNOVUS_CMD", "innovus"))
+
+# 任务状态
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+KILLED = "killed"  # 被logv监控提前结束
+
+# wait的返回条件
+FIRST_COMPLETED = "FIRST_COMPLETED"
+ALL_COMPLETED = "ALL_COMPLETED"
+
+
+class InnovusJob:
+    """一个调度中的Innovus任务"""
+
+    def __init__(self, prepare, cpus, name=None, on_finish=None, monitor=None):
+        """
+        参数:
+            prepare: 回调，参数为分配到的CPU核数，生成TCL脚本并返回 (tcl文件, 运行目录)
+            cpus: 任务需要的CPU核数
+            name: 任务名，用于打印
+            on_finish: 回调，任务结束（包括取消和失败）后以任务为参数调用
+            monitor: LogvMonitor，运行期间监控logv并在需要时提前结束任务
+        """
+        self.prepare = prepare
+        self.cpus = cpus
+        self.name = name
+        self.on_finish = on_finish
+        self.monitor = monitor
+        self.state = QUEUED
+        self.returncode = None
+        self.process = None
+        self._done = threading.Event()
+
+    def done(self):
+        """任务是否已结束"""
+        return self._done.is_set()
+
+    def succeeded(self):
+        """任务是否正常结束"""
+        return self.state == DONE
+
+    def wait(self, timeout=None):
+        """
+        等待任务结束
+
+        参数:
+            timeout: 最长等待秒数，为None时一直等待
+
+        返回:
+            bool: 任务是否正常结束（超时返回False）
+        """
+        self._done.wait(timeout)
+        return self.succeeded()
+
+
+class InnovusScheduler:
+    """按license和CPU核数预算调度Innovus任务，线程安全"""
+
+    def __init__(self, licenses=1, cores=None, innovus_cmd=None):
+        """
+        初始化调度器
+
+        参数:
+            licenses: 可同时运行的Innovus数量
+            cores: CPU核数预算，为None时使用本机核数
+            innovus_cmd: Innovus命令（列表），为None时使用INNOVUS_CMD
+        """
+        self.licenses = max(1, licenses)
+        self.cores = max(1, cores if cores else (os.cpu_count() or 1))
+        self.innovus_cmd = list(innovus_cmd) if innovus_cmd else list(INNOVUS_CMD)
+        self.free_licenses = self.licenses
+        self.free_cores = self.cores
+        self._queue = deque()
+        self._running = set()
+        self._cond = threading.Condition()
+
+    def default_cpus(self):
+        """每个任务默认分配的CPU核数：核数预算按license平分"""
+        return max(1, self.cores // self.licenses)
+
+    def submit(self, prepare, cpus=None, name=None, on_finish=None, monitor=None):
+        """
+        提交一个任务，资源足够时立即启动，否则排队
+
+        参数:
+            prepare: 回调，参数为分配到的CPU核数，生成TCL脚本并返回 (tcl文件, 运行目录)
+            cpus: 任务需要的CPU核数，为None时使用default_cpus()
+            name: 任务名
+            on_finish: 任务结束后的回调
+            monitor: LogvMonitor，为None时不监控
+
+        返回:
+            InnovusJob: 任务对象
+        """
+        cpus = min(self.cores, cpus if cpus else self.default_cpus())
+        job = InnovusJob(prepare, cpus, name, on_finish, monitor)
+        with self._cond:
+            self._queue.append(job)
+            self._dispatch()
+        return job
+
+    def _dispatch(self):
+        """按提交顺序启动资源允许的任务，调用时必须持有锁"""
+        while self._queue:
+            job = self._queue[0]
+            if self.free_licenses < 1 or self.free_cores < job.cpus:
+                break
+            self._queue.popleft()
+            self.free_licenses -= 1
+            self.free_cores -= job.cpus
+            job.state = RUNNING
+            self._running.add(job)
+            threading.Thread(target=self._run_job, args=(job,), daemon=True).start()
+
+    def _run_job(self, job):
+        try:
+            tcl_file, run_dir = job.prepare(job.cpus)
+            label = f" {job.name}" if job.name else ""
+            print(f"启动Innovus任务{label}: -localCpu {job.cpus}, 脚本 {tcl_file}")
+            with self._cond:
+                if job.state == CANCELLED:
+                    raise _Cancelled()
+                job.process = subprocess.Popen(self.innovus_cmd + ["-no_gui", "-files", tcl_file], cwd=run_dir)
+            if job.monitor is not None:
+                job.returncode = wait_process(job.process, job.monitor)
+            else:
+                job.returncode = job.process.wait()
+            with self._cond:
+                if job.state != CANCELLED:
+                    if job.monitor is not None and job.monitor.kill_reason is not None:
+                        job.state = KILLED
+                    else:
+                        job.state = DONE if job.returncode == 0 else FAILED
+            if job.state == FAILED:
+                print(f"运行Innovus失败{label}，返回码: {job.returncode}")
+        except _Cancelled:
+            pass
+        except Exception as e:
+            print(f"执行Innovus任务时出错: {e}")
+            job.state = FAILED
+        finally:
+            with self._cond:
+                self.free_licenses += 1
+                self.free_cores += job.cpus
+                self._dispatch()
+            self._finish(job)
+
+    def _finish(self, job):
+        if job.on_finish is not None:
+            try:
+                job.on_finish(job)
+            except Exception as e:
+                print(f"任务结束回调出错: {e}")
+        job._done.set()
+        with self._cond:
+            self._running.discard(job)
+            self._cond.notify_all()
+
+    def cancel(self, job):
+        """
+        取消任务：排队中的任务直接移出队列，运行中的任务结束Innovus进程
+
+        返回:
+            bool: 任务是否被取消（已结束的任务返回False）
+        """
+        with self._cond:
+            if job.done() or job.state in (DONE, FAILED, CANCELLED, KILLED):
+                return False
+            if job.state == QUEUED:
+                self._queue.remove(job)
+                job.state = CANCELLED
+                queued = True
+            else:
+                job.state = CANCELLED
+                queued = False
+                if job.process is not None and job.process.poll() is None:
+                    job.process.terminate()
+            self._cond.notify_all()
+        if queued:
+            self._finish(job)
+        return True
+
+    def wait(self, jobs, timeout=None, return_when=ALL_COMPLETED):
+        """
+        等待一组任务
+
+        参数:
+            jobs: 任务列表
+            timeout: 最长等待秒数
+            return_when: ALL_COMPLETED或FIRST_COMPLETED
+
+        返回:
+            tuple: (已结束的任务列表, 未结束的任务列表)
+        """
+        jobs = list(jobs)
+        with self._cond:
+            def finished():
+                done = [job for job in jobs if job.done()]
+                return done if (len(done) == len(jobs) or (return_when == FIRST_COMPLETED and done)) else None
+            self._cond.wait_for(finished, timeout)
+        done = [job for job in jobs if job.done()]
+        return done, [job for job in jobs if not job.done()]
+
+    def shutdown(self, cancel_pending=False):
+        """
+        关闭调度器，等待所有任务结束
+
+        参数:
+            cancel_pending: 为True时取消排队中的任务
+        """
+        if cancel_pending:
+            with self._cond:
+                pending = list(self._queue)
+            for job in pending:
+                self.cancel(job)
+        with self._cond:
+            self._cond.wait_for(lambda: not self._queue and not self._running)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown(cancel_pending=exc_type is not None)
+        return False
+
+
+class _Cancelled(Exception):
+    """任务在启动前被取消"""
+
+
+'''
+调用方式:
+from innovus_scheduler import InnovusScheduler
+
+def prepare(local_cpu):
+    # 生成TCL（setMultiCpuUsage -localCpu {local_cpu}）并返回 (tcl文件, 运行目录)
+    return "/path/to/run.tcl", "/path/to/run_dir"
+
+with InnovusScheduler(licenses=2, cores=16) as scheduler:
+    jobs = [scheduler.submit(prepare, name=f"job{i}") for i in range(4)]
+    done, pending = scheduler.wait(jobs)
+    print([job.state for job in done])
+
+用fake_innovus.py测试（不需要Innovus）:
+INNOVUS_CMD="python fake_innovus.py" python run_innovus_1x.py --licenses 2 --cores 8
+'''
@@ -0,0 +1,374 @@
+"""
+Innovus常驻worker客户端模块
+每个(case, core_utilization)只启动一次Innovus，完成读LEF、init_design、floorPlan后保存布局规划状态，
+之后通过本地socket接收任务：恢复布局规划状态、source新的约束文件、运行place（以及route），
+每次评估的开销只剩下布局本身。Tcl端见innovus_worker.tcl
+"""
+
+import os
+import sys
+import time
+import queue
+import shutil
+import socket
+import datetime
+import argparse
+import threading
+import subprocess
+# 导入流程脚本生成模块
+from innovus_flow import OUTPUT_ROOT, dse_output_dir, core_utilization_str, synth_results_dir, render_stage_proc, write_job_view
+
+# Tcl端worker脚本
+WORKER_TCL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "innovus_worker.tcl")
+# worker工作目录的根目录
+WORKER_ROOT = "/mnt/hgfs/vm_share/eda/innovus_worker"
+
+
+class InnovusWorker:
+    """一个常驻的Innovus进程及其socket连接，同一时刻只执行一个任务"""
+
+    def __init__(self, case, core_utilization, workdir, stub=False, startup_timeout=3600):
+        """
+        初始化worker（不启动进程，需调用start）
+
+        参数:
+            case: 案例名称
+            core_utilization: 核心利用率，如"70"
+            workdir: worker工作目录，保存布局规划状态、端口文件和会话日志
+            stub: 为True时用tclsh运行桩命令，仅用于测试协议
+            startup_timeout: 等待Innovus完成初始化的最长秒数
+        """
+        self.case = case
+        self.core_utilization = core_utilization
+        self.workdir = os.path.abspath(workdir)
+        self.stub = stub
+        self.startup_timeout = startup_timeout
+        self.process = None
+        self._sock = None
+        self._reader = None
+        self._job_count = 0
+
+    def start(self):
+        """
+        启动Innovus并等待worker就绪
+
+        返回:
+            bool: 是否成功启动
+        """
+        os.makedirs(self.workdir, exist_ok=True)
+        port_file = os.path.join(self.workdir, "worker.port")
+        if os.path.exists(port_file):
+            os.remove(port_file)
+
+        start_script = os.path.join(self.workdir, "worker_start.tcl")
+        # 本worker私有的MMMC文件，不修改共享的asap.view
+        mmmc_file = os.path.join(self.workdir, "asap.view") if self.stub else write_job_view(self.case, self.workdir)
+        logv_file = os.path.join(self.workdir, "innovus_worker.logv")
+        with open(start_script, 'w') as f:
+            f.write(f"set DESIGN {self.case}\n")
+            f.write(f"set SRCPATH {synth_results_dir(self.case)}\n")
+            f.write(f"set CORE_UTIL {core_utilization_str(self.core_utilization)}\n")
+            f.write(f"set WORKDIR {self.workdir}\n")
+            f.write(f"set LOGV {logv_file}\n")
+            f.write(f"set PORT_FILE {port_file}\n")
+            f.write(f"set STUB {1 if self.stub else 0}\n")
+            f.write(f"set TARPATH {self.workdir}\n")
+            f.write(render_stage_proc("flow_floorplan", ["floorplan"], self.case, self.core_utilization,
+                                      ("DESIGN", "SRCPATH", "init_lef_file", "init_verilog", "init_mmmc_file"), mmmc_file))
+            f.write(render_stage_proc("flow_place", ["place", "timing_preCTS"], self.case, self.core_utilization))
+            f.write(render_stage_proc("flow_route", ["route", "postroute_opt", "timing_postRoute"], self.case, self.core_utilization,
+                                      ("DESIGN", "TARPATH", "dbgLefDefOutVersion")))
+            f.write(f"source {WORKER_TCL}\n")
+
+        if self.stub:
+            cmd = ["tclsh", start_script]
+        else:
+            cmd = ["innovus", "-no_gui", "-log", os.path.join(self.workdir, "innovus_worker"), "-files", start_script]
+
+        print(f"启动Innovus worker: case={self.case}, core_utilization={self.core_utilization}, 目录={self.workdir}")
+        with open(os.path.join(self.workdir, "worker.out"), 'w') as out:
+            self.process = subprocess.Popen(cmd, cwd=self.workdir, stdout=out, stderr=subprocess.STDOUT)
+
+        # 等待初始化完成并写出端口号
+        deadline = time.time() + self.startup_timeout
+        while not os.path.exists(port_file):
+            if self.process.poll() is not None:
+                print(f"Innovus worker启动失败，返回码: {self.process.returncode}")
+                return False
+            if time.time() > deadline:
+                print(f"等待Innovus worker初始化超时（{self.startup_timeout}秒）")
+                self.kill()
+                return False
+            time.sleep(0.2)
+
+        with open(port_file, 'r') as f:
+            port = int(f.read().strip())
+
+        try:
+            self._sock = socket.create_connection(("127.0.0.1", port))
+            self._reader = self._sock.makefile('r', encoding='utf-8', errors='ignore', newline='\n')
+            fields = self._read_message()
+        except OSError as e:
+            print(f"连接Innovus worker时出错: {e}")
+            self.kill()
+            return False
+
+        if not fields or fields[0] != "READY":
+            print(f"Innovus worker没有返回READY: {fields}")
+            self.kill()
+            return False
+        print(f"Innovus worker已就绪，端口 {port}")
+        return True
+
+    def _send(self, *fields):
+        self._sock.sendall(('\t'.join(str(field) for field in fields) + '\n').encode('utf-8'))
+
+    def _read_message(self):
+        line = self._reader.readline()
+        if not line:
+            return None
+        return line.rstrip('\n').split('\t', 1 if line.startswith("LOG\t") else -1)
+
+    def run(self, constraint_file, tar_path, ending_point="place", verbose=False):
+        """
+        在worker中运行一次评估，并把本次任务的日志写入tar_path/innovus.logv
+
+        参数:
+            constraint_file: 约束文件路径
+            tar_path: 输出目录，运行前会被清空
+            ending_point: 流程终点（place或route）
+            verbose: 是否实时打印worker发回的日志
+
+        返回:
+            bool: 是否成功运行
+        """
+        self._job_count += 1
+        job_id = self._job_count
+
+        # 删除之前存在的输出目录并重新创建
+        shutil.rmtree(tar_path, ignore_errors=True)
+        os.makedirs(tar_path, exist_ok=True)
+
+        log_lines = []
+        status = None
+        try:
+            self._send("RUN", job_id, os.path.abspath(constraint_file), tar_path, ending_point)
+            while True:
+                fields = self._read_message()
+                if fields is None:
+                    print("Innovus worker连接意外断开")
+                    break
+                if fields[0] == "LOG":
+                    line = fields[1] if len(fields) > 1 else ""
+                    log_lines.append(line)
+                    if verbose:
+                        print(line)
+                elif fields[0] in ("DONE", "FAIL"):
+                    status = fields
+                    break
+        except OSError as e:
+            print(f"与Innovus worker通信时出错: {e}")
+
+        if status is None:
+            self.kill()
+            return False
+
+        # 写出本任务的logv，结尾追加与Innovus相同格式的结束行，运行时间为本任务的耗时
+        seconds = int(status[2]) if status[0] == "DONE" else 0
+        timestamp = datetime.datetime.now().strftime("%m/%d %H:%M:%S")
+        with open(os.path.join(tar_path, "innovus.logv"), 'w') as f:
+            for line in log_lines:
+                f.write(line + '\n')
+            f.write(f"[{timestamp} {seconds:>6}s] --- Ending \"Innovus\" (innovus_worker job {job_id}) ---\n")
+
+        if status[0] == "FAIL":
+            print(f"Innovus worker任务 {job_id} 失败: {status[2] if len(status) > 2 else ''}")
+            return False
+        return True
+
+    def alive(self):
+        """worker进程是否仍在运行"""
+        return self.process is not None and self.process.poll() is None and self._sock is not None
+
+    def close(self):
+        """通知worker退出并等待进程结束"""
+        if self._sock is not None:
+            try:
+                self._send("QUIT")
+                self._read_message()
+            except OSError:
+                pass
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=60)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self._close_socket()
+
+    def kill(self):
+        """强制结束worker进程"""
+        if self.process is not None and self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+        self._close_socket()
+
+    def _close_socket(self):
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+class InnovusWorkerPool:
+    """
+    按(case, core_utilization)管理常驻worker，每个键最多size个worker。
+    接口与run_innovus相同，可以直接替换DSE脚本中的run_innovus，线程安全
+    """
+
+    def __init__(self, size=1, worker_root=WORKER_ROOT, output_root=OUTPUT_ROOT, stub=False):
+        """
+        初始化worker池（worker在第一次使用时启动）
+
+        参数:
+            size: 每个(case, core_utilization)的worker数量，通常等于并发槽位数
+            worker_root: worker工作目录的根目录
+            output_root: DSE输出目录的根目录
+            stub: 为True时使用tclsh桩worker
+        """
+        self.size = size
+        self.worker_root = worker_root
+        self.output_root = output_root
+        self.stub = stub
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._started = {}
+        self._workers = []
+
+    def _acquire(self, case, core_utilization):
+        key = (case, str(core_utilization))
+        with self._lock:
+            idle = self._idle.setdefault(key, queue.Queue())
+            start_new = idle.empty() and self._started.get(key, 0) < self.size
+            if start_new:
+                index = self._started.get(key, 0)
+                self._started[key] = index + 1
+        if not start_new:
+            return idle.get()
+
+        workdir = os.path.join(self.worker_root, f"{case}__{core_utilization}__worker{index}")
+        worker = InnovusWorker(case, core_utilization, workdir, stub=self.stub)
+        if not worker.start():
+            with self._lock:
+                self._started[key] -= 1
+            return None
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+
+    def _release(self, worker):
+        key = (worker.case, str(worker.core_utilization))
+        if worker.alive():
+            self._idle[key].put(worker)
+        else:
+            # worker已退出，下次使用时重新启动
+            with self._lock:
+                self._started[key] -= 1
+                self._workers.remove(worker)
+
+    def run_innovus(self, case, boundary, core_utilization, iteration, ending_point="place"):
+        """
+        在常驻worker中评估constraint/{case}__{boundary}__{core_utilization}__{iteration}.txt
+
+        参数:
+            case: 案例名称
+            boundary: 边界名称
+            core_utilization: 核心利用率
+            iteration: 迭代次数
+            ending_point: 流程终点（place或route）
+
+        返回:
+            bool: 是否成功运行
+        """
+        constraint_file = f"constraint/{case}__{boundary}__{core_utilization}__{iteration}.txt"
+        tar_path = dse_output_dir(case, boundary, core_utilization, iteration, self.output_root)
+        print(f"Innovus worker执行: {constraint_file} -> {tar_path}")
+        return self.run_constraint(case, core_utilization, constraint_file, tar_path, ending_point)
+
+    def run_constraint(self, case, core_utilization, constraint_file, tar_path, ending_point="place"):
+        """
+        取一个空闲worker运行指定的约束文件
+
+        返回:
+            bool: 是否成功运行
+        """
+        worker = self._acquire(case, core_utilization)
+        if worker is None:
+            print("没有可用的Innovus worker")
+            return False
+        try:
+            return worker.run(constraint_file, tar_path, ending_point)
+        finally:
+            self._release(worker)
+
+    def close(self):
+        """关闭所有worker"""
+        with self._lock:
+            workers = list(self._workers)
+            self._workers = []
+            self._idle = {}
+            self._started = {}
+        for worker in workers:
+            worker.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+def main():
+    """用tclsh桩worker测试协议：依次评估给定的约束文件并打印提取结果"""
+    from extract_route_report import extract_data_from_logv, print_results
+
+    parser = argparse.ArgumentParser(description='Innovus常驻worker（桩模式用于测试协议）')
+    parser.add_argument('constraint_files', nargs='+', help='约束文件路径，文件名格式为{case}__{boundary}__{core_utilization}__{iter}.txt')
+    parser.add_argument('--stub', action='store_true', help='使用tclsh桩worker代替Innovus')
+    parser.add_argument('--worker-root', default=WORKER_ROOT, help='worker工作目录的根目录')
+    parser.add_argument('--output-root', default=OUTPUT_ROOT, help='输出目录的根目录')
+    parser.add_argument('-e', '--ending-point', default='place', choices=['place', 'route'], help='流程终点')
+
+    args = parser.parse_args()
+
+    with InnovusWorkerPool(1, args.worker_root, args.output_root, stub=args.stub) as workers:
+        for constraint_file in args.constraint_files:
+            case, boundary, core_utilization, iteration = os.path.splitext(os.path.basename(constraint_file))[0].split('__')
+            tar_path = dse_output_dir(case, boundary, core_utilization, iteration, args.output_root)
+            success = workers.run_constraint(case, core_utilization, constraint_file, tar_path, args.ending_point)
+            print(f"{constraint_file}: {'成功' if success else '失败'}")
+            if success:
+                print_results(extract_data_from_logv(os.path.join(tar_path, "innovus.logv")))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+
+'''
+调用方式:
+from innovus_worker import InnovusWorkerPool
+
+with InnovusWorkerPool(size=4) as workers:
+    success = workers.run_innovus("PE_array", "Boundary_Badoverlap_i100", "70", 5, "place")
+
+测试协议（tclsh桩worker，不需要Innovus）:
+python innovus_worker.py --stub --worker-root /tmp/worker --output-root /tmp/dse_output constraint/PE_array__Boundary_Badoverlap_i100__70__0.txt
+
+在DSE脚本中使用:
+python run_innovus_dse.py -c PE_array -b Boundary_Badoverlap_i100 --worker
+python run_innovus_dse_GA.py -c PE_array -b "Boundary_Areacoverage_250324_phase1_test3,Boundary_Badoverlap_i100" --licenses 4 --worker
+'''
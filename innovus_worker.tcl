@@ -0,0 +1,185 @@
+# Innovus常驻worker脚本
+# 每个(case, core_utilization)启动一次Innovus：读LEF、init_design、floorPlan后保存布局规划状态，
+# 然后在本地socket上等待任务。每个任务恢复布局规划状态、source新的约束文件、运行place（以及route），
+# 并把本任务产生的日志流式发回客户端。
+#
+# 由innovus_worker.py生成的启动脚本设置以下变量、定义流程过程后source本文件:
+#   DESIGN     案例名称
+#   SRCPATH    mapped.v所在目录
+#   CORE_UTIL  核心利用率字符串，如0.7
+#   WORKDIR    worker工作目录（保存布局规划状态和端口文件）
+#   LOGV       本worker会话的logv文件
+#   PORT_FILE  监听端口写入的文件
+#   STUB       为1时在tclsh中用桩命令代替Innovus命令，仅用于测试协议
+# 流程过程flow_floorplan/flow_place/flow_route由innovus_flow.py的阶段模板生成
+#
+# 协议（每行一条消息，字段以制表符分隔）:
+#   客户端 -> worker:  RUN <job_id> <约束文件> <输出目录> <place|route>
+#                      QUIT
+#   worker -> 客户端:  READY <design> <core_util>
+#                      LOG <日志行>              （可能有多行）
+#                      DONE <job_id> <耗时秒数>
+#                      FAIL <job_id> <错误信息>
+#                      BYE
+
+if {$STUB} {
+    # 桩命令：把命令写入logv，report_route输出一个按约束区域坐标生成的伪造报告
+    namespace eval CTE { variable mmmc_default 1 }
+    set ::stub_region_sum 0.0
+    set ::stub_inst_count 0
+
+    proc stub_log {line} {
+        set f [open $::LOGV a]
+        puts $f $line
+        close $f
+    }
+
+    foreach cmd {setMultiCpuUsage set_global suppressMessage init_design setAnalysisMode getIoFlowFlag
+                 setIoFlowFlag floorPlan uiSetTool fit setRouteMode setEndCapMode setNanoRouteMode
+                 setUsefulSkewMode setPlaceMode saveNetlist defOut timeDesign routeDesign optDesign
+                 reset_parasitics extractRC rcOut saveDesign freeDesign} {
+        proc $cmd {args} "stub_log \"<CMD> $cmd \$args\""
+    }
+
+    proc restoreDesign {args} {
+        stub_log "<CMD> restoreDesign $args"
+        set ::stub_region_sum 0.0
+        set ::stub_inst_count 0
+    }
+
+    proc create_group {args} {
+        foreach number [regexp -all -inline {[-]?[0-9]+(?:\.[0-9]+)?} [lindex $args end]] {
+            set ::stub_region_sum [expr {$::stub_region_sum + abs($number)}]
+        }
+    }
+
+    proc addInstToInstGroup {args} {
+        incr ::stub_inst_count
+    }
+
+    proc place_opt_design {args} {
+        stub_log "<CMD> place_opt_design $args"
+        if {[info exists ::STUB_DELAY_MS]} {
+            after $::STUB_DELAY_MS
+        }
+    }
+
+    proc report_route {args} {
+        set length [format %.4f [expr {100000.0 + $::stub_region_sum + $::stub_inst_count * 0.01}]]
+        set vias [expr {50000 + $::stub_inst_count}]
+        stub_log "<CMD> report_route $args"
+        stub_log "Total net length = $length"
+        stub_log "Via Count Statistics :"
+        stub_log "+----------------+-----------+"
+        stub_log "|     Total      |   $vias   |"
+        stub_log "+----------------+-----------+"
+    }
+}
+
+proc init_floorplan {} {
+    global WORKDIR
+
+    setMultiCpuUsage -localCpu max
+    set_global _enable_mmmc_by_default_flow      $CTE::mmmc_default
+    suppressMessage ENCEXT-2799
+    flow_floorplan
+
+    # 保存布局规划状态，之后每个任务都从这里恢复
+    saveDesign ${WORKDIR}/floorplan.enc
+}
+
+proc restore_floorplan {} {
+    global DESIGN WORKDIR
+    freeDesign
+    restoreDesign ${WORKDIR}/floorplan.enc.dat $DESIGN
+    setMultiCpuUsage -localCpu max
+    setAnalysisMode -reset
+    setAnalysisMode -analysisType onChipVariation -cppr both
+}
+
+proc send_log_since {chan offset} {
+    # 把logv中本任务新增的部分发回客户端
+    if {![file exists $::LOGV]} {
+        return
+    }
+    set f [open $::LOGV r]
+    fconfigure $f -encoding utf-8
+    seek $f $offset
+    while {[gets $f line] >= 0} {
+        puts $chan "LOG\t$line"
+    }
+    close $f
+}
+
+proc run_job {chan job_id constraint_file tar_path ending_point} {
+    set offset 0
+    if {[file exists $::LOGV]} {
+        set offset [file size $::LOGV]
+    }
+    set start [clock seconds]
+    set workdir [pwd]
+
+    set code [catch {
+        restore_floorplan
+        # group information here
+        uplevel #0 [list source $constraint_file]
+        set ::TARPATH $tar_path
+        cd $tar_path
+        flow_place
+        if {$ending_point eq "route"} {
+            flow_route
+        }
+    } err]
+    cd $workdir
+
+    send_log_since $chan $offset
+    if {$code} {
+        puts $chan "FAIL\t$job_id\t[string map {\n { } \t { }} $err]"
+    } else {
+        puts $chan "DONE\t$job_id\t[expr {[clock seconds] - $start}]"
+    }
+}
+
+proc handle_client {chan} {
+    if {[gets $chan line] < 0} {
+        if {[eof $chan]} {
+            close $chan
+        }
+        return
+    }
+    set fields [split $line "\t"]
+    switch -- [lindex $fields 0] {
+        RUN {
+            lassign [lrange $fields 1 end] job_id constraint_file tar_path ending_point
+            run_job $chan $job_id $constraint_file $tar_path $ending_point
+        }
+        QUIT {
+            puts $chan "BYE"
+            close $chan
+            set ::worker_done 1
+        }
+        default {
+            puts $chan "FAIL\t-\tunknown command: [lindex $fields 0]"
+        }
+    }
+}
+
+proc accept_client {chan address port} {
+    fconfigure $chan -buffering line -translation lf -encoding utf-8
+    fileevent $chan readable [list handle_client $chan]
+    puts $chan "READY\t$::DESIGN\t$::CORE_UTIL"
+}
+
+init_floorplan
+
+# 在本地随机端口上监听，端口号写入PORT_FILE供客户端读取
+set server [socket -server accept_client -myaddr 127.0.0.1 0]
+set port [lindex [fconfigure $server -sockname] 2]
+set f [open ${PORT_FILE}.tmp w]
+puts $f $port
+close $f
+file rename -force ${PORT_FILE}.tmp $PORT_FILE
+
+vwait ::worker_done
+close $server
+exit
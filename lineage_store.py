@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+约束文件谱系库
+把GA/SA产生的约束文件按 (父代, 改变的create_group行) 的差分记录在一个sqlite文件中，
+每隔SNAPSHOT_INTERVAL代保存一次完整快照，任意历史个体最多回溯SNAPSHOT_INTERVAL步即可还原。
+优化过程中只有仍在使用的个体（种群、最佳个体、正在评估的子代）保留完整文件，
+其余文件在记录后删除，需要时再还原；已有的约束目录也可以整体打包进同一个库
+"""
+
+import os
+import sys
+import glob
+import json
+import zlib
+import sqlite3
+import argparse
+import threading
+from collections import OrderedDict
+
+from constraint_model import ConstraintSet, load_constraint_set
+
+# 差分链的最大长度，超过后保存完整快照
+SNAPSHOT_INTERVAL = 16
+
+# 缓存的已解析快照数，同一快照下的个体还原时不重复解析整个文件
+SNAPSHOT_CACHE_SIZE = 8
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS individuals (
+    name TEXT PRIMARY KEY,  -- 约束文件名（不含目录），如 PE_array__b__70__12.txt
+    path TEXT NOT NULL,     -- 记录时的文件路径
+    parent TEXT,            -- 父代（差分的基准），初始约束文件等根节点为NULL
+    depth INTEGER NOT NULL, -- 距最近快照的差分步数，快照为0
+    data BLOB NOT NULL      -- zlib压缩：快照为完整文件内容，差分为 [[group序号, 命令, 换行符], ...] 的JSON
+)
+"""
+
+
+def lineage_path_for(log_file):
+    """
+    根据优化日志文件名生成谱系库文件名（每次运行一个库，不同运行的同名约束文件互不干扰）
+
+    参数:
+        log_file: 优化日志文件路径，如 20250101_120000__PE_array__b__70__GA.txt
+
+    返回:
+        str: 谱系库路径，如 20250101_120000__PE_array__b__70__GA.lineage.db
+    """
+    base_name, _ = os.path.splitext(log_file)
+    return f"{base_name}.lineage.db"
+
+
+def _diff(parent_set, child_set):
+    """
+    比较两个约束模型
+
+    返回:
+        list: [[group序号, 命令, 换行符], ...]；除create_group外的内容或group数量不同时返回None
+    """
+    if len(parent_set.items) != len(child_set.items) or len(parent_set.groups) != len(child_set.groups):
+        return None
+    for parent_item, child_item in zip(parent_set.items, child_set.items):
+        if isinstance(parent_item, str) != isinstance(child_item, str):
+            return None
+        if isinstance(parent_item, str) and parent_item != child_item:
+            return None
+    changes = []
+    for index, (parent_group, child_group) in enumerate(zip(parent_set.groups, child_set.groups)):
+        text = child_group.to_tcl(child_set.units)
+        if text != parent_group.to_tcl(parent_set.units) or child_group.eol != parent_group.eol:
+            changes.append([index, text, child_group.eol])
+    return changes
+
+
+class LineageStore:
+    """约束文件的差分存储，线程安全"""
+
+    def __init__(self, db_file, snapshot_interval=SNAPSHOT_INTERVAL):
+        """
+        参数:
+            db_file: sqlite文件路径，不存在时创建
+            snapshot_interval: 差分链的最大长度
+        """
+        self.db_file = db_file
+        self.snapshot_interval = snapshot_interval
+        self._lock = threading.Lock()
+        self._snapshots = OrderedDict()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.execute(SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+    def __contains__(self, name):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM individuals WHERE name = ?", (name,)).fetchone() is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM individuals").fetchone()[0]
+
+    def _put(self, name, path, parent, depth, payload):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO individuals VALUES (?, ?, ?, ?, ?)",
+                               (name, path, parent, depth, zlib.compress(payload.encode('utf-8'))))
+            self._conn.commit()
+
+    def _depth(self, name):
+        with self._lock:
+            row = self._conn.execute("SELECT depth FROM individuals WHERE name = ?", (name,)).fetchone()
+        return None if row is None else row[0]
+
+    def record(self, constraint_file, parent_file=None):
+        """
+        记录一个约束文件；父代不在库中时先把父代保存为快照
+
+        参数:
+            constraint_file: 新生成的约束文件
+            parent_file: 父代约束文件（交叉时为作为基础的父代1），为None时保存快照
+
+        返回:
+            int: 距最近快照的差分步数，0表示保存了快照
+        """
+        name = os.path.basename(constraint_file)
+        child_set = load_constraint_set(constraint_file)
+        if parent_file is not None:
+            parent = os.path.basename(parent_file)
+            depth = self._depth(parent)
+            if depth is None:
+                self.record(parent_file)
+                depth = 0
+            if depth < self.snapshot_interval:
+                changes = _diff(load_constraint_set(parent_file), child_set)
+                if changes is not None:
+                    self._put(name, constraint_file, parent, depth + 1, json.dumps(changes, ensure_ascii=False))
+                    return depth + 1
+        self._put(name, constraint_file, os.path.basename(parent_file) if parent_file else None, 0, child_set.serialize())
+        return 0
+
+    def load(self, name):
+        """
+        还原一个个体的约束模型：沿差分链回溯到快照（最多snapshot_interval步）后依次应用差分
+
+        参数:
+            name: 约束文件名或路径
+
+        返回:
+            ConstraintSet: 库中没有时返回None
+        """
+        name = os.path.basename(name)
+        chain = []
+        with self._lock:
+            while True:
+                row = self._conn.execute("SELECT parent, depth, data FROM individuals WHERE name = ?", (name,)).fetchone()
+                if row is None:
+                    return None
+                parent, depth, data = row
+                if depth == 0:
+                    break
+                chain.append(zlib.decompress(data).decode('utf-8'))
+                name = parent
+            snapshot = self._snapshots.get((name, data))
+            if snapshot is None:
+                snapshot = ConstraintSet.from_text(zlib.decompress(data).decode('utf-8'))
+                self._snapshots[(name, data)] = snapshot
+                if len(self._snapshots) > SNAPSHOT_CACHE_SIZE:
+                    self._snapshots.popitem(last=False)
+            else:
+                self._snapshots.move_to_end((name, data))
+        constraint_set = snapshot.copy()
+        for payload in reversed(chain):
+            for index, text, eol in json.loads(payload):
+                constraint_set.replace_group(index, ConstraintSet.from_text(text + eol, constraint_set.units).groups[0])
+        return constraint_set
+
+    def materialize(self, name, output_file=None):
+        """
+        写出一个个体的完整约束文件
+
+        参数:
+            name: 约束文件名或路径
+            output_file: 输出路径，为None时写回记录时的路径
+
+        返回:
+            str: 写出的文件路径，库中没有时返回None
+        """
+        constraint_set = self.load(name)
+        if constraint_set is None:
+            return None
+        if output_file is None:
+            with self._lock:
+                output_file = self._conn.execute("SELECT path FROM individuals WHERE name = ?",
+                                                 (os.path.basename(name),)).fetchone()[0]
+        constraint_set.write(output_file)
+        return output_file
+
+    def ensure_files(self, constraint_files):
+        """还原已被删除的约束文件（如从检查点恢复代理模型的训练样本之前）"""
+        for constraint_file in constraint_files:
+            if not os.path.exists(constraint_file):
+                self.materialize(constraint_file, constraint_file)
+
+    def prune(self, keep_files):
+        """
+        删除已记录、不再使用的约束文件；根节点（初始约束文件等）不删除
+
+        参数:
+            keep_files: 仍在使用的约束文件路径
+
+        返回:
+            int: 删除的文件数
+        """
+        keep = {os.path.abspath(path) for path in keep_files}
+        with self._lock:
+            paths = [row[0] for row in self._conn.execute("SELECT path FROM individuals WHERE parent IS NOT NULL")]
+        removed = 0
+        for path in paths:
+            if os.path.abspath(path) not in keep and os.path.exists(path):
+                os.remove(path)
+                removed += 1
+        return removed
+
+    def pack(self, constraint_files, remove=False):
+        """
+        把已有的约束文件打包进库：按 (case, boundary, util) 分组、按迭代号排序，
+        每个文件以同组前一个文件为差分基准
+
+        参数:
+            constraint_files: 约束文件路径列表
+            remove: 打包并校验后是否删除原文件（每个序列的第一个文件除外）
+
+        返回:
+            int: 打包的文件数
+        """
+        def sort_key(path):
+            prefix, _, iteration = os.path.splitext(os.path.basename(path))[0].rpartition('__')
+            return (prefix, int(iteration) if iteration.isdigit() else -1, path)
+
+        previous = None
+        verified = []
+        for constraint_file in sorted(constraint_files, key=sort_key):
+            same_series = previous is not None and sort_key(previous)[0] == sort_key(constraint_file)[0]
+            self.record(constraint_file, previous if same_series else None)
+            with open(constraint_file, 'r', encoding='utf-8', errors='ignore', newline='') as f:
+                identical = f.read() == self.load(constraint_file).serialize()
+            if not identical:
+                print(f"警告: {constraint_file} 还原后与原文件不一致，保留原文件")
+            elif same_series:
+                verified.append(constraint_file)
+            previous = constraint_file
+        # 后面的文件以前一个文件为差分基准，全部记录完之后再删除
+        if remove:
+            for constraint_file in verified:
+                os.remove(constraint_file)
+        with self._lock:
+            self._conn.execute("VACUUM")
+        return len(constraint_files)
+
+    def stats(self):
+        """返回 (个体数, 快照数, 库文件大小)"""
+        with self._lock:
+            total, snapshots = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(depth = 0), 0) FROM individuals").fetchone()
+        return total, snapshots, os.path.getsize(self.db_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='约束文件谱系库：打包、还原和查看')
+    parser.add_argument('db_file', help='谱系库文件（sqlite），如 20250101_120000__PE_array__b__70__GA.lineage.db')
+    parser.add_argument('--pack', nargs='+', metavar='CONSTRAINT_FILE', help='把约束文件打包进库（支持通配符）')
+    parser.add_argument('--remove', action='store_true', help='打包并校验后删除原文件（每个序列的第一个文件保留）')
+    parser.add_argument('--extract', nargs='+', metavar='NAME', help='还原约束文件（文件名，如 PE_array__b__70__12.txt）')
+    parser.add_argument('-o', '--output-dir', default=None, help='还原到的目录，默认写回记录时的路径')
+    args = parser.parse_args()
+
+    store = LineageStore(args.db_file)
+    if args.pack:
+        files = [path for pattern in args.pack for path in sorted(glob.glob(pattern))]
+        print(f"打包了 {store.pack(files, args.remove)} 个约束文件")
+    for name in args.extract or []:
+        output_file = os.path.join(args.output_dir, os.path.basename(name)) if args.output_dir else None
+        path = store.materialize(name, output_file)
+        print(f"{name}: " + (f"已还原到 {path}" if path else "不在库中"))
+    total, snapshots, size = store.stats()
+    print(f"{args.db_file}: {total} 个个体, {snapshots} 个快照, {size / 1024:.1f} KB")
+    store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+
+'''
+调用方式:
+python lineage_store.py constraint.lineage.db --pack "constraint/PE_array__*.txt" --remove
+python lineage_store.py 20250101_120000__PE_array__b__70__GA.lineage.db --extract PE_array__b__70__57.txt -o /tmp
+
+from lineage_store import LineageStore
+store = LineageStore("run.lineage.db")
+store.record("constraint/PE_array__b__70__2.txt", parent_file="constraint/PE_array__b__70__1.txt")
+store.prune(keep_files=["constraint/PE_array__b__70__2.txt"])
+store.materialize("PE_array__b__70__1.txt")
+
+命令行（优化时只保留仍在使用的约束文件，其余记录在<日志名>.lineage.db中）:
+python run_innovus_dse_GA.py -c PE_array -b Boundary_Badoverlap_i100 --licenses 4 --lineage
+python run_innovus_dse.py -c PE_array -b Boundary_Badoverlap_i100 --lineage
+'''
@@ -0,0 +1,268 @@
+"""
+Innovus日志流式监控模块
+在Innovus运行期间持续读取innovus.logv：布局后的report_route -summary一出现就解析总线长，
+比当前最佳差出给定比例时提前结束任务，把布线阶段的license时间留给有希望的候选；
+超过停滞时间没有新日志行、或总运行时间超限时也结束任务（代替shell脚本中注释掉的timeout 5h）
+"""
+
+import os
+import re
+import time
+import threading
+import subprocess
+
+# 提前结束的原因
+HOPELESS = "hopeless"  # 布局后总线长比当前最佳差出kill_margin
+STALLED = "stalled"    # 超过stall_timeout没有新的日志行
+TIMEOUT = "timeout"    # 总运行时间超过max_runtime
+
+# 评估状态，写入优化日志的status列
+STATUS_OK = "ok"
+STATUS_FAILED = "failed"
+
+NET_LENGTH_PATTERN = re.compile(r'Total net length\s*=\s*([\d.]+)')
+
+
+def killed_status(reason):
+    """
+    返回被提前结束的任务在优化日志中的状态
+
+    参数:
+        reason: 结束原因（HOPELESS、STALLED或TIMEOUT）
+
+    返回:
+        str: 如killed_hopeless
+    """
+    return f"killed_{reason}"
+
+
+class LogvTail:
+    """增量读取正在写入的日志文件，文件尚未创建时返回空列表"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._partial = ''
+
+    def read_lines(self):
+        """
+        读取上次调用之后新增的完整行
+
+        返回:
+            list: 新增的行（不含换行符）
+        """
+        if self._file is None:
+            if not os.path.exists(self.path):
+                return []
+            self._file = open(self.path, 'r', encoding='utf-8', errors='replace')
+        data = self._file.read()
+        if not data:
+            return []
+        data = self._partial + data
+        lines = data.split('\n')
+        # 最后一段可能是写了一半的行，留到下次
+        self._partial = lines.pop()
+        return lines
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class LogvMonitor:
+    """监控一次Innovus运行的logv，判断是否应提前结束"""
+
+    def __init__(self, logv_file, best_fn=None, kill_margin=None, stall_timeout=None, max_runtime=None, poll_interval=5.0):
+        """
+        参数:
+            logv_file: 要监控的innovus.logv路径
+            best_fn: 返回当前最佳布局后总线长的函数，返回None表示还没有参考值
+            kill_margin: 布局后总线长超过最佳值的比例（如0.05表示差5%）时结束，为None时不检查
+            stall_timeout: 没有新日志行的最长秒数，为None时不检查
+            max_runtime: 最长运行秒数，为None时不检查
+            poll_interval: 读取日志的间隔秒数
+        """
+        self.logv_file = logv_file
+        self.best_fn = best_fn
+        self.kill_margin = kill_margin
+        self.stall_timeout = stall_timeout
+        self.max_runtime = max_runtime
+        self.poll_interval = poll_interval
+        self.placed_net_length = None
+        self.kill_reason = None
+        self._tail = LogvTail(logv_file)
+        self._in_report = False
+        self.start_time = None
+        self.last_progress = None
+
+    def start(self, now=None):
+        """开始计时，在Innovus进程启动时调用"""
+        now = time.time() if now is None else now
+        self.start_time = now
+        self.last_progress = now
+
+    def status(self, success):
+        """
+        返回本次运行在优化日志中的状态
+
+        参数:
+            success: Innovus是否正常结束
+
+        返回:
+            str: ok、failed或killed_<原因>
+        """
+        if self.kill_reason is not None:
+            return killed_status(self.kill_reason)
+        return STATUS_OK if success else STATUS_FAILED
+
+    def poll(self, now=None):
+        """
+        读取新增日志并检查结束条件
+
+        参数:
+            now: 当前时间，默认time.time()
+
+        返回:
+            str: 应结束任务的原因，不需要结束时返回None
+        """
+        now = time.time() if now is None else now
+        if self.start_time is None:
+            self.start(now)
+
+        lines = self._tail.read_lines()
+        if lines:
+            self.last_progress = now
+        for line in lines:
+            # 第一个report_route -summary是布局后的报告
+            if self.placed_net_length is None:
+                if '<CMD> report_route -summary' in line:
+                    self._in_report = True
+                elif self._in_report:
+                    match = NET_LENGTH_PATTERN.search(line)
+                    if match:
+                        self.placed_net_length = float(match.group(1))
+
+        if self.kill_margin is not None and self.placed_net_length is not None and self.best_fn is not None:
+            best = self.best_fn()
+            if best is not None and self.placed_net_length > best * (1 + self.kill_margin):
+                return self._kill(HOPELESS, f"布局后总线长 {self.placed_net_length} 比当前最佳 {best} 差超过 {self.kill_margin:.1%}")
+        if self.stall_timeout is not None and now - self.last_progress > self.stall_timeout:
+            return self._kill(STALLED, f"{now - self.last_progress:.0f} 秒没有新的日志行")
+        if self.max_runtime is not None and now - self.start_time > self.max_runtime:
+            return self._kill(TIMEOUT, f"运行时间超过 {self.max_runtime} 秒")
+        return None
+
+    def _kill(self, reason, message):
+        self.kill_reason = reason
+        print(f"提前结束Innovus任务 ({reason}): {message}, 日志 {self.logv_file}")
+        return reason
+
+    def close(self):
+        self._tail.close()
+
+
+class MonitorPolicy:
+    """
+    一次优化运行共用的监控设置，并记录已完成运行中最好的布局后总线长作为提前结束的参考值。
+    线程安全，可以在并发评估中共用
+    """
+
+    def __init__(self, kill_margin=None, stall_timeout=None, max_runtime=None, poll_interval=5.0):
+        """
+        参数:
+            kill_margin: 布局后总线长比最佳值差超过该比例时结束任务，为None时不提前结束
+            stall_timeout: 没有新日志行的最长秒数
+            max_runtime: 最长运行秒数
+            poll_interval: 读取日志的间隔秒数
+        """
+        self.kill_margin = kill_margin
+        self.stall_timeout = stall_timeout
+        self.max_runtime = max_runtime
+        self.poll_interval = poll_interval
+        self.best_placed_net_length = None
+        self._lock = threading.Lock()
+
+    def best(self):
+        """返回已完成运行中最好的布局后总线长"""
+        with self._lock:
+            return self.best_placed_net_length
+
+    def monitor(self, logv_file, check_hopeless=True):
+        """
+        为一次运行创建监控器
+
+        参数:
+            logv_file: 该运行的innovus.logv路径
+            check_hopeless: 是否按布局后总线长提前结束（从布局结果继续布线的运行没有布局报告，应为False）
+
+        返回:
+            LogvMonitor: 监控器
+        """
+        kill_margin = self.kill_margin if check_hopeless else None
+        return LogvMonitor(logv_file, self.best, kill_margin, self.stall_timeout, self.max_runtime, self.poll_interval)
+
+    def record(self, monitor):
+        """运行结束后调用，用未被提前结束的运行更新参考值"""
+        monitor.close()
+        if monitor.kill_reason is not None or monitor.placed_net_length is None:
+            return
+        with self._lock:
+            if self.best_placed_net_length is None or monitor.placed_net_length < self.best_placed_net_length:
+                self.best_placed_net_length = monitor.placed_net_length
+
+    def to_dict(self):
+        """返回可JSON序列化的设置和参考值，用于检查点"""
+        with self._lock:
+            return {
+                'kill_margin': self.kill_margin, 'stall_timeout': self.stall_timeout,
+                'max_runtime': self.max_runtime, 'poll_interval': self.poll_interval,
+                'best_placed_net_length': self.best_placed_net_length,
+            }
+
+    @classmethod
+    def from_dict(cls, data):
+        """从to_dict的结果恢复"""
+        policy = cls(data['kill_margin'], data['stall_timeout'], data['max_runtime'], data['poll_interval'])
+        policy.best_placed_net_length = data['best_placed_net_length']
+        return policy
+
+
+def wait_process(process, monitor, kill_grace=30.0):
+    """
+    等待Innovus进程结束，期间按monitor.poll_interval检查日志，满足结束条件时终止进程
+
+    参数:
+        process: subprocess.Popen对象
+        monitor: LogvMonitor
+        kill_grace: 发送SIGTERM后等待的秒数，超时后SIGKILL
+
+    返回:
+        int: 进程返回码
+    """
+    monitor.start()
+    while True:
+        try:
+            return process.wait(timeout=monitor.poll_interval)
+        except subprocess.TimeoutExpired:
+            pass
+        if monitor.poll() is not None:
+            process.terminate()
+            try:
+                return process.wait(timeout=kill_grace)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                return process.wait()
+
+
+'''
+调用方式:
+from logv_monitor import MonitorPolicy, wait_process
+
+policy = MonitorPolicy(kill_margin=0.05, stall_timeout=1800, max_runtime=5 * 3600)
+monitor = policy.monitor("/path/to/run_dir/innovus.logv")
+process = subprocess.Popen(["innovus", "-no_gui", "-files", "run.tcl"], cwd="/path/to/run_dir")
+returncode = wait_process(process, monitor)
+policy.record(monitor)
+print(monitor.status(returncode == 0), monitor.placed_net_length)
+'''
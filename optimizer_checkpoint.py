@@ -0,0 +1,76 @@
+"""
+优化器断点续跑模块
+将模拟退火/遗传算法的完整状态（含随机数状态）原子地写入JSON检查点，
+进程中断后可以从检查点继续运行，不重复已完成的Innovus评估
+"""
+
+import os
+import json
+import random
+
+
+def checkpoint_path_for(log_file):
+    """
+    根据日志文件名生成检查点文件名
+
+    参数:
+        log_file: 优化日志文件路径，如 20250101_120000__PE_array__b__70__GA.txt
+
+    返回:
+        str: 检查点文件路径，如 20250101_120000__PE_array__b__70__GA.checkpoint.json
+    """
+    base_name, _ = os.path.splitext(log_file)
+    return f"{base_name}.checkpoint.json"
+
+
+def get_rng_state():
+    """返回可JSON序列化的random模块状态"""
+    version, internal_state, gauss_next = random.getstate()
+    return [version, list(internal_state), gauss_next]
+
+
+def set_rng_state(state):
+    """恢复get_rng_state保存的random模块状态"""
+    version, internal_state, gauss_next = state
+    random.setstate((version, tuple(internal_state), gauss_next))
+
+
+def save_checkpoint(checkpoint_file, state):
+    """
+    原子地保存检查点：先写临时文件并刷盘，再替换正式文件
+
+    参数:
+        checkpoint_file: 检查点文件路径
+        state: 可JSON序列化的状态字典
+    """
+    tmp_file = f"{checkpoint_file}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, checkpoint_file)
+
+
+def load_checkpoint(checkpoint_file):
+    """
+    读取检查点
+
+    参数:
+        checkpoint_file: 检查点文件路径
+
+    返回:
+        dict: 状态字典
+    """
+    with open(checkpoint_file, 'r') as f:
+        return json.load(f)
+
+
+'''
+调用方式:
+from optimizer_checkpoint import save_checkpoint, load_checkpoint, get_rng_state, set_rng_state
+
+save_checkpoint("run.checkpoint.json", {'iteration': 5, 'rng_state': get_rng_state()})
+
+state = load_checkpoint("run.checkpoint.json")
+set_rng_state(state['rng_state'])
+'''
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+布局密度分析模块
+把DEF中已放置实例的面积按网格分配到各个bin上（numpy向量化，不逐个实例循环），
+得到占用率栅格，并按REGIONS中的每个区域统计峰值和平均密度。
+栅格可以保存为.npz，由constraint_visualizer.py叠加在create_group多边形下面显示
+"""
+
+import os
+import sys
+import json
+import argparse
+
+import numpy as np
+
+from def_parser import iter_def_statements, parse_component, parse_region, parse_die_area
+from hpwl import parse_lef_pin_offsets
+
+# 没有LEF时每个实例按该面积（平方微米）计算，密度变为实例数的相对值
+DEFAULT_CELL_AREA = 1.0
+
+
+def load_placement(def_file, lef_macros=None):
+    """
+    读取DEF中的版图范围、已放置实例的矩形和REGIONS
+
+    参数:
+        def_file: DEF文件路径
+        lef_macros: parse_lef_pin_offsets的结果，提供单元尺寸；为None时实例按DEFAULT_CELL_AREA的正方形计算
+
+    返回:
+        dict: 'units', 'die'（(x1, y1, x2, y2)，微米）, 'rects'（N×4数组，微米）, 'regions'（parse_region的结果，坐标为微米）
+    """
+    units = None
+    die = None
+    xs = []
+    ys = []
+    models = []
+    orients = []
+    regions = []
+    for section, tokens in iter_def_statements(def_file, {None, 'COMPONENTS', 'REGIONS'}):
+        if section == 'COMPONENTS':
+            component = parse_component(tokens)
+            if component is not None and component['location'] is not None:
+                xs.append(component['location'][0])
+                ys.append(component['location'][1])
+                models.append(component['model'])
+                orients.append(component['orient'])
+        elif section == 'REGIONS':
+            region = parse_region(tokens)
+            if region is not None:
+                regions.append(region)
+        elif tokens[:3] == ['UNITS', 'DISTANCE', 'MICRONS'] and len(tokens) > 3:
+            units = int(tokens[3])
+        elif tokens[0] == 'DIEAREA':
+            die = parse_die_area(tokens)
+    units = units or 1000
+
+    # 单元尺寸按模型查表，E/W类方向宽高互换
+    default_side = DEFAULT_CELL_AREA ** 0.5
+    sizes = {}
+    widths = np.empty(len(xs))
+    heights = np.empty(len(xs))
+    for i, (model, orient) in enumerate(zip(models, orients)):
+        size = sizes.get(model)
+        if size is None:
+            macro = lef_macros.get(model) if lef_macros else None
+            size = macro['size'] if macro is not None else (default_side, default_side)
+            sizes[model] = size
+        if orient in ('E', 'W', 'FE', 'FW'):
+            widths[i], heights[i] = size[1], size[0]
+        else:
+            widths[i], heights[i] = size
+    x0 = np.array(xs, dtype=np.float64) / units
+    y0 = np.array(ys, dtype=np.float64) / units
+    rects = np.column_stack([x0, y0, x0 + widths, y0 + heights]) if len(xs) else np.zeros((0, 4))
+
+    if die is not None:
+        die = tuple(value / units for value in die)
+    elif len(rects):
+        die = (rects[:, 0].min(), rects[:, 1].min(), rects[:, 2].max(), rects[:, 3].max())
+    else:
+        die = (0.0, 0.0, 0.0, 0.0)
+    for region in regions:
+        region['rects'] = [tuple(value / units for value in rect) for rect in region['rects']]
+    return {'units': units, 'die': die, 'rects': rects, 'regions': regions}
+
+
+def _axis_split(low, high, origin, bin_size, bins):
+    """
+    把一维区间[low, high)分到最多两个相邻的bin
+
+    返回:
+        tuple: (第一个bin下标, 第一个bin内的长度, 第二个bin内的长度)，下标已截断到[0, bins-1]
+    """
+    first = np.floor((low - origin) / bin_size).astype(np.int64)
+    boundary = origin + (first + 1) * bin_size
+    first_length = np.minimum(high, boundary) - low
+    second_length = (high - low) - first_length
+    return np.clip(first, 0, bins - 1), first_length, second_length
+
+
+def density_raster(rects, die, bin_size):
+    """
+    计算占用率栅格：每个bin内实例面积之和除以bin面积
+
+    参数:
+        rects: 实例矩形（N×4数组，微米）
+        die: 版图范围（微米）
+        bin_size: bin边长（微米）
+
+    返回:
+        numpy.ndarray: 形状为 (ny, nx) 的密度，行对应y
+    """
+    nx = max(1, int(np.ceil((die[2] - die[0]) / bin_size)))
+    ny = max(1, int(np.ceil((die[3] - die[1]) / bin_size)))
+    area = np.zeros(ny * nx)
+    if len(rects):
+        # 不超过一个bin的实例最多跨2×2个bin，用四次bincount完成；更大的实例（宏单元等）单独处理
+        small = ((rects[:, 2] - rects[:, 0]) <= bin_size) & ((rects[:, 3] - rects[:, 1]) <= bin_size)
+        cells = rects[small]
+        ix, wx0, wx1 = _axis_split(cells[:, 0], cells[:, 2], die[0], bin_size, nx)
+        iy, wy0, wy1 = _axis_split(cells[:, 1], cells[:, 3], die[1], bin_size, ny)
+        ix1 = np.minimum(ix + 1, nx - 1)
+        iy1 = np.minimum(iy + 1, ny - 1)
+        for rows, cols, weights in ((iy, ix, wy0 * wx0), (iy, ix1, wy0 * wx1), (iy1, ix, wy1 * wx0), (iy1, ix1, wy1 * wx1)):
+            area += np.bincount(rows * nx + cols, weights=weights, minlength=ny * nx)
+
+        for x1, y1, x2, y2 in rects[~small]:
+            col_edges = die[0] + np.arange(nx + 1) * bin_size
+            row_edges = die[1] + np.arange(ny + 1) * bin_size
+            overlap_x = np.clip(np.minimum(col_edges[1:], x2) - np.maximum(col_edges[:-1], x1), 0, None)
+            overlap_y = np.clip(np.minimum(row_edges[1:], y2) - np.maximum(row_edges[:-1], y1), 0, None)
+            area += np.outer(overlap_y, overlap_x).ravel()
+    return area.reshape(ny, nx) / (bin_size * bin_size)
+
+
+def region_mask(region_rects, die, bin_size, shape):
+    """
+    返回bin中心落在区域内的掩码
+
+    参数:
+        region_rects: 区域的矩形列表（微米）
+        die: 版图范围
+        bin_size: bin边长
+        shape: 栅格形状 (ny, nx)
+
+    返回:
+        numpy.ndarray: bool掩码
+    """
+    centers_x = die[0] + (np.arange(shape[1]) + 0.5) * bin_size
+    centers_y = die[1] + (np.arange(shape[0]) + 0.5) * bin_size
+    mask = np.zeros(shape, dtype=bool)
+    for x1, y1, x2, y2 in region_rects:
+        inside_x = (centers_x >= min(x1, x2)) & (centers_x < max(x1, x2))
+        inside_y = (centers_y >= min(y1, y2)) & (centers_y < max(y1, y2))
+        mask |= np.outer(inside_y, inside_x)
+    return mask
+
+
+def region_stats(density, regions, die, bin_size):
+    """
+    统计每个区域的峰值和平均密度
+
+    返回:
+        dict: 区域名 -> {'peak', 'mean', 'bins', 'type'}，区域小于一个bin时peak和mean为None
+    """
+    stats = {}
+    for region in regions:
+        mask = region_mask(region['rects'], die, bin_size, density.shape)
+        values = density[mask]
+        stats[region['name']] = {
+            'peak': float(values.max()) if values.size else None,
+            'mean': float(values.mean()) if values.size else None,
+            'bins': int(values.size),
+            'type': region['type'],
+        }
+    return stats
+
+
+def analyze_density(def_file, bin_size=10.0, lef_file=None):
+    """
+    计算DEF的密度栅格和各区域统计
+
+    参数:
+        def_file: DEF文件路径
+        bin_size: bin边长（微米）
+        lef_file: LEF文件路径，为None时密度为实例数的相对值
+
+    返回:
+        dict: 'density'（栅格）, 'die', 'bin_size', 'peak', 'mean', 'regions'（region_stats的结果）, 'metric'（area或count）；
+              读取失败时返回None
+    """
+    try:
+        lef_macros = parse_lef_pin_offsets(lef_file) if lef_file else None
+        placement = load_placement(def_file, lef_macros)
+    except Exception as e:
+        print(f"读取DEF文件时出错: {e}")
+        return None
+    density = density_raster(placement['rects'], placement['die'], bin_size)
+    return {
+        'density': density,
+        'die': placement['die'],
+        'bin_size': bin_size,
+        'peak': float(density.max()),
+        'mean': float(density.mean()),
+        'regions': region_stats(density, placement['regions'], placement['die'], bin_size),
+        'metric': 'area' if lef_file else 'count',
+    }
+
+
+def save_density(result, output_file):
+    """
+    保存密度栅格，供constraint_visualizer.py叠加显示
+
+    参数:
+        result: analyze_density的结果
+        output_file: .npz文件路径
+    """
+    np.savez_compressed(output_file, density=result['density'], die=np.array(result['die']),
+                        bin_size=result['bin_size'], regions=json.dumps(result['regions']),
+                        metric=result['metric'])
+
+
+def load_density(density_file):
+    """
+    读取save_density保存的栅格
+
+    返回:
+        dict: 'density', 'die', 'bin_size', 'regions', 'metric'
+    """
+    with np.load(density_file) as data:
+        return {
+            'density': data['density'],
+            'die': tuple(data['die'].tolist()),
+            'bin_size': float(data['bin_size']),
+            'regions': json.loads(str(data['regions'])),
+            'metric': str(data['metric']),
+        }
+
+
+def write_run_density(run_dir, case, bin_size=10.0, lef_file=None):
+    """
+    分析一次运行的postPlace.def并把栅格保存为 {run_dir}/{case}.density.npz，供每次评估后自动调用
+
+    参数:
+        run_dir: Innovus运行目录
+        case: 案例名称（DEF文件名前缀）
+        bin_size: bin边长（微米）
+        lef_file: LEF文件路径
+
+    返回:
+        dict: analyze_density的结果，DEF不存在或读取失败时返回None
+    """
+    def_file = os.path.join(run_dir, f"{case}.postPlace.def")
+    if not os.path.exists(def_file):
+        return None
+    result = analyze_density(def_file, bin_size, lef_file)
+    if result is not None:
+        save_density(result, os.path.join(run_dir, f"{case}.density.npz"))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='从DEF计算布局密度栅格和各区域的峰值/平均密度')
+    parser.add_argument('def_file', help='DEF文件路径，如 case__.../PE_array.postPlace.def')
+    parser.add_argument('--bin-size', type=float, default=10.0, help='bin边长（微米）')
+    parser.add_argument('--lef', default=None, help='LEF文件路径，提供单元尺寸；不提供时按实例数计算')
+    parser.add_argument('-o', '--output', default=None, help='保存栅格的.npz文件，可用constraint_visualizer.py --density叠加显示')
+    args = parser.parse_args()
+
+    result = analyze_density(args.def_file, args.bin_size, args.lef)
+    if result is None:
+        return 1
+    ny, nx = result['density'].shape
+    print(f"栅格: {nx} x {ny}, bin边长 {args.bin_size} um ({result['metric']})")
+    print(f"整体密度: 峰值 {result['peak']:.3f}, 平均 {result['mean']:.3f}")
+    for name, stats in result['regions'].items():
+        if stats['peak'] is None:
+            print(f"  {name} ({stats['type']}): 小于一个bin")
+        else:
+            print(f"  {name} ({stats['type']}): 峰值 {stats['peak']:.3f}, 平均 {stats['mean']:.3f}, {stats['bins']} 个bin")
+    if args.output:
+        save_density(result, args.output)
+        print(f"密度栅格已保存到: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+
+'''
+调用方式:
+python placement_density.py PE_array.postPlace.def --lef cells.lef --bin-size 5 -o density.npz
+python constraint_visualizer.py constraint/PE_array__Boundary_Badoverlap_i100__70__5.txt --density density.npz
+
+from placement_density import analyze_density
+result = analyze_density("PE_array.postPlace.def", bin_size=5.0, lef_file="cells.lef")
+print(result['regions']['gen_PE_row_0']['peak'])
+'''
@@ -4,6 +4,19 @@ import sys
 import os
 import copy
 
+import numpy as np
+
+from constraint_model import UNITS, GROUP_TYPES, load_constraint_set, save_constraint_set
+
+# 可用的修改类型
+MOD_TYPES = [
+    "type_parameter",    # 修改-type参数
+    "edge_shift",        # 边缘移动
+    "add_boundary",      # 添加边界矩形
+    "remove_boundary",   # 移除边界矩形
+    "move_entire"        # 整体移动
+]
+
 def modify_type_parameter(line):
     """
     将 -type 参数随机修改为 guide, region 或 fence 中的一种
@@ -14,7 +27,7 @@ def modify_type_parameter(line):
     返回:
         str: 修改后的行
     """
-    types = ["guide", "region", "fence"]
+    types = GROUP_TYPES
     # 使用正则表达式找到并替换 -type 后的参数
     pattern = r'(-type\s+)(\w+)'
     match = re.search(pattern, line)
@@ -54,10 +67,27 @@ def points_to_polygon_str(points):
     point_strs = [f"{{{x} {y}}}" for x, y in points]
     return "{" + " ".join(point_strs) + "}"
 
+def _level_bounds(levels):
+    """
+    对按层号排序的数组，返回每层的起始下标和结束下标（不含）
+
+    参数:
+        levels: 非降序的层号数组
+
+    返回:
+        tuple: (起始下标数组, 结束下标数组)
+    """
+    starts = np.flatnonzero(np.concatenate(([True], levels[1:] != levels[:-1])))
+    ends = np.append(starts[1:], len(levels))
+    return starts, ends
+
 def extract_rectangles(points):
     """
     从多边形点序列中提取出组成阶梯状多边形的矩形
     假设多边形是由固定高度但不同宽度的矩形堆叠而成
+
+    扫描线实现：按(y层, x)排序一次后，每层的最左/最右x、
+    以及同时出现在相邻两层的x（边界点）都由向量化的相邻比较得到，排序之后是线性的
     
     参数:
         points (list): 点列表，每个点是 [x, y] 的形式
@@ -65,44 +95,81 @@ def extract_rectangles(points):
     返回:
         list: 矩形列表，每个矩形由 [[左下x, 左下y], [右上x, 右上y]] 表示
     """
-    # 按y坐标排序点
-    sorted_points = sorted(points, key=lambda p: p[1])
+    if len(points) == 0:
+        return []
+    coords = np.asarray(points).reshape(-1, 2)
+    xs = coords[:, 0]
     
-    # 找出所有不同的y坐标（高度级别）
-    heights = sorted(set(p[1] for p in sorted_points))
+    # 所有不同的y坐标（高度级别），以及每个点所在的层号
+    heights, level = np.unique(coords[:, 1], return_inverse=True)
+    if len(heights) < 2:
+        return []
     
-    # 对每个高度，找出该高度对应的最左和最右的x坐标
-    rectangles = []
-    for i in range(len(heights) - 1):
-        y_bottom = heights[i]
-        y_top = heights[i+1]
-        
-        # 找出在底部和顶部的所有点
-        bottom_points = [p[0] for p in sorted_points if p[1] == y_bottom]
-        top_points = [p[0] for p in sorted_points if p[1] == y_top]
-        
-        # Find common points between bottom and top (boundary points)
-        common_points = set(bottom_points) & set(top_points)
-        
-        # If there are common points, use them as boundaries
-        # Otherwise fall back to the min/max of bottom points
-        left_x = min(common_points) if common_points else min(bottom_points)
-        right_x = max(common_points) if common_points else max(bottom_points)
-        
+    # 按(层号, x)排序并去掉重复点
+    order = np.lexsort((xs, level))
+    level = level[order]
+    xs = xs[order]
+    keep = np.concatenate(([True], (level[1:] != level[:-1]) | (xs[1:] != xs[:-1])))
+    level = level[keep]
+    xs = xs[keep]
+    starts, ends = _level_bounds(level)
+    
+    # 每层的最左和最右x（没有公共点时使用）
+    left_x = xs[starts]
+    right_x = xs[ends - 1]
+    
+    # 公共点：同一个x出现在第k层和第k+1层。按(x, 层号)排序后它们相邻
+    by_x = np.lexsort((level, xs))
+    xs_by_x = xs[by_x]
+    level_by_x = level[by_x]
+    common = (xs_by_x[1:] == xs_by_x[:-1]) & (level_by_x[1:] == level_by_x[:-1] + 1)
+    common_level = level_by_x[:-1][common]
+    common_x = xs_by_x[:-1][common]
+    if len(common_level):
+        # 按(层号, x)排序后，每层第一个公共点最小、最后一个最大
+        order = np.lexsort((common_x, common_level))
+        common_level = common_level[order]
+        common_x = common_x[order]
+        common_starts, common_ends = _level_bounds(common_level)
+        left_x = left_x.copy()
+        right_x = right_x.copy()
+        left_x[common_level[common_starts]] = common_x[common_starts]
+        right_x[common_level[common_starts]] = common_x[common_ends - 1]
+    
+    # 第k个矩形位于第k层和第k+1层之间 [左下角, 右上角]
+    heights = heights.tolist()
+    return [[[left, heights[k]], [right, heights[k + 1]]]
+            for k, (left, right) in enumerate(zip(left_x[:-1].tolist(), right_x[:-1].tolist()))]
 
+def _profiles(edge_x, heights):
+    """
+    由每层的左、右边界x构造两侧轮廓：每层一个点，x变化时在该层先插入上一层x处的垂直连接点
 
-        # # 找出矩形的左右边界
-        # left_x = max(min(bottom_points), min(top_points))
-        # right_x = min(max(bottom_points), max(top_points))
-        
-        # 添加矩形 [左下角, 右上角]
-        rectangles.append([[left_x, y_bottom], [right_x, y_top]])
-    
-    return rectangles
+    参数:
+        edge_x: 2×L数组，第0行为每层的左边界x，第1行为右边界x
+        heights: 每层的y
+
+    返回:
+        tuple: (左侧轮廓点x, 左侧轮廓点y, 右侧轮廓点x, 右侧轮廓点y)，均从下到上
+    """
+    # 第i层占两个槽位：连接点 (edge_x[i-1], y[i]) 和当前点 (edge_x[i], y[i])
+    count = edge_x.shape[1]
+    xs = np.empty((2, 2 * count), dtype=edge_x.dtype)
+    xs[:, 0] = edge_x[:, 0]
+    xs[:, 2::2] = edge_x[:, :-1]
+    xs[:, 1::2] = edge_x
+    valid = np.zeros((2, 2 * count), dtype=bool)
+    valid[:, 1::2] = True
+    valid[:, 2::2] = np.abs(edge_x[:, 1:] - edge_x[:, :-1]) > 1e-6
+    ys = np.repeat(heights, 2)
+    return xs[0][valid[0]], ys[valid[0]], xs[1][valid[1]], ys[valid[1]]
 
 def rectangles_to_points(rectangles):
     """
     将矩形列表转换为多边形点序列（阶梯状多边形）
+
+    扫描线实现：矩形的上下边按y排序一次后合并为层（每层取最左和最右端点），
+    左右轮廓在x变化处插入垂直连接点，全部由向量化运算完成
     
     参数:
         rectangles (list): 矩形列表，每个矩形由 [[左下x, 左下y], [右上x, 右上y]] 表示
@@ -110,103 +177,129 @@ def rectangles_to_points(rectangles):
     返回:
         list: 多边形点序列，按逆时针顺序排列
     """
-    if not rectangles:
+    if len(rectangles) == 0:
         return []
+    rects = np.asarray(rectangles).reshape(-1, 4)
     
-    # 按底部y坐标排序矩形（从下到上）
-    sorted_rects = sorted(rectangles, key=lambda r: r[0][1])
+    # 每个矩形贡献底边和顶边两个端点：(左x, 右x, y)，按y排序
+    ys = np.concatenate([rects[:, 1], rects[:, 3]])
+    order = np.argsort(ys, kind='stable')
+    ys = ys[order]
+    starts = np.flatnonzero(np.concatenate(([True], ys[1:] != ys[:-1])))
     
-    # 提取每层矩形的左右端点和y坐标
-    layer_endpoints = []
-    for rect in sorted_rects:
-        left_x, bottom_y = rect[0]
-        right_x, top_y = rect[1]
-        
-        # 添加底部端点
-        layer_endpoints.append((left_x, right_x, bottom_y))
-        # 添加顶部端点
-        layer_endpoints.append((left_x, right_x, top_y))
-    
-    # 按y坐标从小到大排序
-    sorted_endpoints = sorted(layer_endpoints, key=lambda e: e[2])
-    
-    # 合并相同高度的端点
-    merged_endpoints = []
-    current_y = None
-    current_left = float('inf')
-    current_right = float('-inf')
-    
-    for left_x, right_x, y in sorted_endpoints:
-        if y != current_y:
-            # 保存前一层（如果存在）
-            if current_y is not None:
-                merged_endpoints.append((current_left, current_right, current_y))
-            # 开始新的一层
-            current_y = y
-            current_left = left_x
-            current_right = right_x
-        else:
-            # 更新当前层的左右端点
-            current_left = min(current_left, left_x)
-            current_right = max(current_right, right_x)
-    
-    # 添加最后一层
-    if current_y is not None:
-        merged_endpoints.append((current_left, current_right, current_y))
-    
-    # 分别构建左侧轮廓和右侧轮廓
-    left_profile = []
-    right_profile = []
-    
-    # 处理每一层的端点
-    for i, (left_x, right_x, y) in enumerate(merged_endpoints):
-        # 处理左侧轮廓
-        if i > 0:
-            prev_left_x = merged_endpoints[i-1][0]
-            # 如果左侧x坐标变化，添加一个垂直连接点
-            if abs(left_x - prev_left_x) > 1e-6:
-                left_profile.append((prev_left_x, y))
-        
-        # 添加当前左侧点
-        left_profile.append((left_x, y))
-        
-        # 处理右侧轮廓
-        if i > 0:
-            prev_right_x = merged_endpoints[i-1][1]
-            # 如果右侧x坐标变化，添加一个垂直连接点
-            if abs(right_x - prev_right_x) > 1e-6:
-                right_profile.append((prev_right_x, y))
-        
-        # 添加当前右侧点
-        right_profile.append((right_x, y))
+    # 合并相同高度的端点：每层取最左和最右
+    edge_x = np.vstack([
+        np.minimum.reduceat(np.concatenate([rects[:, 0], rects[:, 0]])[order], starts),
+        np.maximum.reduceat(np.concatenate([rects[:, 2], rects[:, 2]])[order], starts),
+    ])
+    left_xs, left_ys, right_xs, right_ys = _profiles(edge_x, ys[starts])
     
     # 合并左右轮廓：左侧轮廓从下到上，右侧轮廓从上到下
-    boundary = left_profile + list(reversed(right_profile))
+    xs = np.concatenate([left_xs, right_xs[::-1]]).tolist()
+    ys = np.concatenate([left_ys, right_ys[::-1]]).tolist()
     
     # # 确保多边形闭合
     # if boundary and (boundary[0][0] != boundary[-1][0] or boundary[0][1] != boundary[-1][1]):
     #     boundary.append(boundary[0])
     
-    return boundary
+    return list(zip(xs, ys))
 
-def perform_edge_shift(polygon_str, shift_distance=1.0):
+def placement_grid(def_results, units=UNITS):
     """
-    对多边形执行edge_shift操作，随机选择一个矩形，修改其宽度
-    
+    从DEF解析结果得到吸附网格：x为placement site宽度，y为row高度，原点为第一个ROW的位置
+
     参数:
-        polygon_str (str): 多边形字符串
-        shift_distance (float): 移动距离
-    
+        def_results: def_parser.parse_def_file的结果
+        units: 约束坐标每微米的单位数
+
     返回:
-        str: 修改后的多边形字符串
+        tuple: (x网格, y网格, 原点(x, y))，整数单位；没有ROW信息时返回None
+    """
+    if not def_results or not def_results.get('row_height'):
+        return None
+    x_grid = int(round(def_results['site_width'] * units)) if def_results.get('site_width') else None
+    y_grid = int(round(def_results['row_height'] * units))
+    origin = def_results.get('row_origin') or (0.0, 0.0)
+    return (x_grid, y_grid, (int(round(origin[0] * units)), int(round(origin[1] * units))))
+
+def _snap(values, grid, origin):
+    """把整数坐标四舍五入到 origin + k * grid"""
+    return origin + np.floor_divide(2 * (values - origin) + grid, 2 * grid) * grid
+
+def canonicalize_points(points, grid=None):
+    """
+    多边形的规范形式：x吸附到site网格、y吸附到row高度，去掉重复点和共线点，
+    方向统一为顺时针，从最下面一层的最左端点开始。形状相同的多边形得到相同的点序列，
+    写出的约束文件相同，适应度缓存按内容命中
+
+    参数:
+        points: 点列表或N×2数组（整数单位）
+        grid: placement_grid的结果，为None时不吸附
+
+    返回:
+        numpy.ndarray: N×2的int64数组，少于3个点时为去重后的点
+    """
+    vertices = np.rint(np.asarray(points, dtype=np.float64)).astype(np.int64).reshape(-1, 2)
+    if grid is not None:
+        x_grid, y_grid, origin = grid
+        if x_grid:
+            vertices[:, 0] = _snap(vertices[:, 0], x_grid, origin[0])
+        if y_grid:
+            vertices[:, 1] = _snap(vertices[:, 1], y_grid, origin[1])
+
+    # 与前后两点共线的点（包括重复点）是多余的；吸附和删点可能产生新的共线点，重复到不再变化
+    while len(vertices) >= 3:
+        index = np.arange(len(vertices))
+        incoming = vertices - vertices[index - 1]
+        outgoing = vertices[(index + 1) % len(vertices)] - vertices
+        redundant = incoming[:, 0] * outgoing[:, 1] - incoming[:, 1] * outgoing[:, 0] == 0
+        if not redundant.any():
+            break
+        if redundant.all():
+            vertices = vertices[:1]
+            break
+        vertices = vertices[~redundant]
+    if len(vertices) < 3:
+        return np.unique(vertices, axis=0)
+
+    # 鞋带公式为正表示逆时针，翻转为顺时针
+    following = vertices[(np.arange(len(vertices)) + 1) % len(vertices)]
+    if (vertices[:, 0] * following[:, 1] - following[:, 0] * vertices[:, 1]).sum() > 0:
+        vertices = vertices[::-1]
+    start = np.lexsort((vertices[:, 0], vertices[:, 1]))[0]
+    return np.concatenate([vertices[start:], vertices[:start]])
+
+def canonicalize_polygon(polygon_str, grid=None, units=UNITS):
+    """
+    规范化多边形字符串，消除浮点累加误差（如3.1690000000000005）和多余的共线点
+
+    参数:
+        polygon_str (str): 多边形字符串（微米）
+        grid: placement_grid的结果（整数单位），为None时不吸附
+        units: 每微米的单位数
+
+    返回:
+        str: 规范化后的多边形字符串
+    """
+    points = np.array(parse_polygon_points(polygon_str), dtype=np.float64).reshape(-1, 2)
+    return points_to_polygon_str((canonicalize_points(points * units, grid) / units).tolist())
+
+def edge_shift_points(points, shift_distance=1.0, record=None):
+    """
+    对点序列执行edge_shift操作，随机选择一个矩形，修改其宽度
+
+    参数:
+        points (list): 点列表，每个点是 [x, y] 的形式
+        shift_distance: 移动距离（与点坐标同单位）
+        record (dict, optional): 写入本次随机选择的参数（rect, edge, shift, applied）
+
+    返回:
+        list: 修改后的点列表，无法提取矩形时返回None
     """
-    # 解析多边形点
-    points = parse_polygon_points(polygon_str)
-    
     # 提取矩形
     rectangles = extract_rectangles(points)
     if not rectangles:
-        return polygon_str
+        return None
     
     # 随机选择一个矩形
     rect_idx = random.randint(0, len(rectangles) - 1)
@@ -223,39 +316,40 @@ def perform_edge_shift(polygon_str, shift_distance=1.0):
     # 应用移动
     if edge_to_move == "left":
         # 确保移动后矩形宽度仍为正数
-        if rect[0][0] + actual_shift < rect[1][0]:
+        applied = rect[0][0] + actual_shift < rect[1][0]
+        if applied:
             rect[0][0] += actual_shift
     else:  # right
         # 确保移动后矩形宽度仍为正数
-        if rect[1][0] + actual_shift > rect[0][0]:
+        applied = rect[1][0] + actual_shift > rect[0][0]
+        if applied:
             rect[1][0] += actual_shift
+    if record is not None:
+        record.update(rect=rect_idx, edge=edge_to_move, shift=actual_shift, applied=applied)
     
     # 转换回点序列
-    modified_points = rectangles_to_points(rectangles)
-    
-    # 转换回字符串
-    return points_to_polygon_str(modified_points)
+    return rectangles_to_points(rectangles)
 
-def add_boundary_rectangle(polygon_str):
+def add_boundary_points(points, record=None):
     """
-    在多边形的上方或下方增加一个边界矩形
-    
+    在点序列表示的多边形的上方或下方增加一个边界矩形
+
     参数:
-        polygon_str (str): 多边形字符串
-    
+        points (list): 点列表
+        record (dict, optional): 写入本次随机选择的参数（position）
+
     返回:
-        str: 修改后的多边形字符串
+        list: 修改后的点列表，无法提取矩形时返回None
     """
-    # 解析多边形点
-    points = parse_polygon_points(polygon_str)
-    
     # 提取矩形
     rectangles = extract_rectangles(points)
     if not rectangles:
-        return polygon_str
+        return None
     
     # 随机选择在上方或下方添加
     position = random.choice(["top", "bottom"])
+    if record is not None:
+        record.update(position=position)
     
     if position == "top":
         # 获取最上面的矩形
@@ -282,33 +376,30 @@ def add_boundary_rectangle(polygon_str):
         rectangles.insert(0, new_rect)
     
     # 转换回点序列
-    modified_points = rectangles_to_points(rectangles)
-    
-    # 转换回字符串
-    return points_to_polygon_str(modified_points)
+    return rectangles_to_points(rectangles)
 
-def remove_boundary_rectangle(polygon_str):
+def remove_boundary_points(points, record=None):
     """
-    从多边形的上方或下方移除一个边界矩形
-    
+    从点序列表示的多边形的上方或下方移除一个边界矩形
+
     参数:
-        polygon_str (str): 多边形字符串
-    
+        points (list): 点列表
+        record (dict, optional): 写入本次随机选择的参数（position）
+
     返回:
-        str: 修改后的多边形字符串，如果只剩一个矩形则返回原字符串
+        list: 修改后的点列表，只剩一个或没有矩形时返回None
     """
-    # 解析多边形点
-    points = parse_polygon_points(polygon_str)
-    
     # 提取矩形
     rectangles = extract_rectangles(points)
     
     # 如果只剩一个或没有矩形，则不做修改
     if len(rectangles) <= 1:
-        return polygon_str
+        return None
     
     # 随机选择移除上方或下方的矩形
     position = random.choice(["top", "bottom"])
+    if record is not None:
+        record.update(position=position)
     
     if position == "top":
         # 移除最上面的矩形
@@ -320,10 +411,67 @@ def remove_boundary_rectangle(polygon_str):
         rectangles.remove(bottom_rect)
     
     # 转换回点序列
-    modified_points = rectangles_to_points(rectangles)
+    return rectangles_to_points(rectangles)
+
+def move_entire_points(points, move_distance=1.0, record=None):
+    """
+    整体移动点序列表示的多边形
+
+    参数:
+        points (list): 点列表
+        move_distance: 移动距离（与点坐标同单位）
+        record (dict, optional): 写入本次随机选择的参数（direction, distance）
+
+    返回:
+        list: 移动后的点列表
+    """
+    # 随机选择移动方向
+    direction = random.choice(["up", "down", "left", "right"])
+    if record is not None:
+        record.update(direction=direction, distance=move_distance)
+    dx, dy = {"up": (0, move_distance), "down": (0, -move_distance),
+              "left": (-move_distance, 0), "right": (move_distance, 0)}[direction]
+    return [[x + dx, y + dy] for x, y in points]
+
+def perform_edge_shift(polygon_str, shift_distance=1.0):
+    """
+    对多边形执行edge_shift操作，随机选择一个矩形，修改其宽度
+    
+    参数:
+        polygon_str (str): 多边形字符串
+        shift_distance (float): 移动距离
     
-    # 转换回字符串
-    return points_to_polygon_str(modified_points)
+    返回:
+        str: 修改后的多边形字符串
+    """
+    modified_points = edge_shift_points(parse_polygon_points(polygon_str), shift_distance)
+    return polygon_str if modified_points is None else canonicalize_polygon(points_to_polygon_str(modified_points))
+
+def add_boundary_rectangle(polygon_str):
+    """
+    在多边形的上方或下方增加一个边界矩形
+    
+    参数:
+        polygon_str (str): 多边形字符串
+    
+    返回:
+        str: 修改后的多边形字符串
+    """
+    modified_points = add_boundary_points(parse_polygon_points(polygon_str))
+    return polygon_str if modified_points is None else canonicalize_polygon(points_to_polygon_str(modified_points))
+
+def remove_boundary_rectangle(polygon_str):
+    """
+    从多边形的上方或下方移除一个边界矩形
+    
+    参数:
+        polygon_str (str): 多边形字符串
+    
+    返回:
+        str: 修改后的多边形字符串，如果只剩一个矩形则返回原字符串
+    """
+    modified_points = remove_boundary_points(parse_polygon_points(polygon_str))
+    return polygon_str if modified_points is None else canonicalize_polygon(points_to_polygon_str(modified_points))
 
 def move_entire_polygon(polygon_str, move_distance=1.0):
     """
@@ -336,29 +484,117 @@ def move_entire_polygon(polygon_str, move_distance=1.0):
     返回:
         str: 修改后的多边形字符串
     """
-    # 解析多边形点
-    points = parse_polygon_points(polygon_str)
+    return canonicalize_polygon(points_to_polygon_str(move_entire_points(parse_polygon_points(polygon_str), move_distance)))
+
+def modify_group(group, modification_type, shift_units, record=None):
+    """
+    在约束模型的一个group上执行一次修改，顶点保持整数DEF单位
+
+    参数:
+        group: constraint_model.ConstraintGroup
+        modification_type (str): 修改类型
+        shift_units (int): 移动距离（DEF单位）
+        record (dict, optional): 写入本次修改的参数（随机选择的矩形、方向等，长度为DEF单位）
+                                 以及是否改变了group（changed）
+    """
+    if record is None:
+        record = {}
+    if modification_type == "type_parameter":
+        old_type = group.type
+        group.type = random.choice(GROUP_TYPES)
+        record.update(old=old_type, new=group.type, changed=group.type != old_type)
+        return
+
+    points = group.vertices.tolist()
+    if modification_type == "edge_shift":
+        modified_points = edge_shift_points(points, shift_units, record)
+    elif modification_type == "add_boundary":
+        modified_points = add_boundary_points(points, record)
+    elif modification_type == "remove_boundary":
+        modified_points = remove_boundary_points(points, record)
+    elif modification_type == "move_entire":
+        modified_points = move_entire_points(points, shift_units, record)
+    else:
+        modified_points = None
+    if modified_points is not None:
+        group.vertices = modified_points
+    record['changed'] = modified_points is not None and record.get('applied', True)
+
+def canonicalize_constraint_set(constraint_set, grid=None, groups=None):
+    """
+    把约束模型中group的顶点替换为规范形式（原地修改）。
+    吸附后不足4个顶点（窄于一个site或一行的部分被吸附掉）时只去掉共线点不吸附，仍不足时保留原顶点
+
+    参数:
+        constraint_set: constraint_model.ConstraintSet
+        grid: placement_grid的结果，为None时不吸附
+        groups: 要规范化的group，为None时规范化所有group
+    """
+    for group in constraint_set.groups if groups is None else groups:
+        vertices = canonicalize_points(group.vertices, grid)
+        if len(vertices) < 4 and grid is not None:
+            vertices = canonicalize_points(group.vertices)
+        if len(vertices) >= 4:
+            group.vertices = vertices
+
+def mutate_constraint_set(constraint_set, modification_type=None, shift_distance=1.0, num_groups=1, modifications_per_group=1, grid=None):
+    """
+    在约束模型上随机修改若干个group（原地修改，不写文件），修改过的group转换为规范形式，
+    其余group保持原样（父代已是规范形式时子代整体也是规范形式）
+
+    参数:
+        constraint_set: constraint_model.ConstraintSet
+        modification_type (str, optional): 修改类型，如果为None则每次随机选择
+        shift_distance (float): 移动距离（微米）
+        num_groups (int): 要修改的组数量
+        modifications_per_group (int): 每个组要执行的修改次数
+        grid: placement_grid的结果，为None时不吸附
+
+    返回:
+        list: 每次修改的记录 {'group': group名称, 'operator': 修改类型, 'parameters': modify_group写入的参数}
+    """
+    if not constraint_set.groups:
+        return []
+
+    # 移动距离换算为整数DEF单位，避免浮点累加误差
+    shift_units = max(1, int(round(shift_distance * constraint_set.units)))
+
+    # 确保要修改的组数量不超过实际可用的组数量
+    num_groups = min(num_groups, len(constraint_set.groups))
     
-    # 随机选择移动方向
-    direction = random.choice(["up", "down", "left", "right"])
+    # 用于记录每次修改
+    changes = []
     
-    # 根据方向移动所有点
-    for i in range(len(points)):
-        if direction == "up":
-            points[i][1] += move_distance
-        elif direction == "down":
-            points[i][1] -= move_distance
-        elif direction == "left":
-            points[i][0] -= move_distance
-        elif direction == "right":
-            points[i][0] += move_distance
+    # 随机选择num_groups个不同的组，对每个组执行多次修改
+    selected = random.sample(constraint_set.groups, num_groups)
+    for group in selected:
+        for mod_iteration in range(modifications_per_group):
+            # 为每次修改随机选择一种修改类型
+            current_modification_type = modification_type
+            if current_modification_type is None:
+                current_modification_type = random.choice(MOD_TYPES)
+            
+            parameters = {}
+            modify_group(group, current_modification_type, shift_units, parameters)
+            changes.append({'group': group.name, 'operator': current_modification_type, 'parameters': parameters})
     
-    # 转换回字符串
-    return points_to_polygon_str(points)
+    canonicalize_constraint_set(constraint_set, grid, selected)
+    return changes
 
-def modify_constraint_file(input_file, output_file, modification_type=None, shift_distance=1.0, num_groups=1, modifications_per_group=1):
+def modify_constraint_set(constraint_set, modification_type=None, shift_distance=1.0, num_groups=1, modifications_per_group=1, grid=None):
     """
-    修改约束文件中的create_group行
+    在约束模型上随机修改若干个group（原地修改，不写文件），参数与mutate_constraint_set相同
+
+    返回:
+        list: 每次修改使用的修改类型
+    """
+    changes = mutate_constraint_set(constraint_set, modification_type, shift_distance, num_groups,
+                                    modifications_per_group, grid)
+    return [change['operator'] for change in changes]
+
+def modify_constraint_file(input_file, output_file, modification_type=None, shift_distance=1.0, num_groups=1, modifications_per_group=1, grid=None):
+    """
+    修改约束文件中的create_group行：解析一次为约束模型，所有修改在模型上完成，最后只写出一次
     
     参数:
         input_file (str): 输入文件路径
@@ -367,87 +603,122 @@ def modify_constraint_file(input_file, output_file, modification_type=None, shif
         shift_distance (float): 移动距离
         num_groups (int): 要修改的组数量，默认为1
         modifications_per_group (int): 每个组要执行的修改次数，默认为1
+        grid: placement_grid的结果（site宽度、row高度和原点），为None时只规范化不吸附
     
     返回:
         list: 每个修改组的修改类型列表
     """
-    # 可用的修改类型
-    mod_types = [
-        "type_parameter",    # 修改-type参数
-        "edge_shift",        # 边缘移动
-        "add_boundary",      # 添加边界矩形
-        "remove_boundary",   # 移除边界矩形
-        "move_entire"        # 整体移动
-    ]
-    
-    # 读取文件内容
-    with open(input_file, 'r') as f:
-        lines = f.readlines()
-    
-    # 找出所有包含create_group的行的索引
-    create_group_lines = [i for i, line in enumerate(lines) if "create_group" in line]
+    constraint_set = load_constraint_set(input_file)
     
-    if not create_group_lines:
+    if not constraint_set.groups:
         print("未找到create_group行，保持文件不变。")
-        with open(output_file, 'w') as f:
-            f.writelines(lines)
+        save_constraint_set(constraint_set, output_file)
         return []
     
-    # 确保要修改的组数量不超过实际可用的组数量
-    num_groups = min(num_groups, len(create_group_lines))
-    
-    # 随机选择num_groups个不同的行进行修改
-    selected_indices = random.sample(create_group_lines, num_groups)
-    
-    # 用于记录每个组的修改类型
-    modification_types_used = []
-    
-    # 对每个选定的行进行修改
-    for line_index in selected_indices:
-        # 对每个组执行多次修改
-        current_line = lines[line_index]
-        for mod_iteration in range(modifications_per_group):
-            # 为每次修改随机选择一种修改类型
-            current_modification_type = modification_type
-            if current_modification_type is None:
-                current_modification_type = random.choice(mod_types)
-            
-            # 记录使用的修改类型
-            modification_types_used.append(current_modification_type)
-            
-            # 提取-polygon部分
-            polygon_pattern = r'(-polygon\s+)({.*})'
-            polygon_match = re.search(polygon_pattern, current_line)
-            
-            if polygon_match and current_modification_type != "type_parameter":
-                prefix = polygon_match.group(1)
-                polygon_str = polygon_match.group(2)
-                
-                # 根据选择的修改类型进行修改
-                if current_modification_type == "edge_shift":
-                    modified_polygon = perform_edge_shift(polygon_str, shift_distance)
-                elif current_modification_type == "add_boundary":
-                    modified_polygon = add_boundary_rectangle(polygon_str)
-                elif current_modification_type == "remove_boundary":
-                    modified_polygon = remove_boundary_rectangle(polygon_str)
-                elif current_modification_type == "move_entire":
-                    modified_polygon = move_entire_polygon(polygon_str, shift_distance)
-                
-                # 替换原来的多边形部分
-                current_line = re.sub(polygon_pattern, f"{prefix}{modified_polygon}", current_line)
-            elif current_modification_type == "type_parameter":
-                # 修改-type参数
-                current_line = modify_type_parameter(current_line)
-        
-        # 更新行内容
-        lines[line_index] = current_line
+    modification_types_used = modify_constraint_set(constraint_set, modification_type, shift_distance,
+                                                    num_groups, modifications_per_group, grid)
     
     # 写入修改后的内容到输出文件
-    with open(output_file, 'w') as f:
-        f.writelines(lines)
+    save_constraint_set(constraint_set, output_file)
     
     return modification_types_used
 
+# 变异规格的默认值，generate_offspring的每个规格可以只给出其中一部分
+DEFAULT_SPEC = {'num_groups': 1, 'modifications_per_group': 1, 'shift_distance': 1.0, 'modification_type': None}
+
+class Offspring:
+    """
+    generate_offspring生成的一个子代：约束模型、结构化的修改记录和生成它的变异规格。
+    子代只在内存中，真正调度运行时才调用write写出文件
+    """
+
+    __slots__ = ('constraint_set', 'changes', 'spec')
+
+    def __init__(self, constraint_set, changes, spec):
+        self.constraint_set = constraint_set
+        self.changes = changes
+        self.spec = spec
+
+    @property
+    def mod_types(self):
+        """与modify_constraint_file返回值相同的修改类型列表"""
+        return [change['operator'] for change in self.changes]
+
+    def write(self, output_file):
+        """写出约束文件（并放入约束模型缓存）"""
+        save_constraint_set(self.constraint_set, output_file)
+
+def _mutate_seeded(constraint_set, spec, grid, seed):
+    """
+    用给定的随机种子修改约束模型，不影响调用方的随机数状态
+
+    返回:
+        list: mutate_constraint_set的修改记录
+    """
+    state = random.getstate()
+    random.seed(seed)
+    try:
+        return mutate_constraint_set(constraint_set, spec['modification_type'], spec['shift_distance'],
+                                     spec['num_groups'], spec['modifications_per_group'], grid)
+    finally:
+        random.setstate(state)
+
+# 进程池中每个worker持有的父代，由_init_offspring_worker设置，避免每个任务都传输整个约束文件
+_worker_parent = None
+
+def _init_offspring_worker(parent):
+    global _worker_parent
+    _worker_parent = parent
+
+def _offspring_worker(task):
+    """进程池任务：只返回每个group的类型和顶点，由主进程在父代副本上重建子代"""
+    spec, grid, seed = task
+    child = _worker_parent.copy()
+    changes = _mutate_seeded(child, spec, grid, seed)
+    return [(group.type, group.vertices) for group in child.groups], changes
+
+def generate_offspring(parent, specs, grid=None, workers=None):
+    """
+    从一个父代批量生成子代：父代只解析一次，子代在内存中生成，不写文件
+
+    每个子代使用从调用方random模块取得的独立种子，串行和进程池生成的结果相同；
+    调用方的随机数状态每个子代只前进一次
+
+    参数:
+        parent: 父代的constraint_model.ConstraintSet或约束文件路径
+        specs (list): 变异规格，每个是包含DEFAULT_SPEC中部分键的字典
+        grid: placement_grid的结果，为None时不吸附
+        workers (int, optional): 进程数，为None时在当前进程中生成
+
+    返回:
+        list: 与specs一一对应的Offspring
+    """
+    if isinstance(parent, str):
+        parent = load_constraint_set(parent)
+    specs = [dict(DEFAULT_SPEC, **spec) for spec in specs]
+    seeds = [random.getrandbits(64) for _ in specs]
+
+    if not workers or len(specs) < 2:
+        offspring = []
+        for spec, seed in zip(specs, seeds):
+            child = parent.copy()
+            offspring.append(Offspring(child, _mutate_seeded(child, spec, grid, seed), spec))
+        return offspring
+
+    from concurrent.futures import ProcessPoolExecutor
+    offspring = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_offspring_worker, initargs=(parent,)) as executor:
+        tasks = [(spec, grid, seed) for spec, seed in zip(specs, seeds)]
+        for spec, (groups, changes) in zip(specs, executor.map(_offspring_worker, tasks)):
+            child = parent.copy()
+            # 只替换变化了的group，未修改的group按原文写回
+            for group, (group_type, vertices) in zip(child.groups, groups):
+                group.type = group_type
+                if not np.array_equal(group.vertices, vertices):
+                    group.vertices = vertices
+            offspring.append(Offspring(child, changes, spec))
+    return offspring
+
 def main():
     """主函数，处理命令行参数并调用相应的函数"""
     import argparse
@@ -455,7 +726,7 @@ def main():
     parser = argparse.ArgumentParser(description='随机修改约束文件的工具')
     parser.add_argument('input_file', help='输入约束文件的路径')
     parser.add_argument('--output_file', help='输出文件的路径（默认为原文件名加_modified后缀）')
-    parser.add_argument('--modification_type', choices=['type_parameter', 'edge_shift', 'add_boundary', 'remove_boundary', 'move_entire'],
+    parser.add_argument('--modification_type', choices=MOD_TYPES,
                        help='指定修改类型，如果不指定则随机选择')
     parser.add_argument('--shift_distance', type=float, default=1.0,
                        help='移动距离（用于edge_shift和move_entire操作，默认为1.0）')
@@ -463,6 +734,7 @@ def main():
                        help='要修改的组数量，默认为1')
     parser.add_argument('--modifications_per_group', type=int, default=1,
                        help='每个组要执行的修改次数，默认为1')
+    parser.add_argument('--def_file', help='DEF文件路径，提供site宽度和row高度，修改后的顶点吸附到该网格')
     
     args = parser.parse_args()
     
@@ -471,9 +743,14 @@ def main():
         base_name, ext = os.path.splitext(args.input_file)
         args.output_file = f"{base_name}_modified{ext}"
     
+    grid = None
+    if args.def_file:
+        from def_parser import parse_def_file
+        grid = placement_grid(parse_def_file(args.def_file))
+    
     # 执行修改
     modify_constraint_file(args.input_file, args.output_file, args.modification_type, 
-                          args.shift_distance, args.num_groups, args.modifications_per_group)
+                          args.shift_distance, args.num_groups, args.modifications_per_group, grid)
     print(f"修改已完成，结果保存到 {args.output_file}")
 
 if __name__ == "__main__":
@@ -494,6 +771,8 @@ remove_boundary: 移除边界矩形
 python random_constraint_modifier.py input.txt --modification_type remove_boundary
 move_entire: 整体移动
 python random_constraint_modifier.py input.txt --modification_type move_entire [--shift_distance 移动距离]
+吸附到DEF的site/row网格:
+python random_constraint_modifier.py input.txt --def_file PE_array.def
 
 
 
@@ -510,4 +789,11 @@ modify_constraint_file("input.txt", "output.txt")
 
 # 指定修改类型
 modify_constraint_file("input.txt", "output.txt", "edge_shift", 2.0)
+
+# 从一个父代批量生成子代，调度运行时再写出
+from random_constraint_modifier import generate_offspring
+offspring = generate_offspring("input.txt", [{'num_groups': 2}, {'num_groups': 4, 'shift_distance': 0.5}], workers=4)
+for i, child in enumerate(offspring):
+    print(child.changes)   # [{'group': ..., 'operator': 'edge_shift', 'parameters': {'rect': 3, 'edge': 'left', 'shift': -500, ...}}, ...]
+    child.write(f"output_{i}.txt")
 '''
\ No newline at end of file
@@ -6,39 +6,67 @@ import time
 import shutil
 import random
 import math
+import statistics
 import matplotlib.pyplot as plt
 import datetime
 from decimal import Decimal
 # 导入DEF解析器模块
-from def_parser import parse_def_file
+from def_parser import parse_def_file, analyze_def_file
 # 导入提取路由报告数据的模块
 from extract_route_report import extract_data_from_logv
 # 导入约束修改模块
-from random_constraint_modifier import modify_constraint_file
+from random_constraint_modifier import modify_constraint_file, placement_grid
+# 导入适应度缓存模块
+from fitness_cache import FitnessCache
+# 导入断点续跑模块
+from optimizer_checkpoint import checkpoint_path_for, save_checkpoint, load_checkpoint, get_rng_state, set_rng_state
+# 导入常驻Innovus worker模块
+from innovus_worker import InnovusWorkerPool
+# 导入流程脚本生成模块
+from innovus_flow import run_dse_flow, flow_routes
+
+from innovus_scheduler import InnovusScheduler
+
+from logv_monitor import MonitorPolicy, STATUS_OK, STATUS_FAILED
+
+from successive_halving import SuccessiveHalving, PLACE, ROUTE
+
+from surrogate_model import SurrogateModel, STATUS_SKIPPED, MODES as SURROGATE_MODES
+
+from timing_report_parser import timing_fitness
+
+from placement_density import write_run_density
+
+from constraint_validator import ConstraintValidator, generate_feasible, STATUS_INFEASIBLE
+
+from lineage_store import LineageStore
+
+# DSE流程终点
+ENDING_POINT = "place"
+# 常驻Innovus worker池，为None时每次评估都单独启动一次Innovus
+WORKER_POOL = None
+# Innovus任务调度器，按license和CPU核数预算分配-localCpu；为None时直接运行
+SCHEDULER = None
+# logv监控设置，为None时不监控（运行到结束，不设超时）
+MONITOR_POLICY = None
+# successive halving评估器，为None时每个候选都只运行到ENDING_POINT
+HALVING = None
+# 代理模型，为None时不预筛选候选
+SURROGATE = None
+# 每ns负TNS折合的线长（um），为None时适应度只看线长
+TNS_WEIGHT = None
+# 布局密度栅格的bin边长（微米），设置时每次评估后保存密度栅格，为None时不分析
+DENSITY_BIN_SIZE = None
+# 约束可行性检查，为None时不检查（不可行的约束文件也会启动Innovus）
+VALIDATOR = None
+# 约束文件谱系库，设置时每个新约束文件按相对父代的差分记录，不再使用的约束文件在检查点之后删除
+LINEAGE = None
 
 
 # os.system("cd /mnt/hgfs/vm_share/eda/innovus_output_dse")
 # os.system("./run_innovus_preparation.sh")
 
-def analyze_def_file(def_file_path):
-    """分析DEF文件并打印结果"""
-    print(f"正在分析DEF文件: {def_file_path}")
-    results = parse_def_file(def_file_path)
-    if results:
-        print("\n提取的参数:")
-        print(f"版图长度单位: {results['units']}")
-        print(f"版图尺寸: {results['dimensions']}")
-        print(f"Row高度: {results['row_height']}")
-        print(f"Instance groups数量: {len(results['instance_groups'])}")
-        print("Instance groups列表:")
-        for group in results['instance_groups']:
-            print(f"  - {group}")
-        return results
-    else:
-        print("DEF文件解析失败")
-        return None
-
-def run_innovus(case, boundary, core_utilization, iteration):
+def run_innovus(case, boundary, core_utilization, iteration, monitor=None):
     """
     运行Innovus脚本
     
@@ -47,26 +75,93 @@ def run_innovus(case, boundary, core_utilization, iteration):
         boundary: 边界名称
         core_utilization: 核心利用率
         iteration: 迭代次数
+        monitor: LogvMonitor，运行期间监控logv并在需要时提前结束（常驻worker模式下不使用）
     
     返回:
         bool: 是否成功运行
     """
-    # cmd = f"./run_innovus_dynamic.sh {case} {boundary} {core_utilization} {iteration}"
-    cmd = f"./run_innovus_dynamic.sh {case} {boundary} {core_utilization} {iteration} place"
-    print(f"执行命令: {cmd}")
-    
-    try:
-        return_code = os.system(cmd)
-        if return_code != 0:
-            print(f"运行Innovus失败，返回码: {return_code}")
-            return False
-        return True
-    except Exception as e:
-        print(f"执行命令时出错: {e}")
-        return False
+    if WORKER_POOL is not None:
+        return WORKER_POOL.run_innovus(case, boundary, core_utilization, iteration, ENDING_POINT)
+    
+    # 在进程内生成TCL并直接启动innovus；successive halving需要保存布局后的设计供晋级时继续布线
+    ending_point = "place_saved" if HALVING is not None else ENDING_POINT
+    return run_dse_flow(case, boundary, core_utilization, iteration, ending_point, scheduler=SCHEDULER,
+                        monitor=monitor)
+
+def evaluate_constraint(case, boundary, core_utilization, iteration, cache=None):
+    """
+    评估一次迭代的约束文件，优先查询适应度缓存，未命中时运行Innovus并提取结果
+    
+    参数:
+        case: 案例名称
+        boundary: 边界名称
+        core_utilization: 核心利用率
+        iteration: 迭代次数
+        cache: FitnessCache，为None时不使用缓存
+    
+    返回:
+        dict: extract_data_from_logv格式的指标，另加status（ok或killed_<原因>）、fidelity（place或route）
+              和fitness（退火使用的损失）；被logv监控提前结束时指标为None，Innovus运行失败时返回None
+    """
+    constraint_file = f"constraint/{case}__{boundary}__{core_utilization}__{iteration}.txt"
+    cache_key = None
+    if cache is not None:
+        cache_key, data = cache.lookup(constraint_file, case, core_utilization, ENDING_POINT,
+                                       with_timing=TNS_WEIGHT is not None)
+        if data is not None:
+            print(f"迭代 {iteration} 命中适应度缓存，跳过Innovus运行")
+            return finish_evaluation(case, boundary, core_utilization, iteration, data, constraint_file, cache)
+    
+    logv_path = f"/mnt/hgfs/vm_share/eda/innovus_output_dse/case__{case}__core_utilization__{core_utilization}__boundary__{boundary}__iter__{iteration}/innovus.logv"
+    # 只布局的流程（包括successive halving的place_saved）在布局报告出现时已经结束，不按布局后总线长提前结束
+    check_hopeless = HALVING is None and flow_routes(ENDING_POINT)
+    monitor = MONITOR_POLICY.monitor(logv_path, check_hopeless) if MONITOR_POLICY is not None and WORKER_POOL is None else None
+    success = run_innovus(case, boundary, core_utilization, iteration, monitor)
+    if monitor is not None:
+        MONITOR_POLICY.record(monitor)
+        if monitor.kill_reason is not None:
+            # 被提前结束的运行不写入缓存
+            return {'total_net_length': None, 'total_via_count': None, 'total_runtime': None,
+                    'status': monitor.status(success), 'fidelity': None, 'fitness': None}
+    if not success:
+        return None
+    
+    data = extract_data_from_logv(logv_path, with_timing=TNS_WEIGHT is not None)
+    if DENSITY_BIN_SIZE is not None:
+        write_run_density(os.path.dirname(logv_path), case, DENSITY_BIN_SIZE)
+    if cache is not None:
+        cache.store(cache_key, data)
+    return finish_evaluation(case, boundary, core_utilization, iteration, data, constraint_file, cache)
+
+def finish_evaluation(case, boundary, core_utilization, iteration, data, constraint_file, cache=None):
+    """
+    补充评估结果的status、fidelity和fitness；开启successive halving时对布局结果执行晋级判断，
+    设置了TNS_WEIGHT时适应度加上负TNS的惩罚
+    
+    参数:
+        case: 案例名称
+        boundary: 边界名称
+        core_utilization: 核心利用率
+        iteration: 迭代次数
+        data: extract_data_from_logv格式的指标
+        constraint_file: 约束文件路径
+        cache: FitnessCache，为None时不使用缓存
+    
+    返回:
+        dict: 补充后的指标
+    """
+    if HALVING is None or data['total_net_length'] is None:
+        result = dict(data, status=STATUS_OK, fidelity=ENDING_POINT, fitness=data['total_net_length'])
+    else:
+        result = HALVING.evaluate(case, boundary, core_utilization, iteration, data, constraint_file, cache,
+                                  SCHEDULER, MONITOR_POLICY)
+        result = dict(result, status=STATUS_OK)
+    if TNS_WEIGHT is not None:
+        result['fitness'] = timing_fitness(result, TNS_WEIGHT)
+    return result
 
 
-def generate_random_constraint(input_file, output_file, modification_type=None, shift_distance=1.0, num_groups=1, modifications_per_group=1):
+def generate_random_constraint(input_file, output_file, modification_type=None, shift_distance=1.0, num_groups=1, modifications_per_group=1, grid=None):
     """
     生成随机约束文件
     
@@ -77,6 +172,7 @@ def generate_random_constraint(input_file, output_file, modification_type=None,
         shift_distance: 移动距离
         num_groups: 要修改的组数量，默认为1
         modifications_per_group: 每个组要执行的修改次数，默认为1
+        grid: placement_grid的结果，修改后的顶点吸附到site宽度和row高度
     
     返回:
         list: 使用的修改类型列表
@@ -92,11 +188,11 @@ def generate_random_constraint(input_file, output_file, modification_type=None,
     
     # 调用constraint修改函数
     modification_types_used = modify_constraint_file(input_file, output_file, modification_type, 
-                                                   shift_distance, num_groups, modifications_per_group)
+                                                   shift_distance, num_groups, modifications_per_group, grid)
     
     return modification_types_used
 
-def simulated_annealing(case, boundary, core_utilization, max_iterations=100, initial_temperature=1.0, cooling_rate=0.99, min_temperature=0.01, high_temp_ratio=0.7, low_temp_ratio=0.3):
+def simulated_annealing(case, boundary, core_utilization, max_iterations=100, initial_temperature=1.0, cooling_rate=0.99, min_temperature=0.01, high_temp_ratio=0.7, low_temp_ratio=0.3, cache=None, resume_state=None):
     """
     执行模拟退火算法
     
@@ -110,75 +206,99 @@ def simulated_annealing(case, boundary, core_utilization, max_iterations=100, in
         min_temperature: 最小温度
         high_temp_ratio: 高温阈值比例（相对于初始温度）
         low_temp_ratio: 低温阈值比例（相对于初始温度）
+        cache: FitnessCache，为None时不使用缓存
+        resume_state: 从检查点读取的状态，不为None时从中断处继续
     
     返回:
         dict: 包含最佳结果的字典
     """
-    # 获取当前时间作为日志文件名的一部分
-    current_time = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    log_file = f"{current_time}__{case}__{boundary}__{core_utilization}.txt"
-    
-    # 创建日志文件并写入头部信息
-    with open(log_file, "w") as f:
-        f.write(f"# 模拟退火算法优化日志\n")
-        f.write(f"# 开始时间: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        f.write(f"# 案例: {case}\n")
-        f.write(f"# 边界: {boundary}\n")
-        f.write(f"# 核心利用率: {core_utilization}\n")
-        f.write(f"# 最大迭代次数: {max_iterations}\n")
-        f.write(f"# 初始温度: {initial_temperature}\n")
-        f.write(f"# 冷却率: {cooling_rate}\n")
-        f.write(f"# 最小温度: {min_temperature}\n")
-        f.write(f"# 高温阈值比例: {high_temp_ratio}\n")
-        f.write(f"# 低温阈值比例: {low_temp_ratio}\n")
-        f.write("\n")
-        f.write("iteration,modification_type,total_net_length,total_via_count,runtime,loss,loss_change,temperature,accepted,num_groups,modifications_per_group,max_shift_distance\n")
-    
-    # 执行初始迭代
-    print(f"执行初始迭代 (iteration 0)...")
-    success = run_innovus(case, boundary, core_utilization, 0)
-    if not success:
-        print("初始迭代失败，退出程序")
-        return None
-    
-    # 提取初始结果
-    # logv_path = f"/mnt/hgfs/vm_share/eda/innovus_output_dse/case__${case}__core_utilization__${core_utilization}__boundary__${boundary}__iter__0/innovus.logv"
-    logv_path = f"/mnt/hgfs/vm_share/eda/innovus_output_dse/case__{case}__core_utilization__{core_utilization}__boundary__{boundary}__iter__0/innovus.logv"
-    initial_data = extract_data_from_logv(logv_path)
-    
-    if initial_data['total_net_length'] is None:
-        print("无法从初始迭代中提取总线长，退出程序")
-        return None
-    
-    # 初始化最佳结果
-    best_result = {
-        'iteration': 0,
-        'total_net_length': initial_data['total_net_length'],
-        'total_via_count': initial_data['total_via_count'],
-        'runtime': initial_data['total_runtime'],
-        'constraint_file': f"constraint/{case}__{boundary}__{core_utilization}__0.txt"
-    }
-    
-    # 记录损失值历史
-    loss_history = [initial_data['total_net_length']]
-    temperature_history = [initial_temperature]
-    iteration_history = [0]
-    
-    # 获取DEF文件解析，确定总group数量
-    def_path = f"/mnt/hgfs/vm_share/eda/innovus_output_dse/case__{case}__core_utilization__{core_utilization}__boundary__{boundary}__iter__0/{case}.def"
-    def_results = parse_def_file(def_path)
-    total_groups = len(def_results['instance_groups']) if def_results and 'instance_groups' in def_results else 16  # 默认值为16
-    
-    # 记录初始迭代到日志
-    with open(log_file, "a") as f:
-        f.write(f"0,initial,{initial_data['total_net_length']},{initial_data['total_via_count']},{initial_data['total_runtime']},{initial_data['total_net_length']},0,{initial_temperature},True,1\n")
-    
-    # 当前最佳约束文件
-    current_constraint_file = f"constraint/{case}__{boundary}__{core_utilization}__0.txt"
-    loss_last = initial_data['total_net_length']
+    if resume_state is None:
+        # 获取当前时间作为日志文件名的一部分
+        current_time = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        log_file = f"{current_time}__{case}__{boundary}__{core_utilization}.txt"
+        
+        # 创建日志文件并写入头部信息
+        with open(log_file, "w") as f:
+            f.write(f"# 模拟退火算法优化日志\n")
+            f.write(f"# 开始时间: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            f.write(f"# 案例: {case}\n")
+            f.write(f"# 边界: {boundary}\n")
+            f.write(f"# 核心利用率: {core_utilization}\n")
+            f.write(f"# 最大迭代次数: {max_iterations}\n")
+            f.write(f"# 初始温度: {initial_temperature}\n")
+            f.write(f"# 冷却率: {cooling_rate}\n")
+            f.write(f"# 最小温度: {min_temperature}\n")
+            f.write(f"# 高温阈值比例: {high_temp_ratio}\n")
+            f.write(f"# 低温阈值比例: {low_temp_ratio}\n")
+            f.write("\n")
+            f.write("iteration,modification_type,total_net_length,total_via_count,runtime,loss,loss_change,temperature,accepted,num_groups,modifications_per_group,max_shift_distance,status,fidelity\n")
+        
+        # 执行初始迭代
+        print(f"执行初始迭代 (iteration 0)...")
+        initial_data = evaluate_constraint(case, boundary, core_utilization, 0, cache)
+        if initial_data is None:
+            print("初始迭代失败，退出程序")
+            return None
+        
+        if initial_data['total_net_length'] is None:
+            print("无法从初始迭代中提取总线长，退出程序")
+            return None
+        
+        # 初始化最佳结果
+        best_result = {
+            'iteration': 0,
+            'total_net_length': initial_data['total_net_length'],
+            'total_via_count': initial_data['total_via_count'],
+            'runtime': initial_data['total_runtime'],
+            'constraint_file': f"constraint/{case}__{boundary}__{core_utilization}__0.txt",
+            'loss': initial_data['fitness'],
+            'fidelity': initial_data['fidelity']
+        }
+        
+        # 记录损失值历史
+        loss_history = [initial_data['fitness']]
+        temperature_history = [initial_temperature]
+        iteration_history = [0]
+        
+        # 获取DEF文件解析，确定总group数量
+        def_path = f"/mnt/hgfs/vm_share/eda/innovus_output_dse/case__{case}__core_utilization__{core_utilization}__boundary__{boundary}__iter__0/{case}.def"
+        def_results = parse_def_file(def_path)
+        total_groups = len(def_results['instance_groups']) if def_results and 'instance_groups' in def_results else 16  # 默认值为16
+        # 变异后的顶点吸附到site宽度和row高度
+        grid = placement_grid(def_results)
+        if VALIDATOR is not None:
+            VALIDATOR.load_design(def_results, def_path, f"constraint/{case}__{boundary}__{core_utilization}__0.txt")
+        
+        # 记录初始迭代到日志
+        with open(log_file, "a") as f:
+            f.write(f"0,initial,{initial_data['total_net_length']},{initial_data['total_via_count']},{initial_data['total_runtime']},{initial_data['fitness']},0,{initial_temperature},True,1,,,{initial_data['status']},{initial_data['fidelity']}\n")
+        
+        # 当前最佳约束文件
+        current_constraint_file = f"constraint/{case}__{boundary}__{core_utilization}__0.txt"
+        loss_last = initial_data['fitness']
+        if SURROGATE is not None:
+            SURROGATE.add(current_constraint_file, loss_last)
+        
+        # 初始化温度
+        temperature = initial_temperature
+        iteration = 1
+    else:
+        # 从检查点恢复全部状态，日志文件继续追加
+        current_time = resume_state['current_time']
+        log_file = resume_state['log_file']
+        iteration = resume_state['iteration']
+        temperature = resume_state['temperature']
+        loss_last = resume_state['loss_last']
+        current_constraint_file = resume_state['current_constraint_file']
+        best_result = resume_state['best_result']
+        loss_history = resume_state['loss_history']
+        temperature_history = resume_state['temperature_history']
+        iteration_history = resume_state['iteration_history']
+        total_groups = resume_state['total_groups']
+        grid = resume_state.get('placement_grid')
+        set_rng_state(resume_state['rng_state'])
+        print(f"从检查点恢复: 迭代 {iteration}, 温度 {temperature}, 当前最佳总线长 {best_result['total_net_length']}")
     
-    # 初始化温度
-    temperature = initial_temperature
     
     # 温度阈值，用于调整修改的group数量
     high_temp_threshold = initial_temperature * high_temp_ratio  # 高温阈值
@@ -193,9 +313,54 @@ def simulated_annealing(case, boundary, core_utilization, max_iterations=100, in
     max_modifications_per_group = 5  # 最大修改次数
     min_modifications_per_group = 1  # 最小修改次数
     
+    checkpoint_file = checkpoint_path_for(log_file)
+    params = {
+        'case': case, 'boundary': boundary, 'core_utilization': core_utilization,
+        'max_iterations': max_iterations, 'initial_temperature': initial_temperature,
+        'cooling_rate': cooling_rate, 'min_temperature': min_temperature,
+        'high_temp_ratio': high_temp_ratio, 'low_temp_ratio': low_temp_ratio
+    }
+    
+    def write_checkpoint():
+        save_checkpoint(checkpoint_file, {
+            'algorithm': 'SA',
+            'params': params,
+            'current_time': current_time,
+            'log_file': log_file,
+            'iteration': iteration,
+            'temperature': temperature,
+            'loss_last': loss_last,
+            'current_constraint_file': current_constraint_file,
+            'best_result': best_result,
+            'loss_history': loss_history,
+            'temperature_history': temperature_history,
+            'iteration_history': iteration_history,
+            'total_groups': total_groups,
+            'placement_grid': grid,
+            'rng_state': get_rng_state(),
+            'halving': HALVING.to_dict() if HALVING is not None else None,
+            'surrogate': SURROGATE.to_dict() if SURROGATE is not None else None,
+            'validator': VALIDATOR.to_dict() if VALIDATOR is not None else None,
+            'lineage': LINEAGE.db_file if LINEAGE is not None else None,
+            'settings': {'tns_weight': TNS_WEIGHT, 'density_bin_size': DENSITY_BIN_SIZE},
+            'monitor': MONITOR_POLICY.to_dict() if MONITOR_POLICY is not None else None
+        })
+        # 检查点只引用当前解和最佳解的约束文件，其余已记录在谱系库中
+        if LINEAGE is not None:
+            LINEAGE.prune([current_constraint_file, best_result['constraint_file']])
+    
+    def write_skipped_log(status):
+        # 失败或被提前结束的迭代也写入日志，指标留空
+        with open(log_file, "a") as f:
+            mod_types_str = ','.join(modification_type) if modification_type else "initial"
+            f.write(f"{iteration},{mod_types_str},,,,,,{temperature},False,{num_groups},{modifications_per_group},{current_shift_distance:.2f},{status},\n")
+    
     # 开始模拟退火算法
-    iteration = 1
     while iteration <= max_iterations and temperature >= min_temperature:
+        # 上一次评估完成后、生成下一个约束文件之前保存检查点，
+        # 恢复后会生成相同的约束文件并命中适应度缓存
+        write_checkpoint()
+        
         print(f"\n=== 开始迭代 {iteration} ===")
         print(f"当前温度: {temperature}")
         
@@ -240,36 +405,61 @@ def simulated_annealing(case, boundary, core_utilization, max_iterations=100, in
         
         # 生成新的约束文件
         new_constraint_file = f"constraint/{case}__{boundary}__{core_utilization}__{iteration}.txt"
-        modification_type = generate_random_constraint(current_constraint_file, new_constraint_file, None, 
-                                                      shift_distance=current_shift_distance, 
-                                                      num_groups=num_groups,
-                                                      modifications_per_group=modifications_per_group)
+        modification_type, feasible = generate_feasible(
+            lambda: generate_random_constraint(current_constraint_file, new_constraint_file, None, 
+                                               shift_distance=current_shift_distance, 
+                                               num_groups=num_groups,
+                                               modifications_per_group=modifications_per_group,
+                                               grid=grid),
+            new_constraint_file, VALIDATOR)
+        if LINEAGE is not None:
+            LINEAGE.record(new_constraint_file, current_constraint_file)
         print(f"生成新约束文件: {new_constraint_file} (修改类型: {modification_type}, 修改组数: {num_groups})")
         
-        # 运行Innovus
-        success = run_innovus(case, boundary, core_utilization, iteration)
-        if not success:
+        # 多次重新生成仍然几何不可行时不运行Innovus，按被拒绝处理
+        if not feasible:
+            print(f"迭代 {iteration} 的约束文件不可行，跳过此迭代")
+            write_skipped_log(STATUS_INFEASIBLE)
+            temperature *= cooling_rate
+            iteration += 1
+            continue
+        
+        # 代理模型预测明显较差（差于历史损失中位数）的候选不运行Innovus，按被拒绝处理
+        if SURROGATE is not None:
+            predicted = SURROGATE.predict(new_constraint_file)
+            if SURROGATE.should_skip(predicted, statistics.median(loss_history)):
+                print(f"迭代 {iteration} 预测损失 {predicted:.2f} 差于历史中位数，跳过此迭代")
+                write_skipped_log(STATUS_SKIPPED)
+                temperature *= cooling_rate
+                iteration += 1
+                continue
+        
+        # 运行Innovus（命中缓存时直接使用缓存结果）
+        current_data = evaluate_constraint(case, boundary, core_utilization, iteration, cache)
+        if current_data is None:
             print(f"迭代 {iteration} 运行失败，跳过此迭代")
+            write_skipped_log(STATUS_FAILED)
             # 降低温度
             temperature *= cooling_rate
             iteration += 1
             continue
         
-        # 提取结果
-        # logv_path = get_logv_path(case, iteration)
-        # logv_path = f"/mnt/hgfs/vm_share/eda/innovus_output_dse/case__{case}__core_utilization__${core_utilization}__boundary__${boundary}__iter__${iteration}/innovus.logv"
-        logv_path = f"/mnt/hgfs/vm_share/eda/innovus_output_dse/case__{case}__core_utilization__{core_utilization}__boundary__{boundary}__iter__{iteration}/innovus.logv"
-        current_data = extract_data_from_logv(logv_path)
-        
         if current_data['total_net_length'] is None:
-            print(f"无法从迭代 {iteration} 中提取总线长，跳过此迭代")
+            if current_data['status'] != STATUS_OK:
+                print(f"迭代 {iteration} 被提前结束 ({current_data['status']})，跳过此迭代")
+                write_skipped_log(current_data['status'])
+            else:
+                print(f"无法从迭代 {iteration} 中提取总线长，跳过此迭代")
+                write_skipped_log(STATUS_FAILED)
             # 降低温度
             temperature *= cooling_rate
             iteration += 1
             continue
         
-        # 计算当前损失
-        loss_current = current_data['total_net_length']
+        # 计算当前损失（successive halving时为布线总线长或换算后的布局总线长）
+        loss_current = current_data['fitness']
+        if SURROGATE is not None:
+            SURROGATE.add(new_constraint_file, loss_current)
         loss_change = loss_current - loss_last
         
         # 决定是否接受新解
@@ -295,7 +485,7 @@ def simulated_annealing(case, boundary, core_utilization, max_iterations=100, in
         with open(log_file, "a") as f:
             # 将修改类型列表转换为字符串，便于日志记录
             mod_types_str = ','.join(modification_type) if modification_type else "initial"
-            f.write(f"{iteration},{mod_types_str},{current_data['total_net_length']},{current_data['total_via_count']},{current_data['total_runtime']},{loss_current},{loss_change},{temperature},{accept},{num_groups},{modifications_per_group},{current_shift_distance:.2f}\n")
+            f.write(f"{iteration},{mod_types_str},{current_data['total_net_length']},{current_data['total_via_count']},{current_data['total_runtime']},{loss_current},{loss_change},{temperature},{accept},{num_groups},{modifications_per_group},{current_shift_distance:.2f},{current_data['status']},{current_data['fidelity']}\n")
         
         if accept:
             # 接受新解
@@ -303,13 +493,15 @@ def simulated_annealing(case, boundary, core_utilization, max_iterations=100, in
             current_constraint_file = new_constraint_file
             
             # 更新最佳解
-            if loss_current < best_result['total_net_length']:
+            if loss_current < best_result.get('loss', best_result['total_net_length']):
                 best_result = {
                     'iteration': iteration,
-                    'total_net_length': loss_current,
+                    'total_net_length': current_data['total_net_length'],
                     'total_via_count': current_data['total_via_count'],
                     'runtime': current_data['total_runtime'],
-                    'constraint_file': new_constraint_file
+                    'constraint_file': new_constraint_file,
+                    'loss': loss_current,
+                    'fidelity': current_data['fidelity']
                 }
                 print(f"更新最佳解: 迭代 {iteration}, 总线长 = {loss_current}")
         else:
@@ -320,6 +512,18 @@ def simulated_annealing(case, boundary, core_utilization, max_iterations=100, in
         temperature *= cooling_rate
         iteration += 1
     
+    write_checkpoint()
+    print(f"检查点保存为: {checkpoint_file}")
+    
+    if HALVING is not None and best_result.get('fidelity') == PLACE:
+        # 最佳解只有布局结果时补跑布线，最终结果总是经过布线验证
+        print(f"最佳解未晋级，补跑布线: 迭代 {best_result['iteration']}")
+        routed = HALVING.route(case, boundary, core_utilization, best_result['iteration'], best_result['constraint_file'],
+                               cache, SCHEDULER, MONITOR_POLICY)
+        if routed is not None and routed['total_net_length'] is not None:
+            best_result['routed_net_length'] = routed['total_net_length']
+            best_result['fidelity'] = ROUTE
+    
     # 模拟退火结束
     print("\n\n===== 模拟退火算法结束 =====")
     print(f"最佳解: 迭代 {best_result['iteration']}")
@@ -375,6 +579,23 @@ if __name__ == "__main__":
     parser.add_argument('--min-modifications', type=int, default=1, help='每个组的最小修改次数') 
     parser.add_argument('--max-shift', type=float, default=3.0, help='最大移动距离')
     parser.add_argument('--min-shift', type=float, default=0.5, help='最小移动距离')
+    parser.add_argument('--cache-file', default='fitness_cache.json', help='适应度缓存文件路径')
+    parser.add_argument('--no-cache', action='store_true', help='不使用适应度缓存')
+    parser.add_argument('--resume', metavar='CHECKPOINT', help='从检查点文件继续中断的运行（使用检查点中保存的参数，--tns-weight、--density-bin-size和监控设置显式给出时覆盖）')
+    parser.add_argument('--worker', action='store_true', help='使用常驻Innovus worker，每个worker只初始化一次设计')
+    parser.add_argument('--licenses', type=int, default=1, help='可用的Innovus license数量')
+    parser.add_argument('--cores', type=int, default=None, help='Innovus任务的CPU核数预算（默认本机核数）')
+    parser.add_argument('--kill-margin', type=float, default=None, help='布局后总线长比已完成运行中的最佳值差超过该比例（如0.05）时提前结束，只对继续布线的流程生效（ending_point为place时不提前结束）')
+    parser.add_argument('--stall-timeout', type=float, default=None, help='innovus.logv超过该秒数没有新行时结束任务')
+    parser.add_argument('--max-runtime', type=float, default=None, help='单次Innovus运行的最长秒数')
+    parser.add_argument('--promote-fraction', type=float, default=None, help='开启successive halving：所有候选只运行到place，布局后总线长排在前该比例的候选继续布线')
+    parser.add_argument('--density-bin-size', type=float, default=None, help='每次评估后从postPlace.def计算布局密度栅格（bin边长，微米），保存为运行目录下的<case>.density.npz')
+    parser.add_argument('--tns-weight', type=float, default=None, help='时序加权适应度：总线长加上该系数乘以负TNS（ns），读取timeDesign的报告')
+    parser.add_argument('--surrogate', choices=SURROGATE_MODES, default=None, help='代理模型预筛选：skip跳过预测差于历史损失中位数的候选（rank对顺序执行的退火没有作用）')
+    parser.add_argument('--validate', action='store_true', help='启动Innovus之前检查约束的几何可行性（边界、自相交、重叠），不可行时重新生成')
+    parser.add_argument('--lef', default=None, help='LEF文件路径，提供单元尺寸，可行性检查时要求group面积不小于组内单元总面积')
+    parser.add_argument('--max-overlap', type=float, default=0.1, help='可行性检查中两个group的重叠面积允许占较小group面积的比例')
+    parser.add_argument('--lineage', metavar='DB', default=None, help='约束文件谱系库（sqlite，每次运行使用新的文件）：按相对父代的差分记录约束文件，只保留当前解和最佳解的文件')
     
     args = parser.parse_args()
     
@@ -382,18 +603,81 @@ if __name__ == "__main__":
         # 分析DEF文件
         analyze_def_file(args.def_file)
     else:
-        # 执行模拟退火算法
-        best_result = simulated_annealing(
-            args.case, 
-            args.boundary, 
-            args.utilization, 
-            max_iterations=args.iterations,
-            initial_temperature=args.temperature,
-            cooling_rate=args.rate,
-            min_temperature=args.min_temp,
-            high_temp_ratio=args.high_temp_ratio,
-            low_temp_ratio=args.low_temp_ratio
-        )
+        cache = None if args.no_cache else FitnessCache(args.cache_file)
+        if args.worker:
+            WORKER_POOL = InnovusWorkerPool(size=1)
+        else:
+            SCHEDULER = InnovusScheduler(args.licenses, args.cores)
+
+        if args.kill_margin is not None or args.stall_timeout is not None or args.max_runtime is not None:
+            MONITOR_POLICY = MonitorPolicy(args.kill_margin, args.stall_timeout, args.max_runtime)
+        
+        if args.promote_fraction is not None:
+            if args.worker:
+                print("常驻worker模式不支持successive halving，忽略--promote-fraction")
+            else:
+                HALVING = SuccessiveHalving(args.promote_fraction)
+        if args.surrogate is not None:
+            SURROGATE = SurrogateModel(args.surrogate)
+        TNS_WEIGHT = args.tns_weight
+        DENSITY_BIN_SIZE = args.density_bin_size
+        if args.validate:
+            VALIDATOR = ConstraintValidator(max_overlap_ratio=args.max_overlap, lef_file=args.lef)
+        if args.lineage:
+            LINEAGE = LineageStore(args.lineage)
+        
+        if args.resume:
+            # 从检查点继续
+            resume_state = load_checkpoint(args.resume)
+            # 适应度定义和监控设置沿用中断的运行，命令行显式给出时覆盖
+            settings = resume_state.get('settings') or {}
+            if args.tns_weight is None:
+                TNS_WEIGHT = settings.get('tns_weight')
+            if args.density_bin_size is None:
+                DENSITY_BIN_SIZE = settings.get('density_bin_size')
+            if resume_state.get('monitor'):
+                MONITOR_POLICY = MonitorPolicy.from_dict(resume_state['monitor'])
+                for name in ('kill_margin', 'stall_timeout', 'max_runtime'):
+                    if getattr(args, name) is not None:
+                        setattr(MONITOR_POLICY, name, getattr(args, name))
+            if resume_state.get('halving') and not args.worker:
+                HALVING = SuccessiveHalving.from_dict(resume_state['halving'])
+            if resume_state.get('lineage'):
+                LINEAGE = LineageStore(resume_state['lineage'])
+            if resume_state.get('surrogate'):
+                # 代理模型的训练样本要重新解析，已删除的约束文件先从谱系库还原
+                if LINEAGE is not None:
+                    LINEAGE.ensure_files(constraint_file for constraint_file, _ in resume_state['surrogate']['samples'])
+                SURROGATE = SurrogateModel.from_dict(resume_state['surrogate'])
+            if resume_state.get('validator'):
+                VALIDATOR = ConstraintValidator.from_dict(resume_state['validator'])
+            best_result = simulated_annealing(**resume_state['params'], cache=cache, resume_state=resume_state)
+        else:
+            # 执行模拟退火算法
+            best_result = simulated_annealing(
+                args.case, 
+                args.boundary, 
+                args.utilization, 
+                max_iterations=args.iterations,
+                initial_temperature=args.temperature,
+                cooling_rate=args.rate,
+                min_temperature=args.min_temp,
+                high_temp_ratio=args.high_temp_ratio,
+                low_temp_ratio=args.low_temp_ratio,
+                cache=cache
+            )
+        
+        if WORKER_POOL is not None:
+            WORKER_POOL.close()
+        if SCHEDULER is not None:
+            SCHEDULER.shutdown()
+        
+        if cache is not None:
+            print(f"适应度缓存: 命中 {cache.hits} 次, 未命中 {cache.misses} 次")
+        if SURROGATE is not None:
+            print(f"代理模型: {len(SURROGATE.samples)} 个训练样本, 跳过 {SURROGATE.skipped} 个候选")
+        if VALIDATOR is not None:
+            print(VALIDATOR.summary())
         
         if best_result:
             print("\n最佳结果:")
@@ -10,13 +10,64 @@ import matplotlib.pyplot as plt
 import numpy as np
 import datetime
 import copy
+from concurrent.futures import wait, FIRST_COMPLETED
 from decimal import Decimal
 # 导入DEF解析器模块
 from def_parser import parse_def_file
 # 导入提取路由报告数据的模块
 from extract_route_report import extract_data_from_logv
 # 导入约束修改模块
-from random_constraint_modifier import modify_constraint_file
+from random_constraint_modifier import modify_constraint_file, placement_grid, generate_offspring, canonicalize_constraint_set, Offspring
+from constraint_model import load_constraint_set, save_constraint_set
+# 导入并行任务池模块
+from innovus_job_pool import InnovusJobPool
+# 导入适应度缓存模块
+from fitness_cache import FitnessCache
+# 导入断点续跑模块
+from optimizer_checkpoint import checkpoint_path_for, save_checkpoint, load_checkpoint, get_rng_state, set_rng_state
+# 导入常驻Innovus worker模块
+from innovus_worker import InnovusWorkerPool
+# 导入流程脚本生成模块
+from innovus_flow import run_dse_flow, flow_routes
+
+from innovus_scheduler import InnovusScheduler
+
+from logv_monitor import MonitorPolicy, STATUS_OK, STATUS_FAILED
+
+from successive_halving import SuccessiveHalving, PLACE, ROUTE
+
+from surrogate_model import SurrogateModel, STATUS_SKIPPED, MODES as SURROGATE_MODES
+
+from timing_report_parser import timing_fitness
+
+from placement_density import write_run_density
+
+from constraint_validator import ConstraintValidator, generate_feasible, MAX_ATTEMPTS
+
+from lineage_store import LineageStore
+
+# DSE流程终点
+ENDING_POINT = "place"
+# 常驻Innovus worker池，为None时每次评估都单独启动一次Innovus
+WORKER_POOL = None
+# Innovus任务调度器，按license和CPU核数预算分配-localCpu；为None时直接运行
+SCHEDULER = None
+# logv监控设置，为None时不监控（运行到结束，不设超时）
+MONITOR_POLICY = None
+# successive halving评估器，为None时每个个体都只运行到ENDING_POINT
+HALVING = None
+# 代理模型，为None时不预筛选子代
+SURROGATE = None
+# 每ns负TNS折合的线长（um），为None时适应度只看线长
+TNS_WEIGHT = None
+# 布局密度栅格的bin边长（微米），设置时每次评估后保存密度栅格，为None时不分析
+DENSITY_BIN_SIZE = None
+# 约束可行性检查，为None时不检查；多次重新生成仍不可行的子代复制父代的约束文件
+VALIDATOR = None
+# 约束文件谱系库，设置时每个新约束文件按相对父代的差分记录，检查点不再引用的约束文件随后删除
+LINEAGE = None
+# 稳态模式下连续被代理模型跳过的子代数上限，超过后照常提交
+MAX_SURROGATE_SKIPS = 10
 
 class Individual:
     """表示遗传算法中的一个个体"""
@@ -33,46 +84,187 @@ class Individual:
         self.mod_types = mod_types if mod_types else []  # 应用的修改类型
         self.num_groups = num_groups  # 修改的组数
         self.evaluated = False  # 是否已评估
+        self.status = None  # 评估状态：ok、failed或killed_<原因>（被logv监控提前结束）
+        self.fidelity = None  # 适应度来自布局（place）还是布线（route）结果
+        self.placed_net_length = None  # 布局后总线长
+        self.predicted_fitness = None  # 代理模型预测的适应度
+        self.tns = None  # 时序报告中的TNS（ns），没有读取时序时为None
         self.parent_boundaries = []  # 记录父代的boundary信息
         self.origin = "random"  # 个体来源：original(原始)、crossover(交叉)、mutation(变异)、random(随机)
+        # 尚未写出的子代：(Offspring, 重新生成子代的函数, 父代约束模型, 谱系库中的差分基准文件)，写出后为None
+        self.pending = None
+
+    def to_dict(self):
+        """返回可JSON序列化的个体状态，用于检查点（不含尚未写出的子代，保存检查点前已写出）"""
+        data = dict(self.__dict__)
+        data.pop('pending')
+        return data
+
+    def load_constraints(self):
+        """返回个体的约束模型：尚未写出时为内存中的子代，否则读取约束文件"""
+        if self.pending is not None:
+            return self.pending[0].constraint_set
+        return load_constraint_set(self.constraint_file)
+
+    def attach_offspring(self, offspring, parent_set, lineage_parent, grid=None):
+        """
+        把generate_offspring生成的子代挂在个体上，评估之前才写出；不可行时按相同的变异规格从父代重新生成
+
+        参数:
+            offspring: random_constraint_modifier.Offspring
+            parent_set: 父代约束模型
+            lineage_parent: 谱系库中的差分基准文件（父代或其最近的已写出祖先）
+            grid: placement_grid的结果
+        """
+        self.pending = (offspring, lambda: generate_offspring(parent_set, [offspring.spec], grid=grid)[0],
+                        parent_set, lineage_parent)
+        self.mod_types = offspring.mod_types
+
+    def lineage_parent(self):
+        """子代在谱系库中的差分基准：已写出的个体为自身的约束文件，否则为其最近的已写出祖先"""
+        return self.pending[3] if self.pending is not None else self.constraint_file
+
+    def materialize(self):
+        """
+        写出尚未写出的子代（提交评估或保存检查点之前在主线程中调用）：设置了VALIDATOR时
+        不可行的子代重新生成，多次仍不可行时写出父代；写出后记录到谱系库
+        """
+        if self.pending is None:
+            return
+        offspring, regenerate, parent_set, lineage_parent = self.pending
+        self.pending = None
+        feasible = True
+        if VALIDATOR is not None:
+            for attempt in range(MAX_ATTEMPTS):
+                violations = VALIDATOR.check_set(offspring.constraint_set)
+                feasible = not violations
+                if feasible:
+                    break
+                name, kind, detail = violations[0]
+                print(f"约束可行性检查: {os.path.basename(self.constraint_file)} 第 {attempt + 1} 次生成不可行 "
+                      f"({len(violations)} 项, 如 {name}: {kind} {detail})")
+                if attempt + 1 < MAX_ATTEMPTS:
+                    offspring = regenerate()
+        if feasible:
+            save_constraint_set(offspring.constraint_set, self.constraint_file)
+            self.mod_types = offspring.mod_types
+        else:
+            save_constraint_set(parent_set, self.constraint_file)
+            self.mod_types = ["infeasible_copy_parent1" if self.origin == "crossover" else "infeasible_copy_parent"]
+        if LINEAGE is not None:
+            LINEAGE.record(self.constraint_file, lineage_parent)
 
-    def evaluate(self, verbose=True):
+    @classmethod
+    def from_dict(cls, data):
+        """
+        从to_dict的结果恢复个体
+        
+        参数:
+            data: 个体状态字典
+        
+        返回:
+            Individual: 恢复的个体
+        """
+        individual = cls(data['case'], data['boundary'], data['core_utilization'], data['iteration'])
+        individual.__dict__.update(data)
+        return individual
+
+    def evaluate(self, verbose=True, cache=None):
         """
         评估个体的适应度
         
+        参数:
+            verbose: 是否打印评估信息
+            cache: FitnessCache，命中时不再运行Innovus
+        
         返回:
             bool: 是否成功评估
         """
         if verbose:
             print(f"评估个体 iteration={self.iteration}")
         
-        # 运行Innovus
-        success = run_innovus(self.case, self.boundary, self.core_utilization, self.iteration)
+        # 查询适应度缓存
+        cache_key = None
+        if cache is not None:
+            cache_key, data = cache.lookup(self.constraint_file, self.case, self.core_utilization, ENDING_POINT,
+                                           with_timing=TNS_WEIGHT is not None)
+            if data is not None:
+                print(f"个体 {self.iteration} 命中适应度缓存，跳过Innovus运行")
+                self.apply_metrics(self.promote(data, cache), verbose)
+                self.status = STATUS_OK
+                return True
+        
+        # 运行Innovus，设置了监控时没有希望或卡住的运行会被提前结束
+        logv_path = f"/mnt/hgfs/vm_share/eda/innovus_output_dse/case__{self.case}__core_utilization__{self.core_utilization}__boundary__{self.boundary}__iter__{self.iteration}/innovus.logv"
+        # 只布局的流程（包括successive halving的place_saved）在布局报告出现时已经结束，不按布局后总线长提前结束
+        check_hopeless = HALVING is None and flow_routes(ENDING_POINT)
+        monitor = MONITOR_POLICY.monitor(logv_path, check_hopeless) if MONITOR_POLICY is not None and WORKER_POOL is None else None
+        success = run_innovus(self.case, self.boundary, self.core_utilization, self.iteration, monitor)
+        if monitor is not None:
+            MONITOR_POLICY.record(monitor)
+            self.status = monitor.status(success)
+        else:
+            self.status = STATUS_OK if success else STATUS_FAILED
         if not success:
-            print(f"个体 {self.iteration} 运行失败")
+            print(f"个体 {self.iteration} 运行失败 ({self.status})")
             return False
         
         # 提取结果
-        logv_path = f"/mnt/hgfs/vm_share/eda/innovus_output_dse/case__{self.case}__core_utilization__{self.core_utilization}__boundary__{self.boundary}__iter__{self.iteration}/innovus.logv"
-        data = extract_data_from_logv(logv_path)
+        data = extract_data_from_logv(logv_path, with_timing=TNS_WEIGHT is not None)
+        if DENSITY_BIN_SIZE is not None:
+            write_run_density(os.path.dirname(logv_path), self.case, DENSITY_BIN_SIZE)
         
         if data['total_net_length'] is None:
             print(f"无法从迭代 {self.iteration} 中提取总线长")
+            self.status = STATUS_FAILED
             return False
         
-        # 更新适应度和相关指标
+        if cache is not None:
+            cache.store(cache_key, data)
+        
+        self.apply_metrics(self.promote(data, cache), verbose)
+        return True
+
+    def promote(self, data, cache=None):
+        """
+        开启successive halving时对布局结果执行晋级判断，晋级的个体继续布线
+        
+        参数:
+            data: 布局阶段的指标
+            cache: FitnessCache
+        
+        返回:
+            dict: 指标，晋级时为布线结果
+        """
+        if HALVING is None:
+            return data
+        return HALVING.evaluate(self.case, self.boundary, self.core_utilization, self.iteration, data,
+                                self.constraint_file, cache, SCHEDULER, MONITOR_POLICY)
+
+    def apply_metrics(self, data, verbose=True):
+        """
+        用extract_data_from_logv返回的指标更新适应度
+        
+        参数:
+            data: 指标字典
+            verbose: 是否打印评估结果
+        """
         self.total_net_length = data['total_net_length']
         self.total_via_count = data['total_via_count']
         self.runtime = data['total_runtime']
-        self.fitness = data['total_net_length']  # 使用总线长作为适应度
+        # 使用总线长作为适应度；successive halving时为布线总线长或换算后的布局总线长；设置了TNS_WEIGHT时加上负TNS的惩罚
+        self.fitness = data.get('fitness', data['total_net_length'])
+        if TNS_WEIGHT is not None:
+            self.fitness = timing_fitness(data, TNS_WEIGHT)
+        self.tns = data.get('tns')
+        self.fidelity = data.get('fidelity', ENDING_POINT)
+        self.placed_net_length = data.get('placed_net_length', data['total_net_length'])
         self.evaluated = True
         
         if verbose:
             print(f"个体 {self.iteration} 评估结果: 适应度={self.fitness}, 总线长={self.total_net_length}")
-        
-        return True
 
-def run_innovus(case, boundary, core_utilization, iteration):
+def run_innovus(case, boundary, core_utilization, iteration, monitor=None):
     """
     运行Innovus脚本
     
@@ -81,22 +273,110 @@ def run_innovus(case, boundary, core_utilization, iteration):
         boundary: 边界名称
         core_utilization: 核心利用率
         iteration: 迭代次数
+        monitor: LogvMonitor，运行期间监控logv并在需要时提前结束（常驻worker模式下不使用）
     
     返回:
         bool: 是否成功运行
     """
-    cmd = f"./run_innovus_dynamic.sh {case} {boundary} {core_utilization} {iteration} place"
-    print(f"执行命令: {cmd}")
+    if WORKER_POOL is not None:
+        return WORKER_POOL.run_innovus(case, boundary, core_utilization, iteration, ENDING_POINT)
     
-    try:
-        return_code = os.system(cmd)
-        if return_code != 0:
-            print(f"运行Innovus失败，返回码: {return_code}")
-            return False
-        return True
-    except Exception as e:
-        print(f"执行命令时出错: {e}")
-        return False
+    # 在进程内生成TCL并直接启动innovus；successive halving需要保存布局后的设计供晋级时继续布线
+    ending_point = "place_saved" if HALVING is not None else ENDING_POINT
+    return run_dse_flow(case, boundary, core_utilization, iteration, ending_point, scheduler=SCHEDULER,
+                        monitor=monitor)
+
+def write_individual_log(log_file, generation, individual):
+    """
+    将一个评估结束的个体写入日志，失败或被提前结束的个体通过status列区分
+    
+    参数:
+        log_file: 日志文件路径
+        generation: 代数
+        individual: 评估结束的个体
+    """
+    with open(log_file, "a") as f:
+        mod_types_str = ','.join(individual.mod_types) if individual.mod_types else "unknown"
+        parent_boundaries_str = ','.join(individual.parent_boundaries) if individual.parent_boundaries else ""
+        f.write(f"{generation},{individual.iteration},{individual.boundary},{individual.origin},{parent_boundaries_str},{mod_types_str},{individual.total_net_length},{individual.total_via_count},{individual.runtime},{individual.fitness},{individual.num_groups},{individual.status},{individual.fidelity}\n")
+
+def evaluate_individuals(individuals, log_file, generation, pool=None, cache=None, on_result=None):
+    """
+    并发评估种群中尚未评估的个体，每个个体完成后立即写入日志
+    
+    每个个体的iteration唯一，因此各自使用独立的TCL文件和输出目录
+    
+    参数:
+        individuals: 个体列表
+        log_file: 日志文件路径
+        generation: 当前代数
+        pool: InnovusJobPool，为None时顺序评估
+        cache: FitnessCache，为None时不使用缓存
+        on_result: 每个个体评估结束后在主线程中调用的回调（如保存检查点）
+    
+    返回:
+        int: 成功评估的个体数
+    """
+    # 同一个体对象可能在种群中出现多次（未变异的父代），只评估一次；被代理模型跳过的个体不评估
+    pending = []
+    seen = set()
+    for individual in individuals:
+        if individual.evaluated or individual.status == STATUS_SKIPPED or id(individual) in seen:
+            continue
+        seen.add(id(individual))
+        pending.append(individual)
+    
+    # 预测较好的个体先提交
+    if SURROGATE is not None:
+        pending.sort(key=lambda ind: ind.predicted_fitness if ind.predicted_fitness is not None else float('inf'))
+    
+    # 提交之前在主线程中写出尚未写出的子代
+    for individual in pending:
+        individual.materialize()
+    
+    if pool is None:
+        results = ((individual, individual.evaluate(cache=cache)) for individual in pending)
+    else:
+        print(f"并发评估 {len(pending)} 个个体，槽位数 {pool.max_slots}")
+        results = pool.map_unordered(lambda individual: individual.evaluate(cache=cache), pending)
+    
+    success_count = 0
+    for individual, success in results:
+        if success:
+            success_count += 1
+            if SURROGATE is not None:
+                SURROGATE.add(individual.constraint_file, individual.fitness)
+        write_individual_log(log_file, generation, individual)
+        if on_result is not None:
+            on_result()
+    
+    return success_count
+
+def screen_offspring(individuals, population, log_file, generation):
+    """
+    用代理模型预筛选尚未评估的子代：记录预测适应度，skip模式下预测差于当前种群中位数的子代
+    标记为跳过（写入日志，不运行Innovus）
+    
+    参数:
+        individuals: 新种群
+        population: 当前种群，用于计算中位数
+        log_file: 日志文件路径
+        generation: 当前代数
+    """
+    if SURROGATE is None:
+        return
+    evaluated = [ind.fitness for ind in population if ind.evaluated]
+    reference = float(np.median(evaluated)) if evaluated else None
+    seen = set()
+    for individual in individuals:
+        if individual.evaluated or id(individual) in seen:
+            continue
+        seen.add(id(individual))
+        individual.predicted_fitness = SURROGATE.predict(individual.load_constraints())
+        if SURROGATE.should_skip(individual.predicted_fitness, reference):
+            individual.status = STATUS_SKIPPED
+            print(f"个体 {individual.iteration} 预测适应度 {individual.predicted_fitness:.2f} 差于种群中位数 {reference:.2f}，跳过")
+            write_individual_log(log_file, generation, individual)
 
 def initialize_population(case, boundaries, core_utilization, population_size, def_results, base_iteration=1):
     """
@@ -156,6 +436,7 @@ def initialize_population(case, boundaries, core_utilization, population_size, d
         random_count = remaining_count - crossover_count - mutation_count
         
         global_iteration = len(boundaries)  # 迭代号从boundary数量开始
+        grid = placement_grid(def_results)
         
         # 1. 使用交叉生成一部分个体
         if len(population) >= 2 and crossover_count > 0:
@@ -172,112 +453,138 @@ def initialize_population(case, boundaries, core_utilization, population_size, d
                 child.origin = "crossover"
                 child.parent_boundaries = [parent1.boundary, parent2.boundary]
                 
-                # 生成子代约束文件 (简单交叉：使用父代1的约束文件)
-                parent1_file = parent1.constraint_file
-                child_file = child.constraint_file
-                
-                # 从两个父代约束文件中进行交叉
-                crossover_modifications = perform_crossover(parent1_file, parent2.constraint_file, child_file, total_groups)
+                # 从两个父代的约束模型中进行交叉，约束文件在评估之前才写出
+                attach_crossover(child, parent1, parent2, total_groups, grid)
                 
-                child.mod_types = crossover_modifications
-                child.num_groups = len(crossover_modifications) if crossover_modifications else 0
+                child.num_groups = len(child.mod_types)
                 population.append(child)
         
-        # 2. 使用变异生成一部分个体
+        # 2. 使用变异生成一部分个体：先选出所有父代，同一父代的变异个体批量生成
         if len(population) >= 1 and mutation_count > 0:
-            for i in range(mutation_count):
-                # 随机选择一个父代
-                parent = random.choice(population)
-                
-                # 创建变异个体 (使用相同的boundary)
-                global_iteration += 1
-                mutant = Individual(case, parent.boundary, core_utilization, global_iteration)
-                mutant.origin = "mutation"
-                mutant.parent_boundaries = [parent.boundary]
-                
-                # 随机确定要修改的组数
-                num_groups = random.randint(1, max(1, total_groups // 3))
-                
-                # 生成随机约束文件
-                new_constraint_file = mutant.constraint_file
-                modifications = generate_random_constraint(parent.constraint_file, new_constraint_file, None, num_groups=num_groups)
-                
-                mutant.mod_types = modifications
-                mutant.num_groups = num_groups
-                population.append(mutant)
-        
-        # 3. 随机生成剩余个体
-        for i in range(random_count):
-            # 随机选择一个boundary
-            boundary = random.choice(boundaries)
-            
-            global_iteration += 1
-            individual = Individual(case, boundary, core_utilization, global_iteration)
-            individual.origin = "random"
-            
+            parents = [random.choice(population) for i in range(mutation_count)]
+            for parent in dict.fromkeys(parents):
+                # 随机确定每个个体要修改的组数
+                specs = [{'num_groups': random.randint(1, max(1, total_groups // 3))}
+                         for chosen in parents if chosen is parent]
+                parent_set = parent.load_constraints()
+                for spec, offspring in zip(specs, generate_offspring(parent_set, specs, grid=grid)):
+                    # 创建变异个体 (使用相同的boundary)
+                    global_iteration += 1
+                    mutant = Individual(case, parent.boundary, core_utilization, global_iteration)
+                    mutant.origin = "mutation"
+                    mutant.parent_boundaries = [parent.boundary]
+                    mutant.attach_offspring(offspring, parent_set, parent.lineage_parent(), grid)
+                    mutant.num_groups = spec['num_groups']
+                    population.append(mutant)
+        
+        # 3. 随机生成剩余个体：随机选择boundary，同一boundary的个体从只解析一次的基础约束批量生成
+        random_boundaries = [random.choice(boundaries) for i in range(random_count)]
+        for boundary in dict.fromkeys(random_boundaries):
             # 获取该boundary的基础约束文件
             base_constraint_file = f"constraint/{case}__{boundary}__{core_utilization}__0.txt"
             
-            # 随机确定要修改的组数
-            num_groups = random.randint(1, max(1, total_groups // 2))
-            
-            # 生成随机约束文件
-            new_constraint_file = individual.constraint_file
-            modifications = generate_random_constraint(base_constraint_file, new_constraint_file, None, num_groups=num_groups)
+            # 基础约束文件按评估时的原样保留，只在这里规范化一次，随机个体中未修改的group也是规范形式
+            base_set = load_constraint_set(base_constraint_file)
+            canonicalize_constraint_set(base_set, grid)
             
-            individual.mod_types = modifications
-            individual.num_groups = num_groups
-            population.append(individual)
+            # 随机确定每个个体要修改的组数
+            specs = [{'num_groups': random.randint(1, max(1, total_groups // 2))}
+                     for chosen in random_boundaries if chosen == boundary]
+            for spec, offspring in zip(specs, generate_offspring(base_set, specs, grid=grid)):
+                global_iteration += 1
+                individual = Individual(case, boundary, core_utilization, global_iteration)
+                individual.origin = "random"
+                individual.attach_offspring(offspring, base_set, base_constraint_file, grid)
+                individual.num_groups = spec['num_groups']
+                population.append(individual)
     
     return population
 
-def perform_crossover(parent1_file, parent2_file, child_file, total_groups):
+def perform_crossover(parent1_file, parent2_file, child_file, total_groups, grid=None):
     """
-    执行约束文件的交叉操作
+    执行约束文件的交叉操作；设置了VALIDATOR时重新选择交叉点直到子代可行，多次仍不可行时复制父代1的文件
     
     参数:
         parent1_file: 父代1的约束文件
         parent2_file: 父代2的约束文件
         child_file: 子代的约束文件
         total_groups: 总组数
+        grid: placement_grid的结果，为None时不吸附
     
     返回:
         list: 交叉使用的修改类型
     """
-    # 选择交叉点
-    crossover_point = random.randint(1, total_groups - 1)
-    
-    # 读取两个父代约束文件内容
-    with open(parent1_file, 'r') as f1:
-        parent1_lines = f1.readlines()
-    
-    with open(parent2_file, 'r') as f2:
-        parent2_lines = f2.readlines()
-    
-    # 找出create_group行的索引
-    p1_groups = [(i, line) for i, line in enumerate(parent1_lines) if "create_group" in line]
-    p2_groups = [(i, line) for i, line in enumerate(parent2_lines) if "create_group" in line]
-    
-    # 如果任一父代没有足够的组，则直接复制父代1的文件
-    if len(p1_groups) < crossover_point or len(p2_groups) < total_groups - crossover_point:
+    modifications, feasible = generate_feasible(
+        lambda: crossover_constraint_files(parent1_file, parent2_file, child_file, total_groups, grid),
+        child_file, VALIDATOR)
+    if not feasible:
         shutil.copy(parent1_file, child_file)
-        return ["copy_parent1"]
+        modifications = ["infeasible_copy_parent1"]
+    if LINEAGE is not None:
+        LINEAGE.record(child_file, parent1_file)
+    return modifications
+
+def crossover_offspring(parent1_set, parent2_set, total_groups, grid=None):
+    """
+    单点交叉（在内存中）：子代的前半部分group来自父代1，其余来自父代2，子代的所有group转换为规范形式
     
-    # 创建子代约束文件内容
-    child_lines = parent1_lines.copy()
+    参数:
+        parent1_set: 父代1的约束模型
+        parent2_set: 父代2的约束模型
+        total_groups: 总组数
+        grid: placement_grid的结果，为None时不吸附
     
-    # 从父代2复制剩余的组
-    modifications = []
-    for i in range(crossover_point, min(total_groups, len(p2_groups))):
-        if i < len(p1_groups):
-            child_lines[p1_groups[i][0]] = p2_groups[i][1]
-            modifications.append(f"crossover_group_{i}")
+    返回:
+        Offspring: 子代，修改记录的operator为crossover_group_<序号>；父代的组数不够时为父代1的副本（copy_parent1）
+    """
+    # 选择交叉点
+    crossover_point = random.randint(1, total_groups - 1)
+    child_set = parent1_set.copy()
+    
+    # 如果任一父代没有足够的组，则直接复制父代1
+    if len(parent1_set) < crossover_point or len(parent2_set) < total_groups - crossover_point:
+        return Offspring(child_set, [{'group': None, 'operator': "copy_parent1", 'parameters': {}}], None)
+    
+    # 子代以父代1为基础，从父代2复制剩余的组
+    changes = []
+    for i in range(crossover_point, min(total_groups, len(parent2_set))):
+        if i < len(child_set):
+            child_set.replace_group(i, parent2_set.groups[i])
+            changes.append({'group': child_set.groups[i].name, 'operator': f"crossover_group_{i}",
+                            'parameters': {'crossover_point': crossover_point}})
+    
+    # 来自参考个体（未规范化的初始约束文件）的group也规范化，形状相同的子代写出相同的文件
+    canonicalize_constraint_set(child_set, grid)
+    return Offspring(child_set, changes, None)
+
+def crossover_constraint_files(parent1_file, parent2_file, child_file, total_groups, grid=None):
+    """
+    对两个约束文件执行crossover_offspring并写出子代
     
-    # 写入子代约束文件
-    with open(child_file, 'w') as f:
-        f.writelines(child_lines)
+    返回:
+        list: 交叉使用的修改类型
+    """
+    # 两个父代从约束模型缓存中读取，不重复解析
+    child = crossover_offspring(load_constraint_set(parent1_file), load_constraint_set(parent2_file), total_groups, grid)
+    child.write(child_file)
+    return child.mod_types
+
+def attach_crossover(child, parent1, parent2, total_groups, grid=None):
+    """
+    在内存中交叉两个父代并把结果挂在子代个体上，评估之前才写出；不可行时重新选择交叉点
     
-    return modifications
+    参数:
+        child: 子代个体
+        parent1, parent2: 父代个体（可以是尚未写出的子代）
+        total_groups: 总组数
+        grid: placement_grid的结果
+    """
+    parent1_set = parent1.load_constraints()
+    parent2_set = parent2.load_constraints()
+    offspring = crossover_offspring(parent1_set, parent2_set, total_groups, grid)
+    child.pending = (offspring, lambda: crossover_offspring(parent1_set, parent2_set, total_groups, grid),
+                     parent1_set, parent1.lineage_parent())
+    child.mod_types = offspring.mod_types
 
 def crossover(parent1, parent2, case, boundary, core_utilization, iteration, def_results):
     """
@@ -303,11 +610,10 @@ def crossover(parent1, parent2, case, boundary, core_utilization, iteration, def
     # 确定总group数量
     total_groups = len(def_results['instance_groups']) if def_results and 'instance_groups' in def_results else 16
     
-    # 执行交叉操作
-    modifications = perform_crossover(parent1.constraint_file, parent2.constraint_file, child.constraint_file, total_groups)
+    # 执行交叉操作，子代约束文件在评估之前才写出
+    attach_crossover(child, parent1, parent2, total_groups, placement_grid(def_results))
     
-    child.mod_types = modifications
-    child.num_groups = len(modifications) if modifications else 0
+    child.num_groups = len(child.mod_types)
     
     return child
 
@@ -392,19 +698,17 @@ def mutate(individual, case, boundary, core_utilization, iteration, mutation_rat
     
     print(f"变异设置: 代数={current_generation}/{max_generations}, 修改组数={num_groups}, 每组修改次数={modifications_per_group}, 变动幅度={shift_distance:.2f}")
     
-    # 生成随机约束文件
-    new_constraint_file = mutant.constraint_file
-    modifications = generate_random_constraint(individual.constraint_file, new_constraint_file, None, 
-                                             shift_distance=shift_distance, 
-                                             num_groups=num_groups,
-                                             modifications_per_group=modifications_per_group)
+    # 在父代的约束模型上生成子代（父代可以是尚未写出的交叉子代），约束文件在评估之前才写出
+    spec = {'num_groups': num_groups, 'modifications_per_group': modifications_per_group, 'shift_distance': shift_distance}
+    parent_set = individual.load_constraints()
+    offspring = generate_offspring(parent_set, [spec], grid=placement_grid(def_results))[0]
+    mutant.attach_offspring(offspring, parent_set, individual.lineage_parent(), placement_grid(def_results))
     
-    mutant.mod_types = modifications
     mutant.num_groups = num_groups
     
     return mutant
 
-def generate_random_constraint(input_file, output_file, modification_type=None, shift_distance=1.0, num_groups=1, modifications_per_group=1):
+def generate_random_constraint(input_file, output_file, modification_type=None, shift_distance=1.0, num_groups=1, modifications_per_group=1, grid=None):
     """
     生成随机约束文件
     
@@ -415,18 +719,222 @@ def generate_random_constraint(input_file, output_file, modification_type=None,
         shift_distance: 移动距离
         num_groups: 要修改的组数量，默认为1
         modifications_per_group: 每个组要执行的修改次数，默认为1
+        grid: placement_grid的结果，修改后的顶点吸附到site宽度和row高度
     
     返回:
         list: 使用的修改类型列表
     """
-    # 调用constraint修改函数
-    modification_types_used = modify_constraint_file(input_file, output_file, modification_type, 
-                                                   shift_distance, num_groups, modifications_per_group)
+    # 调用constraint修改函数；设置了VALIDATOR时重新生成不可行的候选，多次仍不可行时复制输入文件
+    modification_types_used, feasible = generate_feasible(
+        lambda: modify_constraint_file(input_file, output_file, modification_type, 
+                                       shift_distance, num_groups, modifications_per_group, grid),
+        output_file, VALIDATOR)
+    if not feasible:
+        shutil.copy(input_file, output_file)
+        modification_types_used = ["infeasible_copy_parent"]
+    if LINEAGE is not None:
+        LINEAGE.record(output_file, input_file)
     
     return modification_types_used
 
+def breed_child(population, case, core_utilization, global_iteration, tournament_size, crossover_rate, mutation_rate,
+                def_results, generation, max_generations, high_gen_ratio, low_gen_ratio):
+    """
+    通过选择、交叉和变异繁殖一个子代
+    
+    参数:
+        population: 当前种群（父代候选）
+        case, core_utilization: 案例参数
+        global_iteration: 当前全局迭代计数
+        tournament_size: 锦标赛大小
+        crossover_rate: 交叉概率
+        mutation_rate: 变异概率
+        def_results: DEF解析结果
+        generation: 当前代数
+        max_generations: 最大代数
+        high_gen_ratio, low_gen_ratio: 控制变异强度的代数比例阈值
+    
+    返回:
+        tuple: (子代个体, 更新后的全局迭代计数)
+    """
+    # 选择父代
+    parent1 = select_parents(population, tournament_size)
+    parent2 = select_parents(population, tournament_size)
+    
+    # 如果父代相同，尝试重新选择
+    attempt = 0
+    while parent1 == parent2 and attempt < 3:
+        parent2 = select_parents(population, tournament_size)
+        attempt += 1
+    
+    # 决定是否执行交叉
+    if random.random() < crossover_rate and parent1 != parent2:
+        # 交叉
+        global_iteration += 1
+        child = crossover(parent1, parent2, case, parent1.boundary, core_utilization, global_iteration, def_results)
+        # 变异 (传递当前代数和最大代数)
+        global_iteration += 1
+        child = mutate(child, case, child.boundary, core_utilization, global_iteration, mutation_rate, 
+                      def_results, current_generation=generation, max_generations=max_generations,
+                      high_gen_ratio=high_gen_ratio, low_gen_ratio=low_gen_ratio)
+    else:
+        # 只进行变异 (传递当前代数和最大代数)
+        global_iteration += 1
+        child = mutate(parent1, case, parent1.boundary, core_utilization, global_iteration, mutation_rate, 
+                      def_results, current_generation=generation, max_generations=max_generations,
+                      high_gen_ratio=high_gen_ratio, low_gen_ratio=low_gen_ratio)
+    
+    return child, global_iteration
+
+def steady_state_evolution(population, best_individual, case, core_utilization, global_iteration, log_file, pool, cache,
+                           population_size, max_generations, tournament_size, crossover_rate, mutation_rate, elitism,
+                           def_results, high_gen_ratio, low_gen_ratio,
+                           best_fitness_history, avg_fitness_history, generation_history,
+                           checkpoint=None, resume_progress=None):
+    """
+    稳态遗传算法：任一槽位空闲时立即繁殖一个新子代，子代完成后立即替换种群中最差的个体
+    
+    评估总数与分代模式相同（max_generations * (population_size - elitism)），
+    每完成population_size次评估记为一代，用于变异强度调度和历史记录
+    
+    参数:
+        population: 已评估的初始种群（原地更新）
+        best_individual: 当前最佳个体
+        global_iteration: 当前全局迭代计数
+        log_file: 日志文件路径
+        pool: InnovusJobPool
+        cache: FitnessCache，为None时不使用缓存
+        其余参数与genetic_algorithm相同
+        best_fitness_history, avg_fitness_history, generation_history: 历史记录列表（原地追加）
+        checkpoint: 每个子代完成后调用的检查点函数，参数为进度字典
+        resume_progress: 从检查点恢复的进度字典，其中未完成的子代会重新提交
+    
+    返回:
+        Individual: 最佳个体
+    """
+    population[:] = [ind for ind in population if ind.evaluated]
+    budget = max_generations * max(1, population_size - elitism)
+    submitted = 0
+    completed = 0
+    in_flight = {}
+    
+    def current_generation():
+        return min(max_generations, 1 + completed // population_size)
+    
+    def submit_child():
+        nonlocal global_iteration, submitted
+        # 代理模型预测差于种群中位数的子代直接丢弃并重新繁殖，连续丢弃MAX_SURROGATE_SKIPS次后照常提交
+        reference = float(np.median([ind.fitness for ind in population])) if SURROGATE is not None and population else None
+        for skip in range(MAX_SURROGATE_SKIPS + 1):
+            # 未发生变异时mutate会返回已评估的父代，此时重新繁殖；多次失败后强制变异
+            child = None
+            for attempt in range(5):
+                child, global_iteration = breed_child(population, case, core_utilization, global_iteration, tournament_size,
+                                                      crossover_rate, mutation_rate, def_results,
+                                                      current_generation(), max_generations, high_gen_ratio, low_gen_ratio)
+                if not child.evaluated:
+                    break
+            if child.evaluated:
+                global_iteration += 1
+                child = mutate(child, case, child.boundary, core_utilization, global_iteration, 1.0, def_results,
+                               current_generation=current_generation(), max_generations=max_generations,
+                               high_gen_ratio=high_gen_ratio, low_gen_ratio=low_gen_ratio)
+            if SURROGATE is None or skip == MAX_SURROGATE_SKIPS:
+                break
+            child.predicted_fitness = SURROGATE.predict(child.load_constraints())
+            if not SURROGATE.should_skip(child.predicted_fitness, reference):
+                break
+            child.status = STATUS_SKIPPED
+            print(f"子代 {child.iteration} 预测适应度 {child.predicted_fitness:.2f} 差于种群中位数 {reference:.2f}，跳过")
+            write_individual_log(log_file, current_generation(), child)
+        # 被跳过的子代没有写出约束文件，提交的子代在这里写出
+        child.materialize()
+        in_flight[pool.submit(child.evaluate, cache=cache)] = child
+        submitted += 1
+    
+    def progress():
+        return {
+            'in_flight': list(in_flight.values()),
+            'submitted': submitted,
+            'completed': completed,
+            'global_iteration': global_iteration,
+            'best': best_individual
+        }
+    
+    if resume_progress is not None:
+        # 重新提交中断时尚未完成的子代（约束文件已生成）
+        submitted = resume_progress['submitted']
+        completed = resume_progress['completed']
+        for child in resume_progress['in_flight']:
+            in_flight[pool.submit(child.evaluate, cache=cache)] = child
+    
+    print(f"稳态模式: 共 {budget} 次评估，{pool.max_slots} 个槽位")
+    while submitted < budget and len(in_flight) < pool.max_slots:
+        submit_child()
+    if checkpoint is not None:
+        checkpoint(progress())
+    
+    while in_flight:
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            child = in_flight.pop(future)
+            completed += 1
+            generation = current_generation()
+            
+            write_individual_log(log_file, generation, child)
+            if future.result():
+                if SURROGATE is not None:
+                    SURROGATE.add(child.constraint_file, child.fitness)
+                # 子代优于最差个体时替换之
+                worst = max(population, key=lambda ind: ind.fitness)
+                if len(population) < population_size:
+                    population.append(child)
+                elif child.fitness < worst.fitness:
+                    population[population.index(worst)] = child
+                if child.fitness < best_individual.fitness:
+                    best_individual = child
+                    print(f"发现新的最佳个体: iteration={best_individual.iteration}, boundary={best_individual.boundary}, fitness={best_individual.fitness}")
+            
+            # 每完成population_size次评估记录一次历史
+            if completed % population_size == 0 or (not in_flight and submitted >= budget):
+                avg_fitness = sum(ind.fitness for ind in population) / max(1, len(population))
+                best_fitness_history.append(best_individual.fitness)
+                avg_fitness_history.append(avg_fitness)
+                generation_history.append(completed / population_size)
+                print(f"已完成 {completed}/{budget} 次评估，当前最佳适应度: {best_individual.fitness}，平均适应度: {avg_fitness}")
+            
+            if submitted < budget:
+                submit_child()
+            if checkpoint is not None:
+                checkpoint(progress())
+    
+    return best_individual
+
+def individuals_to_state(**named_lists):
+    """
+    将若干个体列表序列化为检查点状态，同一个体对象只保存一次
+    
+    参数:
+        named_lists: 名称到个体列表的映射
+    
+    返回:
+        tuple: (个体字典列表, 名称到索引列表的映射)
+    """
+    table = []
+    index = {}
+    refs = {}
+    for name, individuals in named_lists.items():
+        refs[name] = []
+        for individual in individuals:
+            if id(individual) not in index:
+                index[id(individual)] = len(table)
+                table.append(individual.to_dict())
+            refs[name].append(index[id(individual)])
+    return table, refs
+
 def genetic_algorithm(case, boundaries, core_utilization, population_size=20, max_generations=50, 
-                     tournament_size=3, crossover_rate=0.8, mutation_rate=0.2, elitism=2):
+                     tournament_size=3, crossover_rate=0.8, mutation_rate=0.2, elitism=2, pool=None, cache=None,
+                     steady_state=False, resume_state=None):
     """
     执行遗传算法
     
@@ -440,187 +948,207 @@ def genetic_algorithm(case, boundaries, core_utilization, population_size=20, ma
         crossover_rate: 交叉概率
         mutation_rate: 变异概率
         elitism: 精英个体数量
+        pool: InnovusJobPool，为None时顺序评估
+        cache: FitnessCache，为None时不使用缓存
+        steady_state: 是否使用稳态模式（需要pool）
+        resume_state: 从检查点读取的状态，不为None时从中断处继续
         
     返回:
         dict: 包含最佳结果的字典
     """
-    # 获取当前时间作为日志文件名的一部分
-    current_time = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    
     # 使用第一个边界和总边界数量来生成文件名，避免文件名过长
     primary_boundary = boundaries[0]
     boundary_count = len(boundaries)
-    log_file = f"{current_time}__{case}__{primary_boundary}__{core_utilization}__GA.txt"
-    
-    # 创建日志文件并写入头部信息
-    with open(log_file, "w") as f:
-        f.write(f"# 遗传算法优化日志\n")
-        f.write(f"# 开始时间: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        f.write(f"# 案例: {case}\n")
-        f.write(f"# 主参考边界: {primary_boundary}\n")
-        f.write(f"# 所有边界列表: {', '.join(boundaries)}\n")
-        f.write(f"# 核心利用率: {core_utilization}\n")
-        f.write(f"# 种群大小: {population_size}\n")
-        f.write(f"# 最大代数: {max_generations}\n")
-        f.write(f"# 锦标赛大小: {tournament_size}\n")
-        f.write(f"# 交叉概率: {crossover_rate}\n")
-        f.write(f"# 变异概率: {mutation_rate}\n")
-        f.write(f"# 精英数量: {elitism}\n")
-        f.write("\n")
-        f.write("generation,individual,boundary,origin,parent_boundaries,modification_types,total_net_length,total_via_count,runtime,fitness,num_groups\n")
-    
-    # 为每个boundary执行初始迭代（参考设计）
-    all_def_results = {}
-    reference_individuals = []
-    
-    for boundary in boundaries:
-        print(f"执行边界 {boundary} 的初始迭代 (iteration 0)...")
-        success = run_innovus(case, boundary, core_utilization, 0)
-        if not success:
-            print(f"边界 {boundary} 的初始迭代失败，跳过此边界")
-            continue
-        
-        # 提取初始结果
-        logv_path = f"/mnt/hgfs/vm_share/eda/innovus_output_dse/case__{case}__core_utilization__{core_utilization}__boundary__{boundary}__iter__0/innovus.logv"
-        initial_data = extract_data_from_logv(logv_path)
-        
-        if initial_data['total_net_length'] is None:
-            print(f"无法从边界 {boundary} 的初始迭代中提取总线长，跳过此边界")
-            continue
-        
-        # 获取DEF文件解析，确定总group数量
-        def_path = f"/mnt/hgfs/vm_share/eda/innovus_output_dse/case__{case}__core_utilization__{core_utilization}__boundary__{boundary}__iter__0/{case}.def"
-        def_results = parse_def_file(def_path)
-        all_def_results[boundary] = def_results
-        
-        # 初始化参考个体
-        reference_individual = Individual(case, boundary, core_utilization, 0)
-        reference_individual.total_net_length = initial_data['total_net_length']
-        reference_individual.total_via_count = initial_data['total_via_count']
-        reference_individual.runtime = initial_data['total_runtime']
-        reference_individual.fitness = initial_data['total_net_length']
-        reference_individual.evaluated = True
-        reference_individual.mod_types = ["initial"]
-        reference_individual.num_groups = 0
-        reference_individual.origin = "original"
-        
-        reference_individuals.append(reference_individual)
-        
-        # 记录初始迭代到日志
-        with open(log_file, "a") as f:
-            parent_boundaries_str = ""
-            mod_types_str = "initial"
-            f.write(f"0,0,{boundary},original,{parent_boundaries_str},{mod_types_str},{initial_data['total_net_length']},{initial_data['total_via_count']},{initial_data['total_runtime']},{initial_data['total_net_length']},0\n")
-    
-    if not reference_individuals:
-        print("所有边界的初始迭代都失败，退出程序")
-        return None
-    
-    # 使用第一个成功的boundary的def_results作为参考
-    primary_def_results = next(iter(all_def_results.values()))
-    
-    # 初始化种群
-    base_iteration = len(boundaries)  # 个体迭代号从boundary数量开始
-    population = initialize_population(case, boundaries, core_utilization, population_size, primary_def_results, base_iteration)
-    
-    # 用参考个体替换种群中的前几个个体
-    for i, ref_ind in enumerate(reference_individuals):
-        if i < len(population):
-            population[i] = ref_ind
-    
-    # 评估初始种群
-    eval_count = len(reference_individuals)  # 已经评估了参考个体
-    for individual in population:
-        if not individual.evaluated:
-            success = individual.evaluate()
-            if success:
-                eval_count += 1
-                # 记录到日志
-                with open(log_file, "a") as f:
-                    mod_types_str = ','.join(individual.mod_types) if individual.mod_types else "unknown"
-                    parent_boundaries_str = ','.join(individual.parent_boundaries) if individual.parent_boundaries else ""
-                    f.write(f"0,{individual.iteration},{individual.boundary},{individual.origin},{parent_boundaries_str},{mod_types_str},{individual.total_net_length},{individual.total_via_count},{individual.runtime},{individual.fitness},{individual.num_groups}\n")
-    
-    # 初始化最佳个体
-    best_individual = min(population, key=lambda ind: ind.fitness if ind.evaluated else float('inf'))
-    
-    # 如果最佳个体没有被评估，则使用第一个参考个体
-    if not best_individual.evaluated:
-        best_individual = reference_individuals[0]
-    
-    # 记录每一代的最佳适应度
-    best_fitness_history = [best_individual.fitness]
-    avg_fitness_history = [sum(ind.fitness for ind in population if ind.evaluated) / max(1, sum(1 for ind in population if ind.evaluated))]
-    generation_history = [0]
-    
-    # 开始遗传算法迭代
-    generation = 1
-    global_iteration = max([ind.iteration for ind in population]) + 1  # 全局迭代计数器
     
     # 设置代数比例的高低阈值，用于控制变异强度
     high_gen_ratio = 0.7  # 高代数比例阈值 (70%的代数后进入精细优化阶段)
     low_gen_ratio = 0.3   # 低代数比例阈值 (30%的代数前为大幅探索阶段)
     
-    while generation <= max_generations:
-        print(f"\n=== 开始第 {generation} 代 ===")
+    if resume_state is None:
+        # 获取当前时间作为日志文件名的一部分
+        current_time = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        log_file = f"{current_time}__{case}__{primary_boundary}__{core_utilization}__GA.txt"
         
-        # 从当前种群中选择精英个体
-        sorted_population = sorted([ind for ind in population if ind.evaluated], key=lambda ind: ind.fitness)
-        elites = sorted_population[:min(elitism, len(sorted_population))]
+        # 创建日志文件并写入头部信息
+        with open(log_file, "w") as f:
+            f.write(f"# 遗传算法优化日志\n")
+            f.write(f"# 开始时间: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            f.write(f"# 案例: {case}\n")
+            f.write(f"# 主参考边界: {primary_boundary}\n")
+            f.write(f"# 所有边界列表: {', '.join(boundaries)}\n")
+            f.write(f"# 核心利用率: {core_utilization}\n")
+            f.write(f"# 种群大小: {population_size}\n")
+            f.write(f"# 最大代数: {max_generations}\n")
+            f.write(f"# 锦标赛大小: {tournament_size}\n")
+            f.write(f"# 交叉概率: {crossover_rate}\n")
+            f.write(f"# 变异概率: {mutation_rate}\n")
+            f.write(f"# 精英数量: {elitism}\n")
+            f.write("\n")
+            f.write("generation,individual,boundary,origin,parent_boundaries,modification_types,total_net_length,total_via_count,runtime,fitness,num_groups,status,fidelity\n")
         
-        # 创建新一代种群
-        new_population = []
+        # 为每个boundary执行初始迭代（参考设计）
+        all_def_results = {}
+        reference_individuals = []
         
-        # 添加精英个体
-        new_population.extend(elites)
+        # 各boundary的初始迭代互不依赖，作为第0代并发评估
+        candidates = []
+        for boundary in boundaries:
+            print(f"执行边界 {boundary} 的初始迭代 (iteration 0)...")
+            candidate = Individual(case, boundary, core_utilization, 0)
+            candidate.mod_types = ["initial"]
+            candidate.num_groups = 0
+            candidate.origin = "original"
+            candidates.append(candidate)
+        evaluate_individuals(candidates, log_file, 0, pool, cache)
         
-        # 通过选择、交叉和变异创建新个体
-        while len(new_population) < population_size:
-            # 选择父代
-            parent1 = select_parents(population, tournament_size)
-            parent2 = select_parents(population, tournament_size)
+        for reference_individual in candidates:
+            boundary = reference_individual.boundary
+            if not reference_individual.evaluated:
+                print(f"边界 {boundary} 的初始迭代失败，跳过此边界")
+                continue
             
-            # 如果父代相同，尝试重新选择
-            attempt = 0
-            while parent1 == parent2 and attempt < 3:
-                parent2 = select_parents(population, tournament_size)
-                attempt += 1
+            # 获取DEF文件解析，确定总group数量
+            def_path = f"/mnt/hgfs/vm_share/eda/innovus_output_dse/case__{case}__core_utilization__{core_utilization}__boundary__{boundary}__iter__0/{case}.def"
+            def_results = parse_def_file(def_path)
+            all_def_results[boundary] = def_results
             
-            # 决定是否执行交叉
-            if random.random() < crossover_rate and parent1 != parent2:
-                # 交叉
-                global_iteration += 1
-                child = crossover(parent1, parent2, case, parent1.boundary, core_utilization, global_iteration, primary_def_results)
-                # 变异 (传递当前代数和最大代数)
-                global_iteration += 1
-                child = mutate(child, case, child.boundary, core_utilization, global_iteration, mutation_rate, 
-                              primary_def_results, current_generation=generation, max_generations=max_generations,
-                              high_gen_ratio=high_gen_ratio, low_gen_ratio=low_gen_ratio)
-            else:
-                # 只进行变异 (传递当前代数和最大代数)
-                global_iteration += 1
-                child = mutate(parent1, case, parent1.boundary, core_utilization, global_iteration, mutation_rate, 
-                              primary_def_results, current_generation=generation, max_generations=max_generations,
-                              high_gen_ratio=high_gen_ratio, low_gen_ratio=low_gen_ratio)
+            reference_individuals.append(reference_individual)
+        
+        if not reference_individuals:
+            print("所有边界的初始迭代都失败，退出程序")
+            return None
+        
+        # 使用第一个成功的boundary的def_results作为参考
+        primary_def_results = next(iter(all_def_results.values()))
+        if VALIDATOR is not None:
+            validator_boundary = next(iter(all_def_results))
+            VALIDATOR.load_design(primary_def_results,
+                                  f"/mnt/hgfs/vm_share/eda/innovus_output_dse/case__{case}__core_utilization__{core_utilization}__boundary__{validator_boundary}__iter__0/{case}.def",
+                                  f"constraint/{case}__{validator_boundary}__{core_utilization}__0.txt")
+        
+        # 初始化种群
+        base_iteration = len(boundaries)  # 个体迭代号从boundary数量开始
+        population = initialize_population(case, boundaries, core_utilization, population_size, primary_def_results, base_iteration)
+        
+        # 用参考个体替换种群中的前几个个体
+        for i, ref_ind in enumerate(reference_individuals):
+            if i < len(population):
+                population[i] = ref_ind
+        
+        # 初始种群作为第0代评估；最佳个体先取第一个参考个体
+        new_population = population
+        best_individual = reference_individuals[0]
+        best_fitness_history = []
+        avg_fitness_history = []
+        generation_history = []
+        generation = 0
+        global_iteration = max([ind.iteration for ind in population]) + 1  # 全局迭代计数器
+        steady_progress = None
+    else:
+        # 从检查点恢复全部状态，日志文件继续追加
+        current_time = resume_state['current_time']
+        log_file = resume_state['log_file']
+        individuals = [Individual.from_dict(data) for data in resume_state['individuals']]
+        refs = resume_state['refs']
+        population = [individuals[i] for i in refs['population']]
+        new_population = [individuals[i] for i in refs['new_population']] if resume_state['evaluating'] else None
+        best_individual = individuals[refs['best'][0]]
+        primary_def_results = resume_state['def_results']
+        best_fitness_history = resume_state['best_fitness_history']
+        avg_fitness_history = resume_state['avg_fitness_history']
+        generation_history = resume_state['generation_history']
+        generation = resume_state['generation']
+        global_iteration = resume_state['global_iteration']
+        steady_progress = resume_state['steady_state_progress']
+        if steady_progress is not None:
+            steady_progress['in_flight'] = [individuals[i] for i in refs['in_flight']]
+        set_rng_state(resume_state['rng_state'])
+        print(f"从检查点恢复: 第 {generation} 代, 全局迭代 {global_iteration}, 当前最佳适应度 {best_individual.fitness}")
+    
+    checkpoint_file = checkpoint_path_for(log_file)
+    params = {
+        'case': case, 'boundaries': boundaries, 'core_utilization': core_utilization,
+        'population_size': population_size, 'max_generations': max_generations,
+        'tournament_size': tournament_size, 'crossover_rate': crossover_rate,
+        'mutation_rate': mutation_rate, 'elitism': elitism, 'steady_state': steady_state
+    }
+    
+    def write_checkpoint(progress=None):
+        """保存当前状态；稳态模式下progress包含未完成的子代和计数"""
+        # 检查点只保存约束文件路径：即将评估的子代先写出，被代理模型跳过的子代不写出
+        for individual in new_population or []:
+            if not individual.evaluated and individual.status != STATUS_SKIPPED:
+                individual.materialize()
+        best = progress['best'] if progress else best_individual
+        table, refs = individuals_to_state(
+            population=population,
+            new_population=new_population or [],
+            best=[best],
+            in_flight=progress['in_flight'] if progress else [])
+        save_checkpoint(checkpoint_file, {
+            'algorithm': 'GA',
+            'params': params,
+            'current_time': current_time,
+            'log_file': log_file,
+            'generation': generation,
+            'global_iteration': progress['global_iteration'] if progress else global_iteration,
+            'evaluating': new_population is not None,
+            'individuals': table,
+            'refs': refs,
+            'def_results': primary_def_results,
+            'best_fitness_history': best_fitness_history,
+            'avg_fitness_history': avg_fitness_history,
+            'generation_history': generation_history,
+            'steady_state_progress': {key: progress[key] for key in ('submitted', 'completed')} if progress else None,
+            'rng_state': get_rng_state(),
+            'halving': HALVING.to_dict() if HALVING is not None else None,
+            'surrogate': SURROGATE.to_dict() if SURROGATE is not None else None,
+            'validator': VALIDATOR.to_dict() if VALIDATOR is not None else None,
+            'lineage': LINEAGE.db_file if LINEAGE is not None else None,
+            'settings': {'tns_weight': TNS_WEIGHT, 'density_bin_size': DENSITY_BIN_SIZE},
+            'monitor': MONITOR_POLICY.to_dict() if MONITOR_POLICY is not None else None
+        })
+        # 检查点引用的个体（种群、最佳个体、正在评估的子代）之外的约束文件都已记录在谱系库中
+        if LINEAGE is not None:
+            LINEAGE.prune([individual['constraint_file'] for individual in table])
+    
+    # 分代迭代；第0代为初始种群，稳态模式在第0代之后接管
+    while generation <= max_generations and steady_progress is None:
+        if new_population is None:
+            if steady_state:
+                break
+            print(f"\n=== 开始第 {generation} 代 ===")
             
-            new_population.append(child)
-        
-        # 确保新种群大小不超过指定大小
-        new_population = new_population[:population_size]
-        
-        # 评估新种群中未评估的个体
-        for individual in new_population:
-            if not individual.evaluated:
-                success = individual.evaluate()
-                if success:
-                    # 记录到日志
-                    with open(log_file, "a") as f:
-                        mod_types_str = ','.join(individual.mod_types) if individual.mod_types else "unknown"
-                        parent_boundaries_str = ','.join(individual.parent_boundaries) if individual.parent_boundaries else ""
-                        f.write(f"{generation},{individual.iteration},{individual.boundary},{individual.origin},{parent_boundaries_str},{mod_types_str},{individual.total_net_length},{individual.total_via_count},{individual.runtime},{individual.fitness},{individual.num_groups}\n")
+            # 从当前种群中选择精英个体
+            sorted_population = sorted([ind for ind in population if ind.evaluated], key=lambda ind: ind.fitness)
+            elites = sorted_population[:min(elitism, len(sorted_population))]
+            
+            # 创建新一代种群
+            new_population = []
+            
+            # 添加精英个体
+            new_population.extend(elites)
+            
+            # 通过选择、交叉和变异创建新个体
+            while len(new_population) < population_size:
+                child, global_iteration = breed_child(population, case, core_utilization, global_iteration, tournament_size,
+                                                      crossover_rate, mutation_rate, primary_def_results,
+                                                      generation, max_generations, high_gen_ratio, low_gen_ratio)
+                new_population.append(child)
+            
+            # 确保新种群大小不超过指定大小
+            new_population = new_population[:population_size]
+            
+            # 代理模型预筛选，预测明显较差的子代不运行Innovus
+            screen_offspring(new_population, population, log_file, generation)
+        
+        # 评估新种群中未评估的个体（整代并发），每完成一个个体保存一次检查点
+        write_checkpoint()
+        evaluate_individuals(new_population, log_file, generation, pool, cache, on_result=write_checkpoint)
         
         # 更新种群
         population = new_population
+        new_population = None
         
         # 找出当前代的最佳个体
         generation_best = min([ind for ind in population if ind.evaluated], key=lambda ind: ind.fitness, default=None)
@@ -642,6 +1170,29 @@ def genetic_algorithm(case, boundaries, core_utilization, population_size=20, ma
         print(f"平均适应度: {avg_fitness}")
         
         generation += 1
+        write_checkpoint()
+    
+    if steady_state:
+        # 稳态模式：任一槽位空闲时立即繁殖新个体，没有代际屏障
+        if pool is None:
+            pool = InnovusJobPool(1)
+        best_individual = steady_state_evolution(
+            population, best_individual, case, core_utilization, global_iteration, log_file, pool, cache,
+            population_size, max_generations, tournament_size, crossover_rate, mutation_rate, elitism,
+            primary_def_results, high_gen_ratio, low_gen_ratio,
+            best_fitness_history, avg_fitness_history, generation_history,
+            checkpoint=write_checkpoint, resume_progress=steady_progress)
+    
+    print(f"检查点保存为: {checkpoint_file}")
+    
+    routed_net_length = best_individual.total_net_length if best_individual.fidelity == ROUTE else None
+    if HALVING is not None and best_individual.fidelity == PLACE:
+        # 最佳个体只有布局结果时补跑布线，最终结果总是经过布线验证
+        print(f"最佳个体未晋级，补跑布线: iteration={best_individual.iteration}")
+        routed = HALVING.route(case, best_individual.boundary, core_utilization, best_individual.iteration,
+                               best_individual.constraint_file, cache, SCHEDULER, MONITOR_POLICY)
+        if routed is not None:
+            routed_net_length = routed['total_net_length']
     
     # 遗传算法结束
     print("\n\n===== 遗传算法结束 =====")
@@ -676,7 +1227,9 @@ def genetic_algorithm(case, boundaries, core_utilization, population_size=20, ma
         'total_net_length': best_individual.fitness,
         'total_via_count': best_individual.total_via_count,
         'runtime': best_individual.runtime,
-        'constraint_file': best_individual.constraint_file
+        'constraint_file': best_individual.constraint_file,
+        'fidelity': best_individual.fidelity,
+        'routed_net_length': routed_net_length
     }
     
     return best_result
@@ -692,8 +1245,11 @@ def select_parents(population, tournament_size=3):
     返回:
         Individual: 选中的个体
     """
+    # 被代理模型跳过的个体没有写出约束文件，不作为父代
+    candidates = [ind for ind in population if ind.status != STATUS_SKIPPED] or population
+    
     # 随机选择tournament_size个个体
-    tournament = random.sample(population, min(tournament_size, len(population)))
+    tournament = random.sample(candidates, min(tournament_size, len(candidates)))
     
     # 选择适应度最好（最小）的个体
     return min(tournament, key=lambda ind: ind.fitness if ind.evaluated else float('inf'))
@@ -713,6 +1269,25 @@ if __name__ == "__main__":
     parser.add_argument('-d', '--def-file', help='要分析的DEF文件路径')
     parser.add_argument('--high-gen-ratio', type=float, default=0.7, help='高代数比例阈值，用于控制变异强度')
     parser.add_argument('--low-gen-ratio', type=float, default=0.3, help='低代数比例阈值，用于控制变异强度')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='并发运行的Innovus任务数（默认取license数与CPU核数的较小值）')
+    parser.add_argument('--licenses', type=int, default=1, help='可用的Innovus license数量')
+    parser.add_argument('--cores', type=int, default=None, help='Innovus任务的CPU核数预算（默认本机核数），按license平分给每个任务')
+    parser.add_argument('--kill-margin', type=float, default=None, help='布局后总线长比已完成运行中的最佳值差超过该比例（如0.05）时提前结束，只对继续布线的流程生效（ending_point为place时不提前结束）')
+    parser.add_argument('--stall-timeout', type=float, default=None, help='innovus.logv超过该秒数没有新行时结束任务')
+    parser.add_argument('--max-runtime', type=float, default=None, help='单次Innovus运行的最长秒数')
+    parser.add_argument('--promote-fraction', type=float, default=None, help='开启successive halving：所有个体只运行到place，布局后总线长排在前该比例的个体继续布线')
+    parser.add_argument('--density-bin-size', type=float, default=None, help='每次评估后从postPlace.def计算布局密度栅格（bin边长，微米），保存为运行目录下的<case>.density.npz')
+    parser.add_argument('--tns-weight', type=float, default=None, help='时序加权适应度：总线长加上该系数乘以负TNS（ns），读取timeDesign的报告')
+    parser.add_argument('--surrogate', choices=SURROGATE_MODES, default=None, help='代理模型预筛选：skip跳过预测差于种群中位数的子代，rank只让预测较好的子代先运行')
+    parser.add_argument('--validate', action='store_true', help='启动Innovus之前检查约束的几何可行性（边界、自相交、重叠），不可行时重新生成')
+    parser.add_argument('--lef', default=None, help='LEF文件路径，提供单元尺寸，可行性检查时要求group面积不小于组内单元总面积')
+    parser.add_argument('--max-overlap', type=float, default=0.1, help='可行性检查中两个group的重叠面积允许占较小group面积的比例')
+    parser.add_argument('--lineage', metavar='DB', default=None, help='约束文件谱系库（sqlite，每次运行使用新的文件）：按相对父代的差分记录约束文件，只保留种群、最佳个体和正在评估的子代的文件')
+    parser.add_argument('--cache-file', default='fitness_cache.json', help='适应度缓存文件路径')
+    parser.add_argument('--no-cache', action='store_true', help='不使用适应度缓存')
+    parser.add_argument('--steady-state', action='store_true', help='使用稳态模式：槽位空闲即繁殖新个体，没有代际屏障')
+    parser.add_argument('--resume', metavar='CHECKPOINT', help='从检查点文件继续中断的运行（使用检查点中保存的参数，--tns-weight、--density-bin-size和监控设置显式给出时覆盖）')
+    parser.add_argument('--worker', action='store_true', help='使用常驻Innovus worker，每个worker只初始化一次设计')
     
     args = parser.parse_args()
     
@@ -721,22 +1296,91 @@ if __name__ == "__main__":
         from def_parser import analyze_def_file
         analyze_def_file(args.def_file)
     else:
-        # 解析多个boundary
-        boundaries = [b.strip() for b in args.boundary.split(',')]
-        print(f"使用以下多个边界文件: {boundaries}")
-        
-        # 执行遗传算法
-        best_result = genetic_algorithm(
-            args.case,
-            boundaries,
-            args.utilization,
-            population_size=args.population,
-            max_generations=args.generations,
-            tournament_size=args.tournament,
-            crossover_rate=args.crossover,
-            mutation_rate=args.mutation,
-            elitism=args.elitism
-        )
+        cache = None if args.no_cache else FitnessCache(args.cache_file)
+        
+        with InnovusJobPool(args.jobs, args.licenses) as pool:
+            if args.worker:
+                # 每个并发槽位对应一个常驻worker
+                WORKER_POOL = InnovusWorkerPool(size=pool.max_slots)
+            else:
+                # 并发槽位只负责评估线程，license和-localCpu由调度器统一分配
+                SCHEDULER = InnovusScheduler(args.licenses, args.cores)
+
+            if args.kill_margin is not None or args.stall_timeout is not None or args.max_runtime is not None:
+                MONITOR_POLICY = MonitorPolicy(args.kill_margin, args.stall_timeout, args.max_runtime)
+            
+            if args.promote_fraction is not None:
+                if args.worker:
+                    print("常驻worker模式不支持successive halving，忽略--promote-fraction")
+                else:
+                    HALVING = SuccessiveHalving(args.promote_fraction)
+            if args.surrogate is not None:
+                SURROGATE = SurrogateModel(args.surrogate)
+            TNS_WEIGHT = args.tns_weight
+            DENSITY_BIN_SIZE = args.density_bin_size
+            if args.validate:
+                VALIDATOR = ConstraintValidator(max_overlap_ratio=args.max_overlap, lef_file=args.lef)
+            if args.lineage:
+                LINEAGE = LineageStore(args.lineage)
+            
+            if args.resume:
+                # 从检查点继续
+                resume_state = load_checkpoint(args.resume)
+                # 适应度定义和监控设置沿用中断的运行，命令行显式给出时覆盖
+                settings = resume_state.get('settings') or {}
+                if args.tns_weight is None:
+                    TNS_WEIGHT = settings.get('tns_weight')
+                if args.density_bin_size is None:
+                    DENSITY_BIN_SIZE = settings.get('density_bin_size')
+                if resume_state.get('monitor'):
+                    MONITOR_POLICY = MonitorPolicy.from_dict(resume_state['monitor'])
+                    for name in ('kill_margin', 'stall_timeout', 'max_runtime'):
+                        if getattr(args, name) is not None:
+                            setattr(MONITOR_POLICY, name, getattr(args, name))
+                if resume_state.get('halving') and not args.worker:
+                    HALVING = SuccessiveHalving.from_dict(resume_state['halving'])
+                if resume_state.get('lineage'):
+                    LINEAGE = LineageStore(resume_state['lineage'])
+                if resume_state.get('surrogate'):
+                    # 代理模型的训练样本要重新解析，已删除的约束文件先从谱系库还原
+                    if LINEAGE is not None:
+                        LINEAGE.ensure_files(constraint_file for constraint_file, _ in resume_state['surrogate']['samples'])
+                    SURROGATE = SurrogateModel.from_dict(resume_state['surrogate'])
+                if resume_state.get('validator'):
+                    VALIDATOR = ConstraintValidator.from_dict(resume_state['validator'])
+                best_result = genetic_algorithm(**resume_state['params'], pool=pool, cache=cache, resume_state=resume_state)
+            else:
+                # 解析多个boundary
+                boundaries = [b.strip() for b in args.boundary.split(',')]
+                print(f"使用以下多个边界文件: {boundaries}")
+                
+                # 执行遗传算法
+                best_result = genetic_algorithm(
+                    args.case,
+                    boundaries,
+                    args.utilization,
+                    population_size=args.population,
+                    max_generations=args.generations,
+                    tournament_size=args.tournament,
+                    crossover_rate=args.crossover,
+                    mutation_rate=args.mutation,
+                    elitism=args.elitism,
+                    pool=pool,
+                    cache=cache,
+                    steady_state=args.steady_state
+                )
+        
+        if WORKER_POOL is not None:
+            WORKER_POOL.close()
+        if SCHEDULER is not None:
+            SCHEDULER.shutdown()
+        
+        if cache is not None:
+            print(f"适应度缓存: 命中 {cache.hits} 次, 未命中 {cache.misses} 次")
+        if SURROGATE is not None:
+            print(f"代理模型: {len(SURROGATE.samples)} 个训练样本, 跳过 {SURROGATE.skipped} 个子代")
+        if VALIDATOR is not None:
+            print(VALIDATOR.summary())
         
         if best_result:
             print("\n最佳结果:")
@@ -747,5 +1391,26 @@ if __name__ == "__main__":
 
 python run_innovus_dse_GA.py -c PE_array -b "Boundary_Areacoverage_250324_phase1_test3,Boundary_Badoverlap_i100,Boundary_BadSituation_OutofOrderComplete_i493,Boundary_PinAffectCell_phase3best_test2,Boundary_PinAffectCell_phase3initial_test2"
 
+并发评估（4个license，每代最多4个Innovus同时运行）:
+python run_innovus_dse_GA.py -c PE_array -b "Boundary_Areacoverage_250324_phase1_test3,Boundary_Badoverlap_i100" --licenses 4
+
+稳态模式（不等待整代完成，槽位空闲即提交新个体）:
+python run_innovus_dse_GA.py -c PE_array -b "Boundary_Areacoverage_250324_phase1_test3,Boundary_Badoverlap_i100" --licenses 4 --steady-state
+
+使用常驻Innovus worker（每个槽位只初始化一次设计，每次评估只运行布局）:
+python run_innovus_dse_GA.py -c PE_array -b "Boundary_Areacoverage_250324_phase1_test3,Boundary_Badoverlap_i100" --licenses 4 --worker
+
+从检查点继续中断的运行:
+python run_innovus_dse_GA.py --resume 20250101_120000__PE_array__Boundary_Areacoverage_250324_phase1_test3__70__GA.checkpoint.json --licenses 4
+
+successive halving（所有个体只布局，前25%继续布线，布线结果代替布局适应度）:
+python run_innovus_dse_GA.py -c PE_array -b Boundary_Badoverlap_i100 --licenses 4 --promote-fraction 0.25
+
+代理模型预筛选（预测差于种群中位数的子代不运行Innovus）:
+python run_innovus_dse_GA.py -c PE_array -b Boundary_Badoverlap_i100 --licenses 4 --surrogate skip
+
+监控innovus.logv（卡住30分钟或运行超过5小时的任务被结束，日志status列为killed_stalled/killed_timeout）:
+python run_innovus_dse_GA.py -c PE_array -b Boundary_Badoverlap_i100 --licenses 4 --stall-timeout 1800 --max-runtime 18000
+
 
 '''
\ No newline at end of file
@@ -6,16 +6,18 @@ import sys
 import os
 import argparse
 
+from constraint_model import ConstraintSet
+
 def scale_boundaries(input_file, output_file, original_size, target_size, precision=6):
     """
-    按指定比例放缩boundaries文件中的多边形坐标
+    按指定比例放缩boundaries文件中的多边形坐标，也支持create_group约束文件
     
     参数:
         input_file: 输入文件路径
         output_file: 输出文件路径
         original_size: 原始尺寸，格式为 (x0, y0)
         target_size: 目标尺寸，格式为 (x1, y1)
-        precision: 输出坐标的小数位数
+        precision: 输出坐标的小数位数（约束文件的坐标按DEF单位取整，不使用该参数）
     """
     # 计算x和y方向的缩放比例
     x_scale = target_size[0] / original_size[0]
@@ -28,14 +30,20 @@ def scale_boundaries(input_file, output_file, original_size, target_size, precis
         with open(input_file, 'r') as f:
             content = f.read()
         
-        # 找到所有坐标点并替换
-        def scale_coords(match):
-            x = float(match.group(1)) * x_scale
-            y = float(match.group(2)) * y_scale
-            return f"{x:.{precision}f},{y:.{precision}f};"
-        
-        # 使用正则表达式替换所有坐标点
-        scaled_content = re.sub(r'([-\d.]+),([-\d.]+);', scale_coords, content)
+        constraint_set = ConstraintSet.from_text(content, source=input_file)
+        if constraint_set.groups:
+            # create_group约束文件：在约束模型上按整数DEF单位放缩，其余行原样保留
+            constraint_set.scale(x_scale, y_scale)
+            scaled_content = constraint_set.serialize()
+        else:
+            # boundaries文件：找到所有坐标点并替换
+            def scale_coords(match):
+                x = float(match.group(1)) * x_scale
+                y = float(match.group(2)) * y_scale
+                return f"{x:.{precision}f},{y:.{precision}f};"
+            
+            # 使用正则表达式替换所有坐标点
+            scaled_content = re.sub(r'([-\d.]+),([-\d.]+);', scale_coords, content)
         
         # 写入输出文件
         with open(output_file, 'w') as f:
@@ -158,6 +166,9 @@ python scale_boundaries.py .\boundaries\boundary_fft8_250321_layout-cover_new.tx
 批量处理:
 python .\scale_boundaries.py .\boundaries\10\ .\scaled_boundaries\10\ --original 70 70 --target 126.864 126.360 --batch
 
+放缩create_group约束文件（按整数DEF单位取整）:
+python scale_boundaries.py constraint/PE_array__Boundary_Badoverlap_i100__70__0.txt constraint/PE_array__Boundary_Badoverlap_i100_scaled__70__0.txt --original 70 70 --target 126.864 126.360
+
 加后缀:
 python .\scale_boundaries.py .\boundaries\10\ .\scaled_boundaries\10\ --original 70 70 --target 126.864 126.360 --batch --appendix _scaled
 '''
\ No newline at end of file
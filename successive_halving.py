@@ -0,0 +1,202 @@
+"""
+多保真度评估模块（successive halving）
+所有候选先只运行到place并保存布局后的设计；布局后总线长排在已评估候选前promote_fraction的候选晋级，
+从保存的设计继续布线，布线后的总线长代替布局后的适应度。
+晋级采用异步规则：每个候选完成布局时与目前所有布局结果比较，顺序的SA和并发的GA都可以直接使用。
+未晋级候选的适应度按已晋级候选的布线/布局总线长比值（中位数）换算，与布线结果可以直接比较
+"""
+
+import os
+import math
+import statistics
+import threading
+
+from innovus_flow import OUTPUT_ROOT, dse_output_dir, dse_route_dir, run_dse_flow
+
+from extract_route_report import extract_data_from_logv
+
+from fitness_cache import constraint_hash
+
+# 评估的保真度
+PLACE = "place"
+ROUTE = "route"
+
+
+class SuccessiveHalving:
+    """两级（place筛选、route复核）的successive halving评估器，线程安全"""
+
+    def __init__(self, promote_fraction=0.25, output_root=OUTPUT_ROOT):
+        """
+        参数:
+            promote_fraction: 晋级到布线的比例（0~1]
+            output_root: DSE输出根目录
+        """
+        self.promote_fraction = promote_fraction
+        self.output_root = output_root
+        self.placed_values = []  # 所有候选的布局后总线长，每个候选只记录一次
+        self.decisions = {}      # 约束内容哈希 -> 是否晋级，内容相同的候选（缓存命中、未变异的精英等）沿用第一次的判断
+        self.route_ratios = []   # 已晋级候选的布线/布局总线长比值
+        self._lock = threading.Lock()
+
+    def should_promote(self, placed_net_length, key=None):
+        """
+        记录一个布局结果，并判断是否晋级：在目前所有布局结果中排在前promote_fraction（至少1个）时晋级
+
+        参数:
+            placed_net_length: 布局后总线长
+            key: 候选的约束内容哈希；已经判断过的候选不再记录，直接返回之前的判断
+
+        返回:
+            tuple: (是否晋级, 是否为第一次判断)
+        """
+        with self._lock:
+            if key is not None and key in self.decisions:
+                return self.decisions[key], False
+            self.placed_values.append(placed_net_length)
+            slots = max(1, math.ceil(self.promote_fraction * len(self.placed_values)))
+            rank = sum(1 for value in self.placed_values if value < placed_net_length)
+            promoted = rank < slots
+            if key is not None:
+                self.decisions[key] = promoted
+            return promoted, True
+
+    def route_ratio(self):
+        """返回布线/布局总线长比值的中位数，还没有晋级结果时返回None"""
+        with self._lock:
+            return statistics.median(self.route_ratios) if self.route_ratios else None
+
+    def fitness(self, placed_net_length, routed_net_length=None):
+        """
+        返回可以在两种保真度之间比较的适应度
+
+        参数:
+            placed_net_length: 布局后总线长
+            routed_net_length: 布线后总线长，未晋级时为None
+
+        返回:
+            float: 布线后总线长，或按比值换算的布局后总线长
+        """
+        if routed_net_length is not None:
+            return routed_net_length
+        ratio = self.route_ratio()
+        return placed_net_length * ratio if ratio is not None else placed_net_length
+
+    def evaluate(self, case, boundary, core_utilization, iteration, placed_data, constraint_file=None, cache=None,
+                 scheduler=None, monitor_policy=None):
+        """
+        对一个已完成布局的候选执行晋级判断，晋级时继续布线
+
+        参数:
+            case: 案例名称
+            boundary: 边界名称
+            core_utilization: 核心利用率
+            iteration: 迭代次数
+            placed_data: 布局阶段extract_data_from_logv的结果
+            constraint_file: 约束文件，用于查询/写入布线结果的适应度缓存
+            cache: FitnessCache，为None时不使用缓存
+            scheduler: InnovusScheduler，为None时直接运行
+            monitor_policy: MonitorPolicy，为None时不监控布线运行
+
+        返回:
+            dict: 指标（晋级时为布线结果，运行时间为两个阶段之和），另加fidelity、fitness和placed_net_length
+        """
+        placed = placed_data['total_net_length']
+        result = dict(placed_data, fidelity=PLACE, placed_net_length=placed)
+        key = constraint_hash(constraint_file, case, core_utilization, PLACE) if constraint_file is not None else None
+        promoted, first = self.should_promote(placed, key)
+        if not promoted:
+            result['fitness'] = self.fitness(placed)
+            return result
+
+        print(f"迭代 {iteration} 布局后总线长 {placed} 晋级，继续布线")
+        routed = self.route(case, boundary, core_utilization, iteration, constraint_file, cache, scheduler, monitor_policy)
+        if routed is None or routed['total_net_length'] is None:
+            print(f"迭代 {iteration} 布线失败，保留布局结果")
+            result['fitness'] = self.fitness(placed)
+            return result
+
+        # 比值也每个候选只记录一次
+        if first:
+            with self._lock:
+                self.route_ratios.append(routed['total_net_length'] / placed)
+        runtime = routed['total_runtime']
+        if runtime is not None and placed_data['total_runtime'] is not None:
+            runtime += placed_data['total_runtime']
+        return dict(routed, total_runtime=runtime, fidelity=ROUTE, placed_net_length=placed,
+                    fitness=routed['total_net_length'])
+
+    def route(self, case, boundary, core_utilization, iteration, constraint_file=None, cache=None, scheduler=None,
+              monitor_policy=None):
+        """
+        运行一个候选的布线阶段：有保存的布局后设计时从它继续，否则（布局结果来自缓存）完整运行一次
+
+        参数:
+            同evaluate
+
+        返回:
+            dict: 布线后extract_data_from_logv的结果，运行失败时返回None
+        """
+        cache_key = None
+        if cache is not None and constraint_file is not None:
+            cache_key, data = cache.lookup(constraint_file, case, core_utilization, ROUTE, with_timing=True)
+            if data is not None:
+                print(f"迭代 {iteration} 命中布线结果缓存，跳过Innovus运行")
+                return data
+
+        tar_path = dse_output_dir(case, boundary, core_utilization, iteration, self.output_root)
+        if os.path.isdir(os.path.join(tar_path, f"{case}.postPlace.enc.dat")):
+            ending_point, run_dir = "route_from_place", dse_route_dir(tar_path)
+        else:
+            ending_point, run_dir = "route", tar_path
+        logv_path = os.path.join(run_dir, "innovus.logv")
+
+        # 布线日志中的第一个report_route已经是布线结果，只检查停滞和超时
+        monitor = monitor_policy.monitor(logv_path, check_hopeless=False) if monitor_policy is not None else None
+        success = run_dse_flow(case, boundary, core_utilization, iteration, ending_point, output_root=self.output_root,
+                               scheduler=scheduler, monitor=monitor)
+        if monitor is not None:
+            monitor.close()
+        if not success:
+            return None
+
+        # 布线结果总是带上时序数据，开启时序加权适应度时可以直接使用
+        data = extract_data_from_logv(logv_path, with_timing=True)
+        if cache_key is not None and data['total_net_length'] is not None:
+            cache.store(cache_key, data)
+        return data
+
+    def to_dict(self):
+        """返回可JSON序列化的状态，用于检查点"""
+        with self._lock:
+            return {
+                'promote_fraction': self.promote_fraction,
+                'output_root': self.output_root,
+                'placed_values': list(self.placed_values),
+                'decisions': dict(self.decisions),
+                'route_ratios': list(self.route_ratios),
+            }
+
+    @classmethod
+    def from_dict(cls, data):
+        """从to_dict的结果恢复"""
+        halving = cls(data['promote_fraction'], data['output_root'])
+        halving.placed_values = list(data['placed_values'])
+        halving.decisions = dict(data.get('decisions', {}))
+        halving.route_ratios = list(data['route_ratios'])
+        return halving
+
+
+'''
+调用方式:
+from successive_halving import SuccessiveHalving
+
+halving = SuccessiveHalving(promote_fraction=0.25)
+placed_data = extract_data_from_logv(".../iter__5/innovus.logv")   # 用place_saved流程运行得到
+result = halving.evaluate("PE_array", "Boundary_Badoverlap_i100", "70", 5, placed_data,
+                          "constraint/PE_array__Boundary_Badoverlap_i100__70__5.txt")
+print(result['fidelity'], result['fitness'])
+
+命令行（所有候选先布局，前25%继续布线）:
+python run_innovus_dse.py -c PE_array -b Boundary_Badoverlap_i100 --promote-fraction 0.25
+python run_innovus_dse_GA.py -c PE_array -b Boundary_Badoverlap_i100 --licenses 4 --promote-fraction 0.25
+'''
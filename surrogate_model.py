@@ -0,0 +1,247 @@
+"""
+代理模型预筛选模块
+从约束文件的create_group多边形提取特征（每个group的面积、包围盒、质心、与其他group的重叠面积和类型），
+用本次运行已得到的(约束文件, 适应度)在线训练岭回归（只依赖numpy），
+在启动Innovus之前预测候选的适应度，预测明显较差的候选被跳过或排到后面
+"""
+
+import random
+
+import numpy as np
+
+from random_constraint_modifier import extract_rectangles
+from constraint_model import GROUP_TYPES, ConstraintSet, load_constraint_set
+
+# 每个group的特征：面积、包围盒宽高、质心x/y、与其他group的重叠面积、类型独热编码
+FEATURES_PER_GROUP = 6 + len(GROUP_TYPES)
+
+# 被代理模型跳过的候选在优化日志中的状态
+STATUS_SKIPPED = "skipped_surrogate"
+
+# 代理模型的用法：skip跳过预测差于参考值的候选，rank只调整评估顺序
+MODES = ["skip", "rank"]
+
+
+def parse_constraint_groups(constraint_file):
+    """
+    解析约束文件中的create_group命令
+
+    参数:
+        constraint_file: 约束文件路径，或内存中的ConstraintSet（尚未写出的子代）
+
+    返回:
+        dict: group名称 -> (类型, 点列表)
+    """
+    constraint_set = constraint_file if isinstance(constraint_file, ConstraintSet) else load_constraint_set(constraint_file)
+    return {group.name: (group.type, group.points(constraint_set.units))
+            for group in constraint_set if len(group.vertices)}
+
+
+def _polygon_area_centroid(points):
+    """用鞋带公式计算多边形面积和质心"""
+    xs = np.array([p[0] for p in points])
+    ys = np.array([p[1] for p in points])
+    xs_next = np.roll(xs, -1)
+    ys_next = np.roll(ys, -1)
+    cross = xs * ys_next - xs_next * ys
+    area = cross.sum() / 2.0
+    if abs(area) < 1e-12:
+        return 0.0, xs.mean(), ys.mean()
+    cx = ((xs + xs_next) * cross).sum() / (6.0 * area)
+    cy = ((ys + ys_next) * cross).sum() / (6.0 * area)
+    return abs(area), cx, cy
+
+
+def _overlap_area(rects_a, rects_b):
+    """两组矩形（N×4数组：x1, y1, x2, y2）之间的总重叠面积"""
+    if len(rects_a) == 0 or len(rects_b) == 0:
+        return 0.0
+    width = np.minimum(rects_a[:, None, 2], rects_b[None, :, 2]) - np.maximum(rects_a[:, None, 0], rects_b[None, :, 0])
+    height = np.minimum(rects_a[:, None, 3], rects_b[None, :, 3]) - np.maximum(rects_a[:, None, 1], rects_b[None, :, 1])
+    return float((np.clip(width, 0, None) * np.clip(height, 0, None)).sum())
+
+
+def group_features(groups):
+    """
+    计算每个group的特征
+
+    参数:
+        groups: parse_constraint_groups的结果
+
+    返回:
+        dict: group名称 -> 长度为FEATURES_PER_GROUP的特征列表
+    """
+    rects = {}
+    bboxes = {}
+    for name, (group_type, points) in groups.items():
+        rects[name] = np.array([[r[0][0], r[0][1], r[1][0], r[1][1]] for r in extract_rectangles(points)]).reshape(-1, 4)
+        xs = [p[0] for p in points]
+        ys = [p[1] for p in points]
+        bboxes[name] = (min(xs), min(ys), max(xs), max(ys))
+
+    features = {}
+    names = list(groups)
+    for name in names:
+        group_type, points = groups[name]
+        area, cx, cy = _polygon_area_centroid(points)
+        x1, y1, x2, y2 = bboxes[name]
+        overlap = 0.0
+        for other in names:
+            if other == name:
+                continue
+            ox1, oy1, ox2, oy2 = bboxes[other]
+            # 包围盒不相交时跳过矩形级别的计算
+            if ox1 >= x2 or ox2 <= x1 or oy1 >= y2 or oy2 <= y1:
+                continue
+            overlap += _overlap_area(rects[name], rects[other])
+        type_onehot = [1.0 if group_type == t else 0.0 for t in GROUP_TYPES]
+        features[name] = [area, x2 - x1, y2 - y1, cx, cy, overlap] + type_onehot
+    return features
+
+
+class SurrogateModel:
+    """在线训练的岭回归代理模型，预测约束文件的适应度（总线长）"""
+
+    def __init__(self, mode="skip", min_samples=10, ridge=1.0, explore_rate=0.1):
+        """
+        参数:
+            mode: skip（跳过预测差于参考值的候选）或rank（只按预测值调整评估顺序）
+            min_samples: 开始预测所需的最少样本数
+            ridge: 岭回归正则化系数（特征标准化之后）
+            explore_rate: 即使预测较差也照常评估的比例，避免模型的盲区永远得不到纠正
+        """
+        self.mode = mode
+        self.min_samples = min_samples
+        self.ridge = ridge
+        self.explore_rate = explore_rate
+        self.group_names = None  # 特征顺序，由第一个样本确定
+        self.samples = []        # [(约束文件, 适应度)]
+        self._rows = []
+        self._weights = None
+        self._dirty = False
+        self.skipped = 0
+
+    def featurize(self, constraint_file):
+        """
+        把约束文件转换为特征向量，group按名称排序；缺少的group特征为0
+
+        参数:
+            constraint_file: 约束文件路径或ConstraintSet
+
+        返回:
+            numpy.ndarray: 特征向量
+        """
+        features = group_features(parse_constraint_groups(constraint_file))
+        if self.group_names is None:
+            self.group_names = sorted(features)
+        row = []
+        for name in self.group_names:
+            row.extend(features.get(name, [0.0] * FEATURES_PER_GROUP))
+        return np.array(row, dtype=float)
+
+    def add(self, constraint_file, fitness):
+        """
+        加入一个训练样本
+
+        参数:
+            constraint_file: 约束文件路径
+            fitness: 该约束文件的适应度
+        """
+        if fitness is None or not np.isfinite(fitness):
+            return
+        try:
+            row = self.featurize(constraint_file)
+        except (OSError, ValueError) as e:
+            print(f"代理模型无法解析约束文件 {constraint_file}: {e}")
+            return
+        self.samples.append((constraint_file, fitness))
+        self._rows.append(row)
+        self._dirty = True
+
+    def ready(self):
+        """样本数是否足够开始预测"""
+        return len(self._rows) >= self.min_samples
+
+    def _fit(self):
+        X = np.vstack(self._rows)
+        y = np.array([fitness for _, fitness in self.samples])
+        self._mean = X.mean(axis=0)
+        self._scale = X.std(axis=0)
+        self._scale[self._scale < 1e-12] = 1.0
+        Z = (X - self._mean) / self._scale
+        self._y_mean = y.mean()
+        A = Z.T @ Z + self.ridge * np.eye(Z.shape[1])
+        self._weights = np.linalg.solve(A, Z.T @ (y - self._y_mean))
+        self._dirty = False
+
+    def predict(self, constraint_file):
+        """
+        预测约束文件的适应度
+
+        参数:
+            constraint_file: 约束文件路径或ConstraintSet（尚未写出的子代）
+
+        返回:
+            float: 预测的适应度，样本不足或无法解析时返回None
+        """
+        if not self.ready():
+            return None
+        if self._dirty or self._weights is None:
+            self._fit()
+        try:
+            row = self.featurize(constraint_file)
+        except (OSError, ValueError):
+            return None
+        return float(((row - self._mean) / self._scale) @ self._weights + self._y_mean)
+
+    def should_skip(self, predicted, reference):
+        """
+        判断是否跳过一个候选：skip模式下预测值差于参考值（如种群中位数）时跳过，按explore_rate随机保留一部分
+
+        参数:
+            predicted: predict的结果
+            reference: 参考适应度
+
+        返回:
+            bool: 是否跳过
+        """
+        if self.mode != "skip" or predicted is None or reference is None:
+            return False
+        if predicted <= reference or random.random() < self.explore_rate:
+            return False
+        self.skipped += 1
+        return True
+
+    def to_dict(self):
+        """返回可JSON序列化的状态，用于检查点；特征在恢复时由约束文件重新计算"""
+        return {
+            'mode': self.mode, 'min_samples': self.min_samples, 'ridge': self.ridge,
+            'explore_rate': self.explore_rate, 'samples': [list(sample) for sample in self.samples],
+            'skipped': self.skipped
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """从to_dict的结果恢复"""
+        model = cls(data['mode'], data['min_samples'], data['ridge'], data['explore_rate'])
+        for constraint_file, fitness in data['samples']:
+            model.add(constraint_file, fitness)
+        model.skipped = data['skipped']
+        return model
+
+
+'''
+调用方式:
+from surrogate_model import SurrogateModel
+
+model = SurrogateModel(mode="skip", min_samples=10)
+model.add("constraint/PE_array__Boundary_Badoverlap_i100__70__1.txt", 105234.5)
+...
+predicted = model.predict("constraint/PE_array__Boundary_Badoverlap_i100__70__42.txt")
+if model.should_skip(predicted, reference=median_fitness):
+    print("预测较差，跳过")
+
+命令行:
+python run_innovus_dse_GA.py -c PE_array -b Boundary_Badoverlap_i100 --licenses 4 --surrogate skip
+python run_innovus_dse.py -c PE_array -b Boundary_Badoverlap_i100 --surrogate skip
+'''
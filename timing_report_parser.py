@@ -0,0 +1,192 @@
+"""
+时序报告解析模块
+读取流程中timeDesign -preCTS / -postRoute写出的${DESIGN}_timingReports_*目录，
+提取WNS、TNS、违例路径数和DRV违例数。报告按行流式读取（支持.gz），不整体载入内存；
+结果可以合并到extract_data_from_logv的结果字典中，供GA/SA的适应度使用
+"""
+
+import os
+import re
+import glob
+import gzip
+
+# 时序报告目录的阶段，后面的阶段优先（布线后的时序比布局后的准确）
+TIMING_STAGES = ["preCTS", "postRoute"]
+
+# 合并到指标字典中的键
+TIMING_KEYS = ['wns', 'tns', 'violating_paths', 'drv_count', 'timing_stage']
+
+SUMMARY_ROW_PATTERN = re.compile(r'^\|\s*(WNS \(ns\)|TNS \(ns\)|Violating Paths|All Paths)\s*:\s*\|\s*(\S+)')
+DRV_ROW_PATTERN = re.compile(r'^\|\s*(max_cap|max_tran|max_fanout|max_length)\s*\|\s*(\d+)')
+PATH_HEADER_PATTERN = re.compile(r'^Path \d+:\s*(VIOLATED|MET)')
+SLACK_PATTERN = re.compile(r'Slack Time\s+(-?[\d.]+)')
+
+
+def open_report(path):
+    """以文本方式打开报告，.gz文件透明解压"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', errors='ignore')
+    return open(path, 'r', encoding='utf-8', errors='ignore')
+
+
+def _to_number(text):
+    """把报告中的数值转换为float，N/A等返回None"""
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def parse_timing_summary(summary_file):
+    """
+    解析timeDesign的summary报告（all列）和DRV表
+
+    参数:
+        summary_file: .summary或.summary.gz文件路径
+
+    返回:
+        dict: 键有 'wns', 'tns', 'violating_paths', 'all_paths', 'drv'（{类型: 违例net数}），读取失败时返回None
+    """
+    result = {'wns': None, 'tns': None, 'violating_paths': None, 'all_paths': None, 'drv': {}}
+    keys = {'WNS (ns)': 'wns', 'TNS (ns)': 'tns', 'Violating Paths': 'violating_paths', 'All Paths': 'all_paths'}
+    try:
+        with open_report(summary_file) as f:
+            for line in f:
+                line = line.strip()
+                match = SUMMARY_ROW_PATTERN.match(line)
+                if match:
+                    key = keys[match.group(1)]
+                    # 有多个分析视图时只取第一个表
+                    if result[key] is None:
+                        result[key] = _to_number(match.group(2))
+                    continue
+                match = DRV_ROW_PATTERN.match(line)
+                if match and match.group(1) not in result['drv']:
+                    result['drv'][match.group(1)] = int(match.group(2))
+    except (OSError, EOFError) as e:
+        print(f"读取时序报告 {summary_file} 时出错: {e}")
+        return None
+    for key in ('violating_paths', 'all_paths'):
+        if result[key] is not None:
+            result[key] = int(result[key])
+    return result
+
+
+def parse_path_reports(report_files):
+    """
+    summary缺失时从路径报告（.tarpt）统计：报告中的路径数由-numPaths限制，
+    因此WNS准确，TNS和违例路径数只覆盖报告中的路径
+
+    参数:
+        report_files: .tarpt或.tarpt.gz文件路径列表
+
+    返回:
+        dict: 键有 'wns', 'tns', 'violating_paths'，没有任何路径时返回None
+    """
+    slacks = []
+    for report_file in report_files:
+        try:
+            with open_report(report_file) as f:
+                in_path = False
+                for line in f:
+                    if PATH_HEADER_PATTERN.match(line):
+                        in_path = True
+                    elif in_path:
+                        match = SLACK_PATTERN.search(line)
+                        if match:
+                            slacks.append(float(match.group(1)))
+                            in_path = False
+        except (OSError, EOFError) as e:
+            print(f"读取时序报告 {report_file} 时出错: {e}")
+    if not slacks:
+        return None
+    violations = [slack for slack in slacks if slack < 0]
+    return {'wns': min(slacks), 'tns': sum(violations), 'violating_paths': len(violations)}
+
+
+def find_timing_report_dir(run_dir, stage=None):
+    """
+    查找运行目录下的时序报告目录
+
+    参数:
+        run_dir: Innovus运行目录（innovus.logv所在目录）
+        stage: preCTS或postRoute，为None时取存在的最后阶段
+
+    返回:
+        tuple: (报告目录, 阶段)，没有时返回 (None, None)
+    """
+    stages = [stage] if stage else list(reversed(TIMING_STAGES))
+    for candidate in stages:
+        report_dirs = sorted(glob.glob(os.path.join(run_dir, f"*_timingReports_{candidate}")))
+        if report_dirs:
+            return report_dirs[0], candidate
+    return None, None
+
+
+def extract_timing_data(run_dir, stage=None):
+    """
+    从运行目录的时序报告中提取WNS、TNS、违例路径数和DRV违例数
+
+    参数:
+        run_dir: Innovus运行目录
+        stage: preCTS或postRoute，为None时取存在的最后阶段
+
+    返回:
+        dict: TIMING_KEYS中的字段，没有时序报告时值为None
+    """
+    result = {key: None for key in TIMING_KEYS}
+    report_dir, stage = find_timing_report_dir(run_dir, stage)
+    if report_dir is None:
+        return result
+    result['timing_stage'] = stage
+
+    summaries = sorted(glob.glob(os.path.join(report_dir, "*.summary")) + glob.glob(os.path.join(report_dir, "*.summary.gz")))
+    summary = parse_timing_summary(summaries[0]) if summaries else None
+    if summary is not None and summary['wns'] is not None:
+        result['wns'] = summary['wns']
+        result['tns'] = summary['tns']
+        result['violating_paths'] = summary['violating_paths']
+        if summary['drv']:
+            result['drv_count'] = sum(summary['drv'].values())
+        return result
+
+    path_reports = sorted(glob.glob(os.path.join(report_dir, "*.tarpt")) + glob.glob(os.path.join(report_dir, "*.tarpt.gz")))
+    paths = parse_path_reports(path_reports)
+    if paths is not None:
+        result.update(paths)
+    return result
+
+
+def timing_fitness(data, tns_weight):
+    """
+    时序加权的适应度：线长适应度加上负TNS的惩罚
+
+    参数:
+        data: 合并了时序数据的指标字典，使用其中的fitness（没有时为total_net_length）和tns
+        tns_weight: 每ns负TNS折合的线长（um）
+
+    返回:
+        float: 适应度；没有时序数据时不加惩罚
+    """
+    fitness = data.get('fitness', data['total_net_length'])
+    if fitness is None or not tns_weight or data.get('tns') is None:
+        return fitness
+    return fitness + tns_weight * max(0.0, -data['tns'])
+
+
+'''
+调用方式:
+from timing_report_parser import extract_timing_data, timing_fitness
+
+timing = extract_timing_data("/mnt/hgfs/vm_share/eda/innovus_output_dse/case__PE_array__...__iter__5")
+print(timing['wns'], timing['tns'], timing['violating_paths'], timing['drv_count'], timing['timing_stage'])
+
+# 合并到extract_data_from_logv的结果
+from extract_route_report import extract_data_from_logv
+data = extract_data_from_logv(".../iter__5/innovus.logv", with_timing=True)
+fitness = timing_fitness(data, tns_weight=1000.0)
+
+命令行（适应度 = 总线长 + 1000 * 负TNS）:
+python run_innovus_dse_GA.py -c PE_array -b Boundary_Badoverlap_i100 --licenses 4 --tns-weight 1000
+python run_innovus_dse.py -c PE_array -b Boundary_Badoverlap_i100 --tns-weight 1000
+'''